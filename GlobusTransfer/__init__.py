@@ -8,12 +8,14 @@ import globus_sdk
 from globus_sdk.scopes import TransferScopes
 from humanfriendly import format_size
 
+from .backend import TransferBackend
 from .exceptions import GlobusFailedTransfer, ScopeOrSingleDomainError
+from .local import LocalTransfer  # noqa: F401 re-export
 
 logging.getLogger(__name__).addHandler(logging.NullHandler)
 
 
-class GlobusTransfer:
+class GlobusTransfer(TransferBackend):
     """
     object of where / how to transfer data
     """
@@ -29,19 +31,19 @@ class GlobusTransfer:
         fail_on_quota_errors=False,
         skip_source_errors=False,
         preserve_timestamp=False,
+        sync_level=None,
     ):
         """
         ep_source  Globus Collection/Endpoint Source Name
         ep_dest    Globus Collection/Endpoint Destination Name
         path_dest   Path on destination endpoint
+        sync_level  None (always copy) or exists | size | mtime | checksum only copy files that differ on the destination
 
         Other options see: https://globus-sdk-python.readthedocs.io/en/stable/services/transfer.html#globus_sdk.TransferData
         """
 
+        super().__init__(ep_source, ep_dest, path_dest)
         self._CLIENT_ID = "8359fb34-39cf-410d-bd93-e8502aa68c46"
-        self.ep_source = ep_source
-        self.ep_dest = ep_dest
-        self.path_dest = path_dest
         self.notify_on_succeeded = notify_on_succeeded
         self.notify_on_failed = notify_on_failed
         self.notify_on_inactive = notify_on_inactive
@@ -50,9 +52,9 @@ class GlobusTransfer:
         self.fail_on_quota_errors = fail_on_quota_errors
         self.skip_source_errors = skip_source_errors
         self.preserve_timestamp = preserve_timestamp
+        self.sync_level = sync_level
         self.session_required_single_domain = None  # used with HA collections
         self.TransferData = None  # start empty created as needed
-        self.transfers = []
 
         """Create an authorizer to use with Globus Service Clients."""
         """
@@ -227,6 +229,14 @@ class GlobusTransfer:
             logging.debug(f"Failed Transfer status object: {status}")
             raise GlobusFailedTransfer(status)
 
+    def task_finished(self, task_id):
+        """Check if task finished without waiting, raise GlobusFailedTransfer if it failed."""
+        status = self.tc.get_task(task_id)
+        if status["status"] == "FAILED":
+            logging.debug(f"Failed Transfer status object: {status}")
+            raise GlobusFailedTransfer(status)
+        return status["status"] == "SUCCEEDED"
+
     def add_item(self, source_path, label="PY", in_root=False):
         """Add an item to send as part of the current bundle."""
         if not self.TransferData:
@@ -235,6 +245,12 @@ class GlobusTransfer:
 
             # labels can only be letters, numbers, spaces, dashes, and underscores
             label = label.replace(".", "-")
+
+            # only set when requested, letting the destination be compared server side
+            kwargs = {}
+            if self.sync_level:
+                kwargs["sync_level"] = self.sync_level
+
             self.TransferData = globus_sdk.TransferData(
                 self.ep_source,
                 self.ep_dest,
@@ -246,26 +262,12 @@ class GlobusTransfer:
                 fail_on_quota_errors=self.fail_on_quota_errors,
                 skip_source_errors=self.skip_source_errors,
                 preserve_timestamp=self.preserve_timestamp,
+                **kwargs,
             )
 
         # add item
         logging.debug(f"Source Path: {source_path}")
-
-        # pathlib comes though as absolute we need just the relative string
-        # then append that to the destimations path  eg:
-
-        # cwd  /home/brockp
-        # pathlib  /home/brockp/dir1/data.txt
-        # result dir1/data.txt
-        # Final Dest path: path_dest/dir1/data.txt
-
-        # UNLESS in_root=True then stick the file right in the root of destination
-        if in_root:
-            path_dest = Path(self.path_dest) / source_path.name
-        else:
-            relative_paths = os.path.relpath(source_path, os.getcwd())
-            path_dest = Path(self.path_dest) / relative_paths
-
+        path_dest = self.destination_path(source_path, in_root=in_root)
         logging.debug(f"Dest Path: {path_dest}")
 
         # convert PosixPath to string to avoid JSON serlizer issues
@@ -0,0 +1,68 @@
+import abc
+import logging
+import os
+from pathlib import Path
+
+logging.getLogger(__name__).addHandler(logging.NullHandler)
+
+
+class TransferBackend(abc.ABC):
+    """
+    Interface archivetar uses to move data to an archive.
+
+    GlobusTransfer is the production implementation, other backends (eg. LocalTransfer)
+    only need to provide the same small set of methods, a backend missing one can't
+    be created.
+    """
+
+    def __init__(self, ep_source, ep_dest, path_dest):
+        """
+        ep_source  Source Name (Globus Collection/Endpoint or label)
+        ep_dest    Destination Name (Globus Collection/Endpoint or label)
+        path_dest  Path on destination
+        """
+        self.ep_source = ep_source
+        self.ep_dest = ep_dest
+        self.path_dest = path_dest
+        self.transfers = []
+        self.polling_interval = 30  # seconds between status checks
+
+    def destination_path(self, source_path, in_root=False):
+        """
+        Map a source path to its location under path_dest.
+
+        pathlib comes though as absolute we need just the relative string
+        then append that to the destimations path  eg:
+
+        cwd  /home/brockp
+        pathlib  /home/brockp/dir1/data.txt
+        result dir1/data.txt
+        Final Dest path: path_dest/dir1/data.txt
+
+        UNLESS in_root=True then stick the file right in the root of destination
+        """
+        if in_root:
+            return Path(self.path_dest) / Path(source_path).name
+
+        relative_paths = os.path.relpath(source_path, os.getcwd())
+        return Path(self.path_dest) / relative_paths
+
+    @abc.abstractmethod
+    def add_item(self, source_path, label="PY", in_root=False):
+        """Add an item to send as part of the current bundle."""
+
+    @abc.abstractmethod
+    def submit_pending_transfer(self):
+        """Submit pending items, return task id or None if nothing was queued."""
+
+    @abc.abstractmethod
+    def task_wait(self, task_id, timeout=60, polling_interval=30):
+        """Block until task_id finishes, raise GlobusFailedTransfer if it failed."""
+
+    @abc.abstractmethod
+    def task_finished(self, task_id):
+        """Non blocking check, True once task_id succeeded, raise GlobusFailedTransfer if it failed."""
+
+    @abc.abstractmethod
+    def task_successful_transfers(self, task_id):
+        """Yield dict for each file transfered with source_path and checksum keys."""
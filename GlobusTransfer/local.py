@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from humanfriendly import format_size
+
+from .backend import TransferBackend
+from .exceptions import GlobusFailedTransfer
+
+logging.getLogger(__name__).addHandler(logging.NullHandler)
+
+
+class LocalTransfer(TransferBackend):
+    """
+    Stand-in for GlobusTransfer that "transfers" by copying between local directories.
+
+    Used for testing and benchmarking transfer orchestration without a live Globus.
+    Tasks run asynchronously in a background thread and their state is kept in
+    state_dir so any LocalTransfer instance (or process) can wait on any task just like
+    the Globus service.
+    """
+
+    def __init__(
+        self,
+        ep_source,
+        ep_dest,
+        path_dest,
+        latency=0.0,  # seconds before a task starts moving data
+        bandwidth=None,  # bytes/second per task, None is unlimited
+        state_dir=None,  # where task records are kept
+        polling_interval=0.1,  # seconds between checks in task_wait()
+        preserve_timestamp=False,
+        sync_level=None,  # None | exists | size | mtime | checksum same as Globus
+        **kwargs,  # Globus only options eg notify_on_succeeded are accepted and ignored
+    ):
+        super().__init__(ep_source, ep_dest, os.path.expanduser(path_dest))
+        self.latency = float(latency)
+        self.bandwidth = float(bandwidth) if bandwidth else None
+        self.polling_interval = polling_interval
+        self.preserve_timestamp = preserve_timestamp
+        self.sync_level = sync_level
+
+        if state_dir:
+            self.state_dir = Path(state_dir)
+        else:
+            self.state_dir = Path(tempfile.gettempdir()) / "archivetar-local-transfer"
+        self.state_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+        self._items = []  # (source, destination) pending submit
+        self._label = None
+
+    def _task_file(self, task_id):
+        return self.state_dir / f"{task_id}.json"
+
+    def _save_task(self, record):
+        """Atomically write task record so readers never see a partial file."""
+        task_file = self._task_file(record["task_id"])
+        tmp = task_file.with_suffix(".tmp")
+        with tmp.open("w") as f:
+            json.dump(record, f)
+        os.replace(tmp, task_file)
+
+    def get_task(self, task_id):
+        """Return task record, same keys archivetar uses from the Globus task document."""
+        with self._task_file(task_id).open() as f:
+            return json.load(f)
+
+    def add_item(self, source_path, label="PY", in_root=False):
+        """Add an item to send as part of the current bundle."""
+        if self._label is None:
+            # labels can only be letters, numbers, spaces, dashes, and underscores
+            self._label = f"archivetar {label.replace('.', '-')}"
+
+        logging.debug(f"Source Path: {source_path}")
+        path_dest = self.destination_path(source_path, in_root=in_root)
+        logging.debug(f"Dest Path: {path_dest}")
+        self._items.append((str(source_path), str(path_dest)))
+
+    def submit_pending_transfer(self):
+        """Start copying pending items in the background and return the task id."""
+        if not self._items:
+            logging.debug("No current items queued found")
+            return None
+
+        task_id = str(uuid.uuid4())
+        record = {
+            "task_id": task_id,
+            "label": self._label,
+            "status": "ACTIVE",
+            "bytes_transferred": 0,
+            "effective_bytes_per_second": 0,
+            "files_skipped": 0,
+            "successful_transfers": [],
+        }
+        self._save_task(record)
+
+        # non-daemon so the interpreter finishes copies before exiting
+        worker = threading.Thread(
+            target=self._run_task, args=(record, self._items), name=task_id
+        )
+        worker.start()
+
+        logging.debug(f"Submitted Transfer: {task_id}")
+        self.transfers.append({"task_id": task_id})
+        self._items = []
+        self._label = None
+        return task_id
+
+    def _run_task(self, record, items):
+        """Copy each item simulating latency and bandwidth, calculate sha1 on the way."""
+        start = time.time()
+        time.sleep(self.latency)
+        try:
+            for source, dest in items:
+                if self._in_sync(source, dest):
+                    logging.debug(f"Skipping {source} already in sync at {dest}")
+                    record["files_skipped"] += 1
+                    continue
+                entry = self._copy(source, dest, record, start)
+                record["successful_transfers"].append(entry)
+        except Exception as e:
+            logging.error(f"Local transfer {record['task_id']} failed: {e}")
+            record["status"] = "FAILED"
+            record["nice_status_details"] = str(e)
+        else:
+            record["status"] = "SUCCEEDED"
+
+        elapsed = max(time.time() - start, 1e-9)
+        record["effective_bytes_per_second"] = int(record["bytes_transferred"] / elapsed)
+        self._save_task(record)
+
+    def _in_sync(self, source, dest):
+        """Check dest against source using sync_level the way Globus does."""
+        if not self.sync_level or not os.path.exists(dest):
+            return False
+        if self.sync_level == "exists":
+            return True
+
+        s_st = os.stat(source)
+        d_st = os.stat(dest)
+        if self.sync_level == "mtime":
+            # Globus compares only the modification times at this level
+            return s_st.st_mtime <= d_st.st_mtime
+        if s_st.st_size != d_st.st_size:
+            return False
+        if self.sync_level == "size":
+            return True
+        if self.sync_level == "checksum":
+            # imported here, archivetar imports this package
+            from archivetar.checksum import sha1_of
+
+            return sha1_of(source) == sha1_of(dest)
+
+        raise ValueError(f"Unknown sync_level {self.sync_level}")
+
+    def _copy(self, source, dest, record, start, bufsize=1 << 20):
+        """Copy one file, throttled to self.bandwidth for the whole task."""
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        h = hashlib.sha1(usedforsecurity=False)
+        with open(source, "rb") as src, dest.open("wb") as dst:
+            while chunk := src.read(bufsize):
+                dst.write(chunk)
+                h.update(chunk)
+                record["bytes_transferred"] += len(chunk)
+                if self.bandwidth:
+                    ahead = (
+                        record["bytes_transferred"] / self.bandwidth
+                        - (time.time() - start - self.latency)
+                    )
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+        if self.preserve_timestamp:
+            shutil.copystat(source, dest)
+
+        return {
+            "source_path": source,
+            "destination_path": str(dest),
+            "checksum": h.hexdigest(),
+            "checksum_algorithm": "SHA1",
+            "size": dest.stat().st_size,
+        }
+
+    def task_wait(self, task_id, timeout=60, polling_interval=None):
+        """
+        Wait for task to finish.
+
+        Like GlobusTransfer status is printed every timeout seconds while waiting,
+        the task is checked every polling_interval seconds, default the
+        polling_interval given to LocalTransfer().
+        """
+        if polling_interval is None:
+            polling_interval = self.polling_interval
+        last = time.time()
+        while (status := self.get_task(task_id))["status"] == "ACTIVE":
+            if time.time() - last >= timeout:
+                self._print_status(status)
+                last = time.time()
+            time.sleep(polling_interval)
+
+        self._print_status(status)
+        # if status is FAILED raise an exception
+        if status["status"] == "FAILED":
+            logging.debug(f"Failed Transfer status object: {status}")
+            raise GlobusFailedTransfer(status)
+
+    def _print_status(self, status):
+        print(
+            f"Status: {status['status']} Task: {status['label']} TX: {format_size(status['bytes_transferred'])} Speed: {format_size(status['effective_bytes_per_second'])}/s TaskID: {status['task_id']}"
+        )
+
+    def task_finished(self, task_id):
+        """Check if task finished without waiting, raise GlobusFailedTransfer if it failed."""
+        status = self.get_task(task_id)
+        if status["status"] == "FAILED":
+            raise GlobusFailedTransfer(status)
+        return status["status"] == "SUCCEEDED"
+
+    def task_successful_transfers(self, task_id):
+        """
+        Get data about each file transfered in the task.
+
+        Paramter:
+            task_id (str): transfer ID to check on
+        """
+        for entry in self.get_task(task_id)["successful_transfers"]:
+            yield entry
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from GlobusTransfer import LocalTransfer
+from GlobusTransfer.backend import TransferBackend
+from GlobusTransfer.exceptions import GlobusFailedTransfer
+
+
+def test_TransferBackend_abstract():
+    """Backends must provide every method archivetar calls."""
+
+    class Partial(TransferBackend):
+        def add_item(self, source_path, label="PY", in_root=False):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial("source", "dest", "/archive")
+
+
+@pytest.fixture
+def local(tmp_path):
+    """LocalTransfer copying from tmp_path/src to tmp_path/dest"""
+    src = tmp_path / "src"
+    src.mkdir()
+    os.chdir(src)
+    transfer = LocalTransfer(
+        "source", "dest", tmp_path / "dest", state_dir=tmp_path / "state"
+    )
+    yield transfer
+
+
+def test_LocalTransfer_copy(local, tmp_path):
+    """Files land relative to cwd or in root and checksums match."""
+    sub = tmp_path / "src" / "dir1"
+    sub.mkdir()
+    a = sub / "a.txt"
+    a.write_text("hello")
+    b = tmp_path / "src" / "b.txt"
+    b.write_text("world")
+
+    local.add_item(a.resolve(), label="test.tar")
+    local.add_item(b.resolve(), label="test.tar", in_root=True)
+    task_id = local.submit_pending_transfer()
+    local.task_wait(task_id)
+
+    assert (tmp_path / "dest" / "dir1" / "a.txt").read_text() == "hello"
+    assert (tmp_path / "dest" / "b.txt").read_text() == "world"
+
+    entries = {e["source_path"]: e for e in local.task_successful_transfers(task_id)}
+    assert entries[str(a.resolve())]["checksum"] == hashlib.sha1(b"hello").hexdigest()
+    assert local.get_task(task_id)["label"] == "archivetar test-tar"
+
+
+def test_LocalTransfer_nothing_queued(local):
+    """Like Globus nothing queued returns None."""
+    assert local.submit_pending_transfer() is None
+
+
+def test_LocalTransfer_failed(local, tmp_path):
+    """Missing source fails the task and task_wait() raises."""
+    local.add_item(tmp_path / "src" / "missing.txt")
+    task_id = local.submit_pending_transfer()
+    with pytest.raises(GlobusFailedTransfer):
+        local.task_wait(task_id)
+
+
+def test_LocalTransfer_simulated(local, tmp_path):
+    """Latency and bandwidth slow the task down."""
+    a = tmp_path / "src" / "a.dat"
+    a.write_bytes(b"0" * 20000)
+    local.latency = 0.2
+    local.bandwidth = 100000  # 0.2 seconds for 20000 bytes
+
+    start = time.time()
+    local.add_item(a.resolve())
+    local.task_wait(local.submit_pending_transfer())
+    assert time.time() - start >= 0.4
+
+
+def test_LocalTransfer_task_wait_polling(local, tmp_path, capsys):
+    """task_wait() polls at the interval asked for and prints status each timeout."""
+    a = tmp_path / "src" / "a.dat"
+    a.write_bytes(b"0" * 100)
+    local.latency = 0.5
+    local.add_item(a.resolve())
+    task_id = local.submit_pending_transfer()
+
+    local.task_wait(task_id, timeout=0.2, polling_interval=0.05)
+    assert capsys.readouterr().out.count("Status: ACTIVE") >= 1
+
+
+@pytest.mark.parametrize(
+    "sync_level,change,copied",
+    [
+        (None, None, 1),
+        ("exists", "size", 0),
+        ("size", None, 0),
+        ("size", "size", 1),
+        ("mtime", "older", 0),
+        ("mtime", "newer", 1),
+        ("mtime", "size", 0),  # like Globus the size is not compared
+        ("checksum", None, 0),
+        ("checksum", "content", 1),
+    ],
+)
+def test_LocalTransfer_sync_level(local, tmp_path, sync_level, change, copied):
+    """Files already on the destination are skipped based on sync_level."""
+    a = tmp_path / "src" / "a.txt"
+    a.write_text("hello")
+    dest = tmp_path / "dest" / "a.txt"
+    dest.parent.mkdir()
+    dest.write_text("hello")
+    os.utime(a, (1000, 1000))
+    os.utime(dest, (2000, 2000))
+
+    if change == "size":
+        dest.write_text("hello world")
+    elif change == "content":
+        dest.write_text("HELLO")
+    elif change == "older":
+        os.utime(a, (1500, 1500))
+    elif change == "newer":
+        os.utime(a, (3000, 3000))
+
+    local.sync_level = sync_level
+    local.add_item(a.resolve())
+    task_id = local.submit_pending_transfer()
+    local.task_wait(task_id)
+
+    assert len(list(local.task_successful_transfers(task_id))) == copied
+    assert local.get_task(task_id)["files_skipped"] == 1 - copied
@@ -1,9 +1,12 @@
 import logging
+import os
 import shutil
 import subprocess  # nosec
 import tarfile
+import threading
 
 from SuperTar.exceptions import SuperTarMissmatchedOptions
+from SuperTar.split import member_ranges
 
 logging.getLogger(__name__).addHandler(logging.NullHandler)
 
@@ -214,12 +217,27 @@ class SuperTar:
         subprocess.run(self._flags, check=True)  # nosec
 
     def extract(
-        self, skip_old_files=False, keep_old_files=False, keep_newer_files=False
+        self,
+        skip_old_files=False,
+        keep_old_files=False,
+        keep_newer_files=False,
+        processes=1,
+        range_bytes=None,
+        done_ranges=(),
+        range_done=None,
     ):
-        """Extract the tar listed"""
+        """
+        Extract the tar listed
+
+        Uncompressed tars can be split into ranges of members each extracted by
+        its own tar:
+        processes (int) > 1 run that many tars at once, helps metadata bound filesystems
+        range_bytes (int) limit bytes per range, more ranges make finer checkpoints
+        done_ranges (list) (start, end) ranges already extracted, skipped
+        range_done (callable) called with (start, end) as each range completes
+        """
         # we are extracting an existing tar
         self._flags += ["--extract"]
-        self._flags += ["--file", str(self.filename)]
 
         # These options must be exclusive, if more than one is given outcome is ambigous
         preserve_ops = 0
@@ -243,7 +261,22 @@ class SuperTar:
             )
 
         # set compress program
-        self._setComp(what_comp(self.filename))
+        comp = what_comp(self.filename)
+        if comp is None and (processes > 1 or range_bytes or done_ranges):
+            ranges, dirs = member_ranges(
+                self.filename,
+                processes,
+                path=self._path,
+                done=done_ranges,
+                max_bytes=range_bytes,
+            )
+            # nothing to extract without done ranges means path matches no member,
+            # fall through so tar reports it
+            if ranges is not None and (ranges or done_ranges):
+                return self._extract_ranges(ranges, dirs, processes, range_done)
+
+        self._flags += ["--file", str(self.filename)]
+        self._setComp(comp)
 
         # add path last if set
         if self._path:
@@ -255,3 +288,86 @@ class SuperTar:
             subprocess.run(self._flags, check=True)  # nosec
         except Exception as e:
             logging.error(f"{e}")
+            return False
+        return True
+
+    def _extract_ranges(self, ranges, dirs, processes, range_done=None, bufsize=1 << 20):
+        """Run a tar per byte range of the archive, processes at once, feeding each its range on stdin."""
+        # create directories up front so tars don't race making parents, tars
+        # leave them alone and their metadata is set once all ranges are done
+        for d in sorted(dirs):
+            os.makedirs(d, exist_ok=True)
+
+        flags = self._flags + ["--no-overwrite-dir", "--file", "-"]
+        if self._path:
+            flags.append(str(self._path))
+        logging.debug(
+            f"Tar invoked for {len(ranges)} ranges {processes} at once with: {flags}"
+        )
+
+        def run(start, end):
+            proc = subprocess.Popen(flags, stdin=subprocess.PIPE)  # nosec
+            try:
+                with open(self.filename, "rb") as f:
+                    f.seek(start)
+                    left = end - start
+                    while left > 0 and (chunk := f.read(min(bufsize, left))):
+                        proc.stdin.write(chunk)
+                        left -= len(chunk)
+                    # end of archive marker
+                    proc.stdin.write(b"\0" * 2 * tarfile.BLOCKSIZE)
+            except BrokenPipeError:
+                pass  # tar exited, its return code is checked below
+            finally:
+                proc.stdin.close()
+
+            if proc.wait() != 0:
+                logging.error(
+                    f"tar of {self.filename} bytes {start}-{end} returned {proc.returncode}"
+                )
+                return False
+            if range_done:
+                range_done(start, end)
+            return True
+
+        todo = list(ranges)
+        lock = threading.Lock()
+        results = []
+
+        def worker():
+            while True:
+                with lock:
+                    if not todo:
+                        return
+                    start, end = todo.pop(0)
+                ok = run(start, end)
+                with lock:
+                    results.append(ok)
+
+        threads = [
+            threading.Thread(target=worker) for _ in range(max(min(processes, len(ranges)), 1))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if not all(results):
+            return False  # leave directories writable for a resumed extract
+        self._set_dirs(dirs)
+        return True
+
+    def _set_dirs(self, dirs):
+        """Set mode, owner and times of directory members like tar does at its end."""
+        umask = os.umask(0)
+        os.umask(umask)
+        root = os.geteuid() == 0
+        # deepest first, a read only parent would not stop the children anyway
+        for d, member in sorted(dirs.items(), reverse=True):
+            if member is None:
+                continue
+            if root and "--no-same-owner" not in self._flags:
+                os.chown(d, member.uid, member.gid)
+            if not {"--touch", "-m"} & set(self._flags):
+                os.utime(d, (member.mtime, member.mtime))
+            # users get the archived mode less their umask like tar
+            os.chmod(d, member.mode if root else member.mode & ~umask)
@@ -0,0 +1,113 @@
+"""
+Split an uncompressed tar into byte ranges on member boundaries.
+
+Each range is a valid tar stream on its own so several GNU tar processes can
+extract one archive at once, each reading its range from stdin.  Directories are
+made before and their modes and times set after every range is extracted, a
+tar per range would otherwise set them while other ranges still write inside.
+"""
+import bisect
+import logging
+import os
+import tarfile
+from pathlib import Path
+
+BLOCKSIZE = tarfile.BLOCKSIZE
+
+
+def _safe(name):
+    """Only create directories for relative names that stay under cwd."""
+    return not (os.path.isabs(name) or ".." in Path(name).parts)
+
+
+def _merge(ranges):
+    """Union of (start, end) ranges sorted by start."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _covered(start, end, done, starts):
+    """True if member bytes start-end are inside one of the merged done ranges."""
+    i = bisect.bisect_right(starts, start) - 1
+    return i >= 0 and end <= done[i][1]
+
+
+def member_ranges(filename, parts, path=None, done=(), max_bytes=None):
+    """
+    Split members of uncompressed tar filename into ranges of about equal bytes.
+
+    Only the headers are read, tarfile seeks past member data.
+
+    Parameters:
+        filename (str/pathlib) Uncompressed tar
+        parts (int) Number of ranges wanted
+        path (str) Optional folder, only ranges holding members under it are returned
+        done (list) (start, end) ranges already extracted, members inside are skipped
+        max_bytes (int) Optional upper limit of bytes per range, more ranges than parts
+
+    Returns:
+        ranges (list) of (start, end) byte offsets, None if the tar must be read in one stream
+        dirs (dict) directories members will be created in, the TarInfo of those
+            that are members themselves else None
+    """
+    done = _merge(done)
+    starts = [d[0] for d in done]
+    members = []  # (offset, end, name, skip_before)
+    dirs = {}
+    skipped = False  # a done member was passed, don't span it with a range
+    with tarfile.open(filename, "r:") as tar:
+        for m in tar:
+            if m.islnk():
+                # hard link target may be in another range and not exist yet
+                logging.debug(f"{filename} has hard links not splitting")
+                return None, {}
+            if m.issparse():
+                # size is the expanded size not the bytes stored in the tar
+                logging.debug(f"{filename} has sparse members not splitting")
+                return None, {}
+            end = m.offset_data + (m.size + BLOCKSIZE - 1) // BLOCKSIZE * BLOCKSIZE
+            if m.issym() or m.isdir():
+                end = m.offset_data
+            if path and not (
+                m.name == path.rstrip("/") or m.name.startswith(path.rstrip("/") + "/")
+            ):
+                continue
+            if m.isdir() and _safe(m.name):
+                # also of done ranges, a resumed extract sets them again at the end
+                dirs[m.name.rstrip("/")] = m
+            if _covered(m.offset, end, done, starts):
+                skipped = True
+                continue
+            members.append((m.offset, end, m.name, skipped))
+            skipped = False
+
+    for _, _, name, _ in members:
+        if _safe(name):
+            dirs.setdefault(os.path.dirname(name.rstrip("/")), None)
+    dirs.pop("", None)
+
+    if not members:
+        return [], dirs
+
+    total = sum(end - start for start, end, _, _ in members)
+    target = total / max(parts, 1)
+    if max_bytes:
+        target = min(target, max_bytes)
+
+    ranges = []
+    start, size = members[0][0], 0
+    for i, (m_start, m_end, _, _) in enumerate(members):
+        size += m_end - m_start
+        last = i == len(members) - 1
+        if last or size >= target or members[i + 1][3]:
+            ranges.append((start, m_end))
+            if not last:
+                start, size = members[i + 1][0], 0
+
+    logging.debug(f"Split {filename} into {len(ranges)} ranges of ~{int(target)} bytes")
+    return ranges, dirs
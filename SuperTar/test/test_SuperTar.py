@@ -1,3 +1,4 @@
+import io
 import logging
 import os
 import shutil
@@ -13,6 +14,7 @@ from conftest import count_files_dir
 
 from SuperTar import SuperTar, what_comp
 from SuperTar.exceptions import SuperTarMissmatchedOptions
+from SuperTar.split import member_ranges
 
 
 @pytest.mark.parametrize(
@@ -247,3 +249,118 @@ def test_SuperTar_extract_preserve_errors(
 
         num_files = count_files_dir(tmp_path)
         assert num_files == 1  # no untar, origonal only
+
+
+@pytest.fixture
+def big_tar(tmp_path):
+    """Uncompressed tar with several files in nested folders."""
+    os.chdir(tmp_path)
+    names = [f"d{i % 3}/sub/f{i}" for i in range(12)]
+    with tarfile.open("big.tar", "w") as tar:
+        for name in names:
+            Path(name).parent.mkdir(parents=True, exist_ok=True)
+            Path(name).write_bytes(os.urandom(1000 + 700 * int(name.split("f")[-1])))
+            tar.add(name)
+    contents = {name: Path(name).read_bytes() for name in names}
+    for d in ["d0", "d1", "d2"]:
+        shutil.rmtree(d)
+    return Path("big.tar").resolve(), contents
+
+
+def test_member_ranges(big_tar):
+    """Ranges cover every member once on header boundaries."""
+    filename, contents = big_tar
+    ranges, dirs = member_ranges(filename, 4)
+    assert 1 < len(ranges) <= 4
+    assert set(dirs) == {"d0/sub", "d1/sub", "d2/sub"}
+    offsets = {m.offset for m in tarfile.open(filename)}
+    for start, end in ranges:
+        assert start in offsets
+    assert ranges == sorted(ranges)
+
+
+@pytest.mark.parametrize("path", [None, "d1"])
+def test_SuperTar_extract_processes(tmp_path, big_tar, path):
+    """Split extraction gives the same files as one tar."""
+    filename, contents = big_tar
+    st = SuperTar(filename=filename, path=path)
+    st.extract(processes=3)
+
+    for name, data in contents.items():
+        if path is None or name.startswith(path):
+            assert Path(name).read_bytes() == data
+        else:
+            assert not Path(name).exists()
+
+
+def test_SuperTar_extract_processes_no_match(big_tar):
+    """A path no member matches fails like a single tar."""
+    filename, contents = big_tar
+    st = SuperTar(filename=filename, path="missing")
+    assert not st.extract(processes=3)
+
+
+def test_member_ranges_hardlink(tmp_path):
+    """Hard links are not split as the target may be in another range."""
+    os.chdir(tmp_path)
+    Path("a").write_text("a")
+    os.link("a", "b")
+    with tarfile.open("links.tar", "w") as tar:
+        tar.add("a")
+        tar.add("b")
+    ranges, _ = member_ranges("links.tar", 2)
+    assert ranges is None
+
+
+def test_member_ranges_done(big_tar):
+    """Members inside done ranges are left out and not spanned by a range."""
+    filename, contents = big_tar
+    members = tarfile.open(filename).getmembers()
+    # second and fourth member done
+    done = [(members[1].offset, members[2].offset), (members[3].offset, members[4].offset)]
+    ranges, _ = member_ranges(filename, 1, done=done)
+    assert ranges[0] == (members[0].offset, members[1].offset)
+    assert ranges[1] == (members[2].offset, members[3].offset)
+    for start, end in ranges:
+        for d_start, d_end in done:
+            assert end <= d_start or start >= d_end
+
+
+def test_SuperTar_extract_processes_dirs(tmp_path):
+    """Directory modes and times are set once every range is done like one tar."""
+    os.chdir(tmp_path)
+    old = 978307200  # 2001-01-01
+    with tarfile.open("dirs.tar", "w") as tar:
+        d = tarfile.TarInfo("d")
+        d.type, d.mode, d.mtime = tarfile.DIRTYPE, 0o555, old
+        tar.addfile(d)
+        for i in range(6):
+            data = os.urandom(3000)
+            f = tarfile.TarInfo(f"d/f{i}")
+            f.size, f.mtime = len(data), old
+            tar.addfile(f, fileobj=io.BytesIO(data))
+
+    st = SuperTar(filename=Path("dirs.tar"))
+    assert st.extract(processes=3, range_bytes=4096)
+    assert len(list(Path("d").iterdir())) == 6
+    assert os.stat("d").st_mtime == old
+    assert os.stat("d").st_mode & 0o777 == 0o555
+
+
+def test_member_ranges_sparse(tmp_path):
+    """Sparse members are stored shorter than their size, not split."""
+    os.chdir(tmp_path)
+    with open("sparse", "wb") as f:
+        f.truncate(1 << 20)
+        f.write(b"data")
+    Path("other").write_text("other")
+    subprocess.run(["tar", "--sparse", "-cf", "sparse.tar", "sparse", "other"], check=True)
+    assert any(m.issparse() for m in tarfile.open("sparse.tar"))
+    ranges, _ = member_ranges("sparse.tar", 2)
+    assert ranges is None
+
+    os.unlink("sparse")
+    os.unlink("other")
+    assert SuperTar(filename=Path("sparse.tar")).extract(processes=2)
+    assert os.path.getsize("sparse") == 1 << 20
+    assert Path("other").read_text() == "other"
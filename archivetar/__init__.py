@@ -18,11 +18,10 @@
 # * mpibzip2
 
 import datetime
-import hashlib
+import functools
 import logging
 import multiprocessing as mp
-import os
-import re
+import queue
 import sys
 import tempfile
 from pathlib import Path
@@ -32,11 +31,25 @@ import humanfriendly
 from environs import Env
 
 from archivetar.archive_args import parse_args
-from archivetar.exceptions import ArchivePrefixConflict, TarError
+from archivetar.checksum import sha1_of, sha256_of  # noqa: F401 re-export
+from archivetar.dwalk import DwalkLine, DwalkParser  # noqa: F401 re-export
+from archivetar.exceptions import (
+    ArchivePrefixConflict,
+    ArchiveTarArchiveError,
+    TarError,
+)
+from archivetar import listing
+from archivetar.journal import Journal
+from archivetar.launch import log_runs, mpi_kwargs, runs
+from archivetar.manifest import MANIFEST_SUFFIX, write_manifest
+from archivetar.purge import purge_members
+from archivetar.report import RunReport, tar_result, timed
+from archivetar.space import SpaceScheduler, preflight, wait_for_space
 from archivetar.unarchivetar import find_prefix_files
-from GlobusTransfer import GlobusTransfer
+from GlobusTransfer import GlobusTransfer, LocalTransfer
 from GlobusTransfer.exceptions import GlobusError, GlobusFailedTransfer
-from mpiFileUtils import DWalk
+from mpiFileUtils import DTar, DWalk
+from mpiFileUtils.exceptions import mpiFileUtilsError
 from SuperTar import SuperTar
 
 # load in config from .env
@@ -46,146 +59,6 @@ env = Env()
 # env.read_env()  # read .env file, if it exists
 
 
-# defaults used for development
-# overridden with AT_MPIRUN and AT_MPIFILEUTILS
-fileutils = "/sw/pkgs/arc/archivetar/0.17.0/install"
-mpirun = "/sw/pkgs/arc/stacks/gcc/10.3.0/openmpi/4.1.6/bin/mpirun"
-
-
-class DwalkLine:
-    def __init__(
-        self, line=False, relativeto=False, stripcwd=True, follow_symlinks=False
-    ):
-        """parse dwalk output line"""
-        # -rw-r--r-- bennet support 578.000  B Oct 22 2019 09:35 /scratch/support_root/support/bennet/haoransh/DDA_2D_60x70_kulow_1.batch
-        # lrwxrwxrwx brockp support_root  13.000  B Apr  1 2026 16:52 /gpfs/accounts/support_root/support/brockp/box-copy/brockscan
-        match = re.match(
-            rb"(\S+)\s+\S+\s+\S+\s+(\d+\.\d+)\s+(\S+)\s+.+\s(/.+)", line, re.DOTALL
-        )  # use re.DOTALL to match newlines in filenames
-
-        perms = match[1]
-        count = float(match[2])
-        units = match[3]
-        path = match[4]
-        if relativeto:
-            self.relativeto = relativeto
-        else:
-            self.relativeto = os.getcwd()
-
-        size_bytes = self._normalizeunits(units=units, count=count)  # size in bytes
-
-        # if symlink, overwrite with target size
-        self.is_symlink = perms.startswith(b"l")
-        if self.is_symlink and follow_symlinks:
-            try:
-                # os.stat follows symlinks -> target size
-                size_bytes = os.stat(path.rstrip(b"\r\n")).st_size
-            except FileNotFoundError:
-                logging.warning(f"Dangling Link {path!r} points to nothing")
-                pass
-            except PermissionError as e:
-                raise PermissionError(
-                    f"Link {path!r} points to something we cannot read"
-                ) from e
-
-        self.size = size_bytes
-
-        if stripcwd:
-            self.path = self._stripcwd(path)
-        else:
-            self.path = path
-
-    def _normalizeunits(self, units=False, count=False):
-        """convert size by SI units to Bytes"""
-        units = units.decode()  # convert binary data to string type
-        # SI powers, e.g., 1 KB = 10**3 bytes
-        SI_powers = dict(B=0, KB=3, MB=6, GB=9, TB=12, PB=15)
-        try:
-            num_bytes = count * 10 ** SI_powers[units]
-        except KeyError as ex:
-            raise Exception(f"{units} is not a known SI unit")
-        return num_bytes
-
-    def _stripcwd(self, path):
-        """dwalk print absolute paths, we need relative"""
-        return os.path.relpath(path, self.relativeto.encode())
-
-
-class DwalkParser:
-    def __init__(self, path=False):
-        # check that path exists
-        path = Path(path)
-        self.indexcount = 1
-        if path.is_file():
-            logging.debug(f"using {path} as input for DwalkParser")
-            self.path = path.open("br")
-        else:
-            raise Exception(f"{self.path} doesn't exist")
-
-    def getpath(self, stripcwd=False):
-        """Get path one line at a time."""
-        for line in self.path:
-            pl = DwalkLine(line=line, stripcwd=stripcwd)
-            yield pl.path
-
-    def tarlist(
-        self,
-        prefix="archivetar",
-        minsize=1e9 * 100,
-        bundle_path=None,
-        follow_symlinks=False,
-    ):  # prefix for files
-        # min size sum of all files in list
-        # bundle_path where should indexes and files be created
-        # OUT tar list suitable for gnutar
-        # OUT index list
-        """takes dwalk output walks though until sum(size) >= minsize"""
-
-        logging.debug(f"minsize is set to {minsize} B")
-
-        if bundle_path:
-            # set outpath to this location
-            outpath = Path(bundle_path)
-        else:
-            # set to cwd
-            outpath = Path.cwd()
-
-        logging.debug(f"Indexes and lists will be written to: {outpath}")
-
-        tartmp_p = (
-            outpath / f"{prefix}-{self.indexcount}.DONT_DELETE.txt"
-        )  # list of files suitable for gnutar
-        index_p = outpath / f"{prefix}-{self.indexcount}.index.txt"
-        sizesum = 0  # size in bytes thus far
-        index = index_p.open("wb")
-        tartmp = tartmp_p.open("wb")
-        for line in self.path:
-            pl = DwalkLine(line=line, follow_symlinks=follow_symlinks)
-            sizesum += pl.size
-            index.write(line)  # already has newline
-            tartmp.write(pl.path)  # already has newline (binary)
-            if sizesum >= minsize:
-                # max size in tar reached
-                tartmp.close()
-                index.close()
-                logging.info(
-                    f"Minimum Archive Size {humanfriendly.format_size(minsize)} reached, Expected size: {humanfriendly.format_size(sizesum)}"
-                )
-                yield self.indexcount, index_p, tartmp_p
-                self.indexcount += 1
-                # continue after yeilding file paths back to program
-                sizesum = 0
-                tartmp_p = (
-                    outpath / f"{prefix}-{self.indexcount}.DONT_DELETE.txt"
-                )  # list of files suitable for gnutar
-                index_p = outpath / f"{prefix}-{self.indexcount}.index.txt"
-                index = index_p.open("wb")
-                tartmp = tartmp_p.open("wb")
-        index.close()  # close and return for final round
-        tartmp.close()
-        yield self.indexcount, index_p, tartmp_p
-
-
 #############  MAIN  ################
 
 
@@ -221,6 +94,49 @@ def get_relative_path(filepath, cwd=None):
     return str(rel)
 
 
+def transfer_from_args(args):
+    """
+    Create the transfer backend for this run from the CLI arguments.
+
+    Globus unless AT_TRANSFER_BACKEND=local which copies into --destination-dir on the
+    local filesystem, optionally slowed by AT_LOCAL_TRANSFER_LATENCY (seconds) and
+    AT_LOCAL_TRANSFER_BANDWIDTH (eg. 500M per second).
+
+    args (argparse): Arguments struct
+
+    returns:
+        TransferBackend
+    """
+    kwargs = {
+        # note notify are the reverse of the SDK
+        "notify_on_succeeded": args.no_notify_on_succeeded,
+        "notify_on_failed": args.no_notify_on_failed,
+        "notify_on_inactive": args.no_notify_on_inactive,
+        "fail_on_quota_errors": args.fail_on_quota_errors,
+        "skip_source_errors": args.skip_source_errors,
+        "preserve_timestamp": args.preserve_timestamp,
+        "sync_level": args.sync_level,
+    }
+
+    backend = env.str("AT_TRANSFER_BACKEND", default="globus").lower()
+    if backend == "local":
+        bandwidth = env.str("AT_LOCAL_TRANSFER_BANDWIDTH", default=None)
+        return LocalTransfer(
+            args.source,
+            args.destination,
+            args.destination_dir,
+            latency=env.float("AT_LOCAL_TRANSFER_LATENCY", default=0.0),
+            bandwidth=humanfriendly.parse_size(bandwidth) if bandwidth else None,
+            **kwargs,
+        )
+    elif backend == "globus":
+        return GlobusTransfer(
+            args.source, args.destination, args.destination_dir, **kwargs
+        )
+    else:
+        raise ValueError(f"Unknown AT_TRANSFER_BACKEND {backend}")
+
+
 def globus_transfer_singleton(args, path, label="Globus Singleton"):
     """
     Transfer a single file using globus with default options.
@@ -232,18 +148,7 @@ def globus_transfer_singleton(args, path, label="Globus Singleton"):
     returns:
         taskid (str): Globus task id
     """
-    globus = GlobusTransfer(
-        args.source,
-        args.destination,
-        args.destination_dir,
-        # note notify are the reverse of the SDK
-        notify_on_succeeded=args.no_notify_on_succeeded,
-        notify_on_failed=args.no_notify_on_failed,
-        notify_on_inactive=args.no_notify_on_inactive,
-        fail_on_quota_errors=args.fail_on_quota_errors,
-        skip_source_errors=args.skip_source_errors,
-        preserve_timestamp=args.preserve_timestamp,
-    )
+    globus = transfer_from_args(args)
     globus.add_item(Path(path).resolve(), label=f"{label}: {args.prefix}")
     taskid = globus.submit_pending_transfer()
     logging.info(f"Globus Transfer: {label} taskid: {taskid}")
@@ -266,24 +171,6 @@ def create_sha1_manifest_from_file(path):
     return sha_list
 
 
-def sha1_of(path, bufsize=1 << 20):
-    """
-    Calculate a sha1 hash of a given file.
-
-    Globus currently uses sha1 for checksums
-
-    Parameters:
-        path (str/pathlib) Path to file
-        bufsize (int) Size of buffer to read at a time
-    """
-    h = hashlib.sha1(usedforsecurity=False)
-    logging.debug(f"Calculating Checksum for {path}")
-    with Path(path).open("rb") as f:
-        while chunk := f.read(bufsize):
-            h.update(chunk)
-    return h.hexdigest()
-
-
 def create_sha256_manifest_from_file(path):
     """
     Create a manifest file suitable for sha256sum -c from a file containing lists of files
@@ -298,23 +185,9 @@ def create_sha256_manifest_from_file(path):
     return sha_list
 
 
-def sha256_of(path, bufsize=1 << 20):
-    """
-    Calculate a shaw256 hash of a given file.
-
-    Parameters:
-        path (str/pathlib) Path to file
-        bufsize (int) Size of buffer to read at a time
-    """
-    h = hashlib.sha256(usedforsecurity=False)
-    logging.debug(f"Calculating Checksum for {path}")
-    with Path(path).open("rb") as f:
-        while chunk := f.read(bufsize):
-            h.update(chunk)
-    return h.hexdigest()
-
-
-def build_list(path=False, prefix=False, savecache=False, filters=None):
+def build_list(
+    path=False, prefix=False, savecache=False, filters=None, walker="dwalk", workers=8
+):
     """
     scan filelist and return path to results
 
@@ -323,10 +196,26 @@ def build_list(path=False, prefix=False, savecache=False, filters=None):
         prefix (str) Prefix for scan file eg. prefix-{date}.cache
         savecache (bool) Save cache file in cwd or only in TMPDIR
         filters (args) HACK pass in argparser for passing filter options eg --atime
+        walker (str) dwalk or python to scan without MPI into a text list prefix-{date}.txt
+        workers (int) Processes scanning at once with walker python
 
     Returns:
         cache (pathlib) Path to cache file
     """
+    if walker == "python":
+        today = datetime.datetime.today()
+        datestr = today.strftime("%Y-%m-%d-%H-%M-%S")
+        c_path = Path.cwd() if savecache else Path(tempfile.gettempdir())
+        cache = c_path / f"{prefix}-{datestr}.txt"
+        print(f"Scan saved to {cache}")
+        listing.scan(
+            path,
+            cache,
+            filters=listing.StatFilter.from_args(filters),
+            workers=workers,
+            runs=runs,
+        )
+        return cache
 
     # build filter list
     filter = ["--distribution", "size:0,1K,1M,10M,100M,1G,10G,100G,1T"]
@@ -346,8 +235,7 @@ def build_list(path=False, prefix=False, savecache=False, filters=None):
 
     # configure DWalk
     dwalk = DWalk(
-        inst=env.str("AT_MPIFILEUTILS", default=fileutils),
-        mpirun=env.str("AT_MPIRUN", default=mpirun),
+        **mpi_kwargs(),
         sort="name",
         filter=filter,
         progress="10",
@@ -369,7 +257,7 @@ def build_list(path=False, prefix=False, savecache=False, filters=None):
     return cache
 
 
-def filter_list(path=False, size=False, prefix=False, purgelist=False):
+def filter_list(path=False, size=False, prefix=False, purgelist=False, walker="dwalk"):
     """
     Take cache list and filter it into two lists
     Files greater than size and those less than
@@ -379,18 +267,21 @@ def filter_list(path=False, size=False, prefix=False, purgelist=False):
         size (int) size in bytes to filter on
         prefix (str) Prefix for scanfiles
         purgelist (bool) Save the undersize  cache in CWD for purges
+        walker (str) dwalk or python for a text list from build_list(walker="python")
 
     Returns:
         TODO o_textout (pathlib) Path to files over or equal size text format
         TODO o_cacheout (pathlib) Path to files over or equal size mpifileutils bin format
         u_textout (pathlib) Path to files under size text format
         u_cacheout (pathlib) Path to files under size mpifileutils bin format
+            or text with walker python
     """
+    if walker == "python":
+        return listing.split(path, size, prefix, purgelist=purgelist)
 
     # configure DWalk
     under_dwalk = DWalk(
-        inst=env.str("AT_MPIFILEUTILS", default=fileutils),
-        mpirun=env.str("AT_MPIRUN", default=mpirun),
+        **mpi_kwargs(),
         sort="name",
         progress="10",
         filter=["--type", "f", "--size", f"-{size}"],
@@ -407,8 +298,7 @@ def filter_list(path=False, size=False, prefix=False, purgelist=False):
 
     # get the list of all symlinks
     symlink_dwalk = DWalk(
-        inst=env.str("AT_MPIFILEUTILS", default=fileutils),
-        mpirun=env.str("AT_MPIRUN", default=mpirun),
+        **mpi_kwargs(),
         sort="name",
         progress="10",
         filter=["--type", "l"],  # don't set size so even --size 0B works
@@ -428,8 +318,7 @@ def filter_list(path=False, size=False, prefix=False, purgelist=False):
 
     # get the list of files larger than
     over_dwalk = DWalk(
-        inst=env.str("AT_MPIFILEUTILS", default=fileutils),
-        mpirun=env.str("AT_MPIRUN", default=mpirun),
+        **mpi_kwargs(),
         sort="name",
         progress="10",
         filter=["--type", "f", "--size", f"+{size}"],
@@ -444,8 +333,7 @@ def filter_list(path=False, size=False, prefix=False, purgelist=False):
 
     # get the list of files exactly equal to
     at_dwalk = DWalk(
-        inst=env.str("AT_MPIFILEUTILS", default=fileutils),
-        mpirun=env.str("AT_MPIRUN", default=mpirun),
+        **mpi_kwargs(),
         sort="name",
         progress="10",
         filter=["--type", "f", "--size", f"{size}"],
@@ -466,102 +354,726 @@ def filter_list(path=False, size=False, prefix=False, purgelist=False):
     return u_textout, u_cacheout, o_textout
 
 
-def process(q, out_q, iolock, args):
+def count_lines(path):
+    """Number of lines in the file path eg. files in a tar list."""
+    lines = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+    return lines
+
+
+def process(q, out_q, iolock, args, cleanup_q=None, pending=None):
+    """
+    Pool worker create a tar, checksums and upload for each tar list on q.
+
+    With --rm-at-files uploads are handed to the cleanup stage on cleanup_q and
+    pending tracks bytes waiting to be removed so new tars pause while the bundle dir
+    is over --high-water.
+
+    With --stream-purge the files in each tar are deleted here once the tar is made
+    (tar) or by the cleanup stage once the upload succeeded (upload).
+
+    Puts a TarResult on out_q for every tar, with the seconds and CPU seconds of
+    each stage so the main process can tell CPU bound tars from I/O bound ones.
+    """
     while True:
-        q_args = q.get()  # tuple (t_args, tar_list, index)
+        q_args = q.get()  # tuple (number, t_args, tar_list, index, size)
         if q_args is None:
             break
+        number, t_args, tar_list, index, in_bytes = q_args
+        taskid = None
+        timings = {}  # stage: seconds for the run report
+        cpu = {}  # stage: CPU seconds of the worker and tar, compressor etc.
+        result = functools.partial(
+            tar_result, index=number, in_bytes=in_bytes, timings=timings, cpu=cpu
+        )
         try:
-            t_args, tar_list, index = q_args
-            with iolock:
-                tar = SuperTar(**t_args)  # call inside the lock to keep stdout pretty
-                tar.addfromfile(tar_list)
-            tar.archive()  # this is the long running portion so let run outside the lock it prints nothing anyway
+            if cleanup_q is not None:
+                with timed(timings, "space", cpu):
+                    wait_for_space(
+                        args.bundle_dir or Path.cwd(), args.high_water, pending
+                    )
+            if args.tar_engine == "dtar":
+                with timed(timings, "tar", cpu):
+                    # many ranks read into one tar, options were checked by parse_args()
+                    tar = DTar(**mpi_kwargs(), progress="10")
+                    tar.createfromfile(filename=t_args["filename"], path=tar_list)
+            else:
+                with timed(timings, "lock", cpu):
+                    iolock.acquire()  # waiting on other workers isn't tar time
+                try:
+                    with timed(timings, "tar", cpu):
+                        # call inside the lock to keep stdout pretty
+                        tar = SuperTar(**t_args)
+                        tar.addfromfile(tar_list)
+                finally:
+                    iolock.release()
+                with timed(timings, "tar", cpu):
+                    tar.archive()  # this is the long running portion so let run outside the lock it prints nothing anyway
             filesize = Path(tar.filename).stat().st_size
+            member_count = count_lines(tar_list)
 
             # create checksums for tared files
             checksum_manifest = None
             if args.checksum:
                 logging.debug(f"Checksums requested making for files in tar {tar_list}")
-                checksum_manifest = create_sha1_manifest_from_file(tar_list)
+                with timed(timings, "checksum", cpu):
+                    checksum_manifest = create_sha1_manifest_from_file(tar_list)
+
+            # files describing the tar, uploaded and removed along with it
+            sidecars = [Path(tar_list).resolve(), Path(index).resolve()]
+            if checksum_manifest is not None:
+                checksum_p = checksum_manifest.resolve()
+                if checksum_p.is_file():
+                    sidecars.append(checksum_p)
+                else:
+                    logging.info(
+                        f"Skipping checksum for {tar.filename}: file does not exist"
+                    )
+
+            if args.manifest:
+                # combine list, index and checksums into one object
+                with timed(timings, "manifest", cpu):
+                    manifest = write_manifest(
+                        tar.filename, tar_list, index, checksum_manifest
+                    ).resolve()
+                for sidecar in sidecars:
+                    sidecar.unlink()
+                sidecars = [manifest]
+            # list of what is in the tar for --stream-purge
+            members = sidecars[0] if args.manifest else Path(tar_list).resolve()
 
             with iolock:
                 logging.info(
                     f"Complete {tar.filename} Size: {humanfriendly.format_size(filesize)}"
                 )
                 if args.destination_dir:  # if globus destination is set upload
-                    globus = GlobusTransfer(
-                        args.source,
-                        args.destination,
-                        args.destination_dir,
-                        # note notify are the reverse of the SDK
-                        notify_on_succeeded=args.no_notify_on_succeeded,
-                        notify_on_failed=args.no_notify_on_failed,
-                        notify_on_inactive=args.no_notify_on_inactive,
-                        fail_on_quota_errors=args.fail_on_quota_errors,
-                        skip_source_errors=args.skip_source_errors,
-                        preserve_timestamp=args.preserve_timestamp,
-                    )
-                    path = Path(tar.filename).resolve()
-                    logging.debug(f"Adding file {path} to Globus Transfer")
-                    globus.add_item(path, label=f"{path.name}", in_root=True)
-                    tar_list = Path(tar_list).resolve()
-                    logging.debug(f"Adding file {tar_list} to Globus Transfer")
-                    globus.add_item(tar_list, label=f"{path.name}", in_root=True)
-                    index_p = Path(index).resolve()
-                    logging.debug(f"Adding file {index_p} to Globus Transfer")
-                    globus.add_item(index_p, label=f"{path.name}", in_root=True)
-
-                    # only add checksums if they exist
-                    if checksum_manifest is not None:
-                        checksum_p = checksum_manifest.resolve()
-                        if checksum_p.is_file():
-                            logging.debug(
-                                f"Adding file {checksum_p} to Globus Transfer"
-                            )
-                            globus.add_item(
-                                checksum_p, label=f"{path.name}", in_root=True
-                            )
-                        else:
-                            logging.info(
-                                f"Skipping checksum for {path.name}: file does not exist"
-                            )
-
-                    taskid = globus.submit_pending_transfer()
+                    with timed(timings, "upload", cpu):
+                        globus = transfer_from_args(args)
+                        path = Path(tar.filename).resolve()
+                        logging.debug(f"Adding file {path} to Globus Transfer")
+                        globus.add_item(path, label=f"{path.name}", in_root=True)
+                        for sidecar in sidecars:
+                            logging.debug(f"Adding file {sidecar} to Globus Transfer")
+                            globus.add_item(sidecar, label=f"{path.name}", in_root=True)
+
+                        taskid = globus.submit_pending_transfer()
                     logging.info(
                         f"Globus Transfer of Small file tar {path.name} : {taskid}"
                     )
 
-            if (
-                args.wait or args.rm_at_files
-            ):  # wait for globus transfers to finish, in own block to avoid iolock
-                globus.task_wait(taskid)
-                if args.rm_at_files:  # delete the AT created files tar, index, etc
-                    logging.info(f"Deleting {path}")
-                    path.unlink()
-                    logging.info(f"Deleting {tar_list}")
-                    tar_list.unlink()
-                    logging.info(f"Deleting {index_p}")
-                    index_p.unlink()
-                    if checksum_p.is_file():
-                        logging.info(f"Deleting {checksum_p}")
-                        checksum_p.unlink()
+            at_files = [Path(tar.filename).resolve()] + sidecars
+            Journal(journal_path(args)).record(
+                "tarred",
+                index=number,
+                size=filesize,
+                taskid=taskid,
+                files=[str(f) for f in at_files],
+                members=str(members),
+            )
+
+            if args.stream_purge == "tar":
+                with timed(timings, "purge", cpu):
+                    purge_members(members)
+                Journal(journal_path(args)).record("purged", index=number)
+
+            if cleanup_q is not None:
+                # hand off to cleanup stage to delete the AT created files tar, index, etc
+                if not args.rm_at_files:
+                    at_files = []  # only --stream-purge upload
+                purge = members if args.stream_purge == "upload" else None
+                with pending.get_lock():
+                    pending.value += sum(f.stat().st_size for f in at_files)
+                cleanup_q.put((taskid, at_files, purge))
+            elif args.wait:
+                # wait for globus transfers to finish, in own block to avoid iolock
+                with timed(timings, "wait", cpu):
+                    globus.task_wait(taskid)
         except GlobusFailedTransfer as e:
-            logging.error(f"error with globus transfer of: {tar.filename}")
-            out_q.put((-1, tar.filename, e))
+            logging.error(f"error with globus transfer of: {t_args['filename']}")
+            out_q.put(result(rc=-1, filename=str(t_args["filename"]), exception=e))
             raise e
         except CalledProcessError as e:
-            logging.error(f"error with external tar process: {tar.filename}")
-            out_q.put((-1, tar.filename, e))
+            logging.error(f"error with external tar process: {t_args['filename']}")
+            out_q.put(result(rc=-1, filename=str(t_args["filename"]), exception=e))
+            raise e
+        except mpiFileUtilsError as e:
+            logging.error(f"error with dtar process: {t_args['filename']}")
+            out_q.put(result(rc=-1, filename=str(t_args["filename"]), exception=e))
             raise e
-        except Exception as e:
+        except BaseException as e:
             # something bad happened put it on the out_q for return code
-            logging.error(f"Unknown error in worker process for: {tar.filename}")
-            out_q.put((-1, tar.filename, e))
+            # always report, main() waits for a result from every tar it started
+            # repr as not every exception pickles through the queue
+            logging.error(f"Unknown error in worker process for: {t_args['filename']}")
+            out_q.put(
+                result(rc=-1, filename=str(t_args["filename"]), exception=repr(e))
+            )
             raise e
         else:
             # no issues put on were ok
-            out_q.put((0, tar.filename, None))
+            out_q.put(
+                result(
+                    rc=0,
+                    filename=str(tar.filename),
+                    out_bytes=filesize,
+                    members=member_count,
+                )
+            )
+
+
+# polls of a transfer in a row that may raise before cleanup gives up on it
+CLEANUP_POLL_ERRORS = 10
+
+
+def _release(pending, freed):
+    """Take bytes no longer waiting on cleanup off pending."""
+    with pending.get_lock():
+        pending.value -= freed
+
+
+def cleanup(cleanup_q, pending, args):
+    """
+    Cleanup stage for --rm-at-files and --stream-purge upload.
+
+    Receives (taskid, [files], members) from the tar workers and deletes the files as
+    soon as each transfer succeeds rather than blocking the worker that made them.
+    If members is set the files archived in the tar, listed in it, go first.
+    Errors are handled per transfer and always release its bytes from pending.
+    Exits non zero if any transfer failed leaving its files in place.
+    """
+    try:
+        globus = transfer_from_args(args)
+    except (Exception, GlobusError) as e:
+        # run_tars() sees this process exit and stops the run
+        logging.error(f"Cleanup stage could not start: {e}")
+        sys.exit(1)
+    waiting = []  # [(taskid, [files], members)] submitted but not finished
+    sizes = {}  # taskid: bytes added to pending for it
+    errors = {}  # taskid: polls in a row that raised
+    failed = False
+    done = False
+    while not done or waiting:
+        try:
+            # block when idle otherwise come back to poll transfers
+            item = cleanup_q.get(
+                timeout=globus.polling_interval if waiting else None
+            )
+        except queue.Empty:
+            item = False
+
+        if item is None:
+            done = True
+        elif item:
+            waiting.append(item)
+            sizes[item[0]] = sum(f.stat().st_size for f in item[1] if f.exists())
+
+        for item in list(waiting):
+            taskid, at_files, members = item
+            try:
+                if not globus.task_finished(taskid):
+                    continue
+            except GlobusFailedTransfer as e:
+                logging.error(f"Transfer {taskid} failed not deleting {at_files}: {e}")
+                failed = True
+                waiting.remove(item)
+                _release(pending, sizes.pop(taskid, 0))
+                continue
+            except (Exception, GlobusError) as e:
+                # eg. Globus API or network error, try again next poll
+                errors[taskid] = errors.get(taskid, 0) + 1
+                if errors[taskid] < CLEANUP_POLL_ERRORS:
+                    logging.warning(f"Could not check transfer {taskid}: {e}")
+                    continue
+                logging.error(
+                    f"Giving up on transfer {taskid} not deleting {at_files}: {e}"
+                )
+                failed = True
+                waiting.remove(item)
+                _release(pending, sizes.pop(taskid, 0))
+                continue
+
+            waiting.remove(item)
+            try:
+                if members:
+                    purge_members(members)
+                for f in at_files:
+                    logging.info(f"Deleting {f}")
+                    f.unlink(missing_ok=True)
+                Journal(journal_path(args)).record("removed", taskid=taskid)
+            except (Exception, GlobusError) as e:
+                logging.error(f"Cleanup of transfer {taskid} failed: {e}")
+                failed = True
+            finally:
+                # never leave workers waiting on space that won't be freed
+                _release(pending, sizes.pop(taskid, 0))
+
+    sys.exit(1 if failed else 0)
+
+
+def journal_path(args):
+    """Run journal <prefix>.archivetar.journal in the bundle dir."""
+    return Path(args.bundle_dir or Path.cwd()) / f"{args.prefix}.archivetar.journal"
+
+
+def report_path(args, suffix="report.json"):
+    """Run report <prefix>.archivetar.<suffix> in the bundle dir."""
+    return Path(args.bundle_dir or Path.cwd()) / f"{args.prefix}.archivetar.{suffix}"
+
+
+def write_report(args, report, status):
+    """Write the run report and with --prometheus its textfile collector file."""
+    path = report_path(args)
+    try:
+        report.write(path, status=status)
+        logging.info(f"Run report {path}")
+        if args.prometheus:
+            report.write_prometheus(report_path(args, "prom"), status=status)
+    except OSError as e:
+        # the archive is done either way, don't fail it over the report
+        logging.warning(f"Could not write run report {path}: {e}")
+
+
+def load_run(journal):
+    """
+    State of an interrupted run from its journal.
+
+    Returns dict:
+        cache (str) Phase 1 scan
+        large (bool) files over --size were handled
+        large_taskid, large_checksum_taskid (str) Globus tasks of files over --size
+        planned (bool) every tar list was written
+        work (list) (index, t_args, tar_list, index_p) of each tar
+        sizes (dict) expected bytes of each tar by index
+        tarred (dict) index: record of tars made and uploads submitted
+        removed (set) taskids whose files --rm-at-files deleted
+        purged (set) indexes whose files --stream-purge tar deleted
+    """
+    state = {
+        "cache": None,
+        "large": False,
+        "large_taskid": None,
+        "large_checksum_taskid": None,
+        "planned": False,
+        "work": [],
+        "sizes": {},
+        "tarred": {},
+        "removed": set(),
+        "purged": set(),
+    }
+    work = {}
+    for entry in journal.entries():
+        event = entry["event"]
+        if event == "scan":
+            state["cache"] = entry["cache"]
+        elif event == "large":
+            state["large"] = True
+            state["large_taskid"] = entry["taskid"]
+            state["large_checksum_taskid"] = entry["checksum_taskid"]
+        elif event == "tar":
+            # a run interrupted while planning plans again on resume, the last
+            # record of each index wins
+            work[entry["index"]] = (
+                entry["index"],
+                entry["t_args"],
+                entry["tar_list"],
+                entry["index_p"],
+            )
+            state["sizes"][entry["index"]] = entry["size"]
+        elif event == "planned":
+            state["planned"] = True
+        elif event == "tarred":
+            state["tarred"][entry["index"]] = entry
+        elif event == "removed":
+            state["removed"].add(entry["taskid"])
+        elif event == "purged":
+            state["purged"].add(entry["index"])
+    state["work"] = list(work.values())
+    return state
+
+
+def start_run(args, journal):
+    """
+    State of the run to continue with --resume else None.
+
+    A new run checks the prefix is free and starts an empty journal.
+    """
+    if args.resume:
+        state = load_run(journal)
+        if not state["cache"]:
+            raise ArchiveTarArchiveError(f"Nothing to resume, no journal {journal.path}")
+        logging.info(f"Resuming interrupted run from {journal.path}")
+        return state
+
+    # check that selected prefix is usable
+    validate_prefix(args.prefix, path=args.bundle_dir)
+    if not args.dryrun:
+        journal.reset()
+    return None
+
+
+def upload_large(args, over_t, globus=None):
+    """
+    Upload files over --size and make their checksum manifest.
+
+    Returns (large_taskid, large_checksum_taskid) Globus tasks or None.
+    """
+    large_taskid = None
+    large_checksum_taskid = None
+
+    # if globus get transfer the large files
+    if args.destination_dir and not args.dryrun:
+        # transfer = upload_overlist(over_t, globus)
+        over_p = DwalkParser(path=over_t)
+        for path in over_p.getpath():
+            path = path.rstrip(b"\n")  # strip trailing newline
+            path = path.decode("utf-8")  # convert byte array to string
+            path = Path(path)
+            logging.debug(f"Adding file {path} to Globus Transfer")
+            globus.add_item(path, label=f"Large File List {args.prefix}")
+
+        large_taskid = globus.submit_pending_transfer()
+        logging.info(f"Globus Transfer of Oversize files: {large_taskid}")
+
+    # this may look less efficent to do checksums after transfer,
+    # it's not though globus transfers are async and isn't checked until the end
+    # so lets calculate checksums while the transfers happen
+    if not args.dryrun and args.checksum:
+        # we only calculate checksums locally for large files if Globus is not available
+        # we calculate checksums if requested to by --force-local-checksum
+        if not args.destination_dir or args.force_local_checksum:
+            large_checksum_wrote_anything = (
+                False  # used to track if antyhing is written
+            )
+            logging.info("----> Calculating Checksums for large files locally")
+            bundle_dir = Path(args.bundle_dir or Path.cwd())
+            sha_file = bundle_dir / f"{args.prefix}-large.DONT_DELETE.sha1"
+            logging.debug(f"Large File checksum  manifest is {sha_file}")
+            with sha_file.open("w") as f:
+                over_p = DwalkParser(path=over_t)
+                for path in over_p.getpath(stripcwd=True):
+                    stripped = path.decode("utf-8").strip()
+                    sha1 = sha1_of(stripped)
+                    f.write(f"{sha1} {stripped}\n")
+                    large_checksum_wrote_anything = True
+
+            # if we are here someone asked for local checksums
+            # but is using globus to upload so lets upload now
+            if args.destination_dir and large_checksum_wrote_anything:
+                large_checksum_taskid = globus_transfer_singleton(
+                    args,
+                    sha_file,
+                    label=f"Oversize files checksum manifest",
+                )
+
+                logging.info(
+                    f"Globus Transfer of Oversize files checksum manifest: {large_checksum_taskid}"
+                )
+
+            if not large_checksum_wrote_anything:
+                logging.info("No large files found removing empty checksum file")
+                sha_file.unlink()  # delete empty file nothing was written
+        else:
+            logging.info("----> Checksums will be gatherd from Globus at end of packing")
+
+    return large_taskid, large_checksum_taskid
+
+
+def tar_args(args, index):
+    """SuperTar() arguments for tar number index from the command line options."""
+    if args.bundle_dir:
+        t_args = {"filename": Path(args.bundle_dir) / f"{args.prefix}-{index}.tar"}
+    else:
+        t_args = {"filename": f"{args.prefix}-{index}.tar"}
+    if args.remove_files:
+        t_args["purge"] = True
+    if args.tar_verbose:
+        t_args["verbose"] = True
+    if args.ignore_failed_read:
+        t_args["ignore_failed_read"] = True
+    if args.dereference:
+        t_args["dereference"] = True
+
+    # compression options
+    if args.gzip:
+        t_args["compress"] = "GZIP"
+    if args.zstd:
+        t_args["compress"] = "ZSTD"
+    if args.bzip:
+        t_args["compress"] = "BZ2"
+    if args.lz4:
+        t_args["compress"] = "LZ4"
+    if args.xz:
+        t_args["compress"] = "XZ"
+    if args.tar_options:
+        t_args["extra_options"] = args.tar_options.split()
+    return t_args
+
+
+def plan_tars(args, under_t, journal):
+    """
+    Split the filtered list under_t into tar lists recording each in the journal.
+
+    Returns (work, sizes):
+        work (list) (index, t_args, tar_list, index_p) of each tar
+        sizes (dict) expected bytes of each tar by index
+    """
+    parser = DwalkParser(path=under_t)
+    work = []
+    for index, index_p, tar_list in parser.tarlist(
+        prefix=args.prefix,
+        minsize=humanfriendly.parse_size(args.tar_size),
+        bundle_path=args.bundle_dir,
+        follow_symlinks=args.dereference,
+    ):
+        logging.info(f"    Index: {index_p}")
+        logging.info(f"    tar: {tar_list}")
+
+        # actauly tar them up
+        if not args.dryrun:
+            t_args = tar_args(args, index)
+            work.append((index, t_args, tar_list, index_p))
+            journal.record(
+                "tar",
+                index=index,
+                t_args={
+                    k: str(v) if isinstance(v, Path) else v for k, v in t_args.items()
+                },
+                tar_list=str(tar_list),
+                index_p=str(index_p),
+                size=parser.sizes[index],
+            )
+    if not args.dryrun:
+        journal.record("planned")
+    return work, parser.sizes
+
+
+def resume_work(args, state, work, journal, cleaning=False, streaming=False):
+    """
+    Remove tars the interrupted run finished from work and finish what it left.
+
+    Partial tars whose files --remove-files already deleted are kept as
+    <tar>.interrupted and --stream-purge tar deletes cut short are completed.
+
+    Returns (resume_cleanup, resume_wait):
+        resume_cleanup (list) (taskid, files, members) uploaded but not removed
+        resume_wait (list) taskids uploaded before the interrupt
+    """
+    resume_cleanup = []
+    resume_wait = []
+    for item in list(work):
+        index, t_args = item[0], item[1]
+        done = state["tarred"].get(index)
+        if done is None:
+            if args.remove_files:
+                # --remove-files already deleted what is in the partial tar keep it
+                tar_p = Path(t_args["filename"])
+                for partial in tar_p.parent.glob(f"{tar_p.name}*"):
+                    logging.warning(
+                        f"Keeping interrupted {partial} as {partial}.interrupted files it holds were removed by --remove-files"
+                    )
+                    partial.rename(f"{partial}.interrupted")
+            continue
+        work.remove(item)
+        members = done.get("members")
+        if not (members and Path(members).exists()):
+            members = None  # already purged and removed
+        if args.stream_purge == "tar" and members and index not in state["purged"]:
+            purge_members(members)
+            journal.record("purged", index=index)
+        if (
+            (cleaning or streaming)
+            and done["taskid"]
+            and done["taskid"] not in state["removed"]
+        ):
+            files = []
+            if cleaning:
+                files = [Path(f) for f in done["files"] if Path(f).exists()]
+            resume_cleanup.append(
+                (done["taskid"], files, members if streaming else None)
+            )
+        elif args.wait and done["taskid"]:
+            resume_wait.append(done["taskid"])
+    logging.info(
+        f"Resuming with {len(work)} tars left {len(state['tarred'])} already made"
+    )
+    return resume_cleanup, resume_wait
+
+
+def finish_large(args, globus, large_taskid, large_checksum_taskid):
+    """Wait on the upload of files over --size and build their checksums from Globus."""
+    # large_taskid only esists if --size given to create a large file option
+    # this will break once we have 1EB files
+    if not ((args.wait or args.checksum) and large_taskid):
+        return
+
+    if args.force_local_checksum:
+        logging.debug("Wait for large_checksum_taskid to finish")
+        globus.task_wait(large_checksum_taskid)
+
+    logging.info(
+        "Wait for large_taskid to finish for checksums disable with --no-checksum"
+    )
+    globus.task_wait(large_taskid)
+
+    if args.checksum and not args.force_local_checksum:
+        # use globus data to build list of sha1
+        logging.info("----> Using Checksums from Globus")
+        bundle_dir = Path(args.bundle_dir or Path.cwd())
+        sha_file = bundle_dir / f"{args.prefix}-large.DONT_DELETE.sha1"
+        logging.debug(f"Large File checksum  manifest is {sha_file}")
+        if args.sync_level:
+            logging.warning(
+                f"--sync-level {args.sync_level} files skipped as already on the destination are not included in {sha_file} use --force-local-checksum for a complete manifest"
+            )
+        with sha_file.open("w") as f:
+            for entry in globus.task_successful_transfers(large_taskid):
+                stripped = get_relative_path(entry["source_path"])
+                logging.debug(f"{entry['checksum']} {stripped}\n")
+                f.write(f"{entry['checksum']} {stripped}\n")
+
+        # now upload the checksums
+        large_checksum_taskid = globus_transfer_singleton(
+            args,
+            sha_file,
+            label=f"Oversize files checksum manifest",
+        )
+
+        logging.info(
+            f"Globus Transfer of Oversize files checksum manifest: {large_checksum_taskid}"
+        )
+        logging.debug("Wait for large_checksum_taskid to finish")
+        globus.task_wait(large_checksum_taskid)
+        if args.rm_at_files:
+            logging.info("Deleting large_checksum file")
+            sha_file.unlink()
+
+
+def check_results(results):
+    """Raise TarError if any TarResult from the workers failed."""
+    # any task that raised an exception should find a returncode on the out_q
+    suspect_tars = list()
+    for result in results:
+        logging.debug(f"Return code from tar {result.filename} is {result.rc}")
+        if result.rc != 0:
+            # found an issue with one worker log and push onto list
+            logging.error(
+                f"An issue was found running the tars for index {result.filename}: {result.exception}"
+            )
+            suspect_tars.append(result.filename)
+
+    # raise if we found suspect tars
+    if suspect_tars:
+        raise TarError(f"An issue was found processing the tars for {suspect_tars}")
+
+
+def run_tars(
+    args,
+    work,
+    sizes,
+    limit=None,
+    cleaning=False,
+    streaming=False,
+    resume_cleanup=(),
+    resume_wait=(),
+    globus=None,
+    report=None,
+):
+    """
+    Phase 3 make, upload and clean up each tar in work as space allows.
+
+    work (list) (index, t_args, tar_list, index_p) of each tar to make
+    sizes (dict) expected bytes of each tar by index
+    limit (int) bytes the bundle dir may use
+    resume_cleanup, resume_wait uploads of an interrupted run see resume_work()
+    report (RunReport) optional, each tar made is added to it and its totals logged
+
+    Returns list of TarResult from each tar.
+    """
+    q = mp.Queue()  # input data
+    out_q = mp.Queue()  # output return code from pool worker
+    iolock = mp.Lock()
+
+    # remove tars etc as their uploads finish in a separate stage
+    cleanup_q = None
+    pending = None
+    if cleaning or streaming:
+        cleanup_q = mp.Queue()
+        pending = mp.Value("q", 0)  # bytes waiting on cleanup
+        cleaner = mp.Process(
+            target=cleanup, args=(cleanup_q, pending, args), name="cleanup"
+        )
+        cleaner.start()
+        for taskid, files, members in resume_cleanup:
+            with pending.get_lock():
+                pending.value += sum(f.stat().st_size for f in files)
+            cleanup_q.put((taskid, files, members))
+
+    # start parallel pool of workers
+    pool = mp.Pool(
+        args.tar_processes,
+        initializer=process,
+        initargs=(q, out_q, iolock, args, cleanup_q, pending),
+    )
+
+    # only start tars that are expected to fit in the bundle dir
+    scheduler = SpaceScheduler(
+        path=args.bundle_dir,
+        limit=limit,
+        high_water=args.high_water if cleaning else None,
+        # pending only counts tars removed after upload, --stream-purge upload alone
+        # leaves them in the bundle dir so count every tar written
+        pending=pending if cleaning else None,
+    )
+    results = []  # TarResult from each tar
+    while work or scheduler.running:
+        while (
+            work
+            and len(scheduler.running) < args.tar_processes
+            and scheduler.admit(sizes[work[0][0]])
+        ):
+            item = work.pop(0)
+            scheduler.start(item[0], sizes[item[0]])
+            q.put((*item, int(sizes[item[0]])))  # put work on the queue
+
+        if cleanup_q is not None and not cleaner.is_alive():
+            # its pending bytes are never released, workers and admit() would wait forever
+            pool.terminate()
+            raise ArchiveTarArchiveError(
+                f"Cleanup stage exited ({cleaner.exitcode}) before all tars were made, stopping"
+            )
+
+        try:
+            result = out_q.get(timeout=1)
+        except queue.Empty:
+            continue  # check for space again
+        scheduler.finish(result.index, result.out_bytes)
+        results.append(result)
+        if report is not None:
+            # running totals show if tars are CPU or I/O bound as they finish
+            report.tar(result)
+            logging.info(report.describe_tars())
+
+    for _ in range(args.tar_processes):  # tell workers we're done
+        q.put(None)
+
+    pool.close()
+    pool.join()
+
+    for taskid in resume_wait:
+        globus.task_wait(taskid)
+
+    if cleanup_q is not None:
+        logging.info("Waiting for tar uploads to finish and be removed")
+        cleanup_q.put(None)
+        cleaner.join()
+        if cleaner.exitcode != 0:
+            raise ArchiveTarArchiveError(
+                "Not all tar uploads succeeded, files for failed transfers were kept"
+            )
+
+    return results
 
 
 def validate_prefix(prefix, path=None):
@@ -572,6 +1084,7 @@ def validate_prefix(prefix, path=None):
     tars.extend(find_prefix_files(prefix, path, suffix="index.txt"))
     tars.extend(find_prefix_files(prefix, path, suffix="DONT_DELETE.txt"))
     tars.extend(find_prefix_files(prefix, path, suffix="DONT_DELETE.sha1"))
+    tars.extend(find_prefix_files(prefix, path, suffix=MANIFEST_SUFFIX))
 
     if len(tars) != 0:
         logging.critical(f"Prefix {prefix} conflicts with current files {tars}")
@@ -608,27 +1121,28 @@ def main(argv):
 
     # initialize locals
     large_taskid = None
+    large_checksum_taskid = None
 
-    # check that selected prefix is usable
-    validate_prefix(args.prefix, path=args.bundle_dir)
+    # journal of progress so an interrupted run can --resume
+    journal = Journal(journal_path(args))
+    state = start_run(args, journal)
+    resumed = bool(state and state["planned"])  # all tar lists already written
+
+    # time each phase and tar for the run report
+    report = RunReport(args.prefix, runs=runs)
 
     # if using globus, init to prompt for endpoiont activation etc
-    if args.destination_dir:
-        globus = GlobusTransfer(
-            args.source,
-            args.destination,
-            args.destination_dir,
-            # note notify are the reverse of the SDK
-            notify_on_succeeded=args.no_notify_on_succeeded,
-            notify_on_failed=args.no_notify_on_failed,
-            notify_on_inactive=args.no_notify_on_inactive,
-            fail_on_quota_errors=args.fail_on_quota_errors,
-            skip_source_errors=args.skip_source_errors,
-            preserve_timestamp=args.preserve_timestamp,
-        )
+    globus = transfer_from_args(args) if args.destination_dir else None
 
     # do we have a user provided list?
-    if args.list:
+    if state:
+        cache = Path(state["cache"])
+        if not (resumed or cache.exists()):
+            raise ArchiveTarArchiveError(
+                f"Scan {cache} of interrupted run is gone start over, use --save-list to keep scans"
+            )
+        logging.info(f"---> [Phase 1] Reusing scan {cache}")
+    elif args.list:
         logging.info("---> [Phase 1] Found User Provided File List")
         cache = args.list
     else:
@@ -639,8 +1153,11 @@ def main(argv):
             "prefix": args.prefix,
             "savecache": args.save_list,
             "filters": args,
+            "walker": args.walker,
+            "workers": args.walker_processes,
         }
-        cache = build_list(**b_args)
+        with report.phase("scan"):
+            cache = build_list(**b_args)
         logging.debug(f"Results of full path scan saved at {cache}")
 
     # bail if --dryrun requested
@@ -648,215 +1165,123 @@ def main(argv):
         logging.info("--dryrun requested exiting")
         sys.exit(0)
 
-    # filter for files under size
-    # Set --size filter to 1ExaByte if not set
-    filtersize = args.size if args.size else "1EB"
-    logging.info(
-        f"----> [Phase 1.5] Filter out files greater than {filtersize} if --size given"
-    )
-
-    # IN: List of files
-    # OUT: pathlib: undersize_text, undersize_cache, oversize_text, atsize_text
-    under_t, under_c, over_t = filter_list(
-        path=cache,
-        size=humanfriendly.parse_size(filtersize),
-        prefix=cache.stem,
-        purgelist=args.save_purge_list,
-    )
-
-    # if globus get transfer the large files
-    if args.destination_dir and not args.dryrun:
-        # transfer = upload_overlist(over_t, globus)
-        over_p = DwalkParser(path=over_t)
-        for path in over_p.getpath():
-            path = path.rstrip(b"\n")  # strip trailing newline
-            path = path.decode("utf-8")  # convert byte array to string
-            path = Path(path)
-            logging.debug(f"Adding file {path} to Globus Transfer")
-            globus.add_item(path, label=f"Large File List {args.prefix}")
+    if not state and not args.dryrun:
+        journal.record("scan", cache=str(cache.resolve()))
 
-        large_taskid = globus.submit_pending_transfer()
-        logging.info(f"Globus Transfer of Oversize files: {large_taskid}")
+    if resumed:
+        logging.info("----> [Phase 1.5 - 2] Reusing filtered lists and tar lists")
+    else:
+        # filter for files under size
+        # Set --size filter to 1ExaByte if not set
+        filtersize = args.size if args.size else "1EB"
+        logging.info(
+            f"----> [Phase 1.5] Filter out files greater than {filtersize} if --size given"
+        )
 
-    # this may look less efficent to do checksums after transfer,
-    # it's not though globus transfers are async and isn't checked until the end
-    # so lets calculate checksums while the transfers happen
-    if not args.dryrun and args.checksum:
-        # we only calculate checksums locally for large files if Globus is not available
-        # we calculate checksums if requested to by --force-local-checksum
-        if not args.destination_dir or args.force_local_checksum:
-            large_checksum_wrote_anything = (
-                False  # used to track if antyhing is written
+        # IN: List of files
+        # OUT: pathlib: undersize_text, undersize_cache, oversize_text, atsize_text
+        with report.phase("filter"):
+            under_t, under_c, over_t = filter_list(
+                path=cache,
+                size=humanfriendly.parse_size(filtersize),
+                prefix=cache.stem,
+                purgelist=args.save_purge_list,
+                walker=args.walker,
             )
-            logging.info("----> Calculating Checksums for large files locally")
-            bundle_dir = Path(args.bundle_dir or Path.cwd())
-            sha_file = bundle_dir / f"{args.prefix}-large.DONT_DELETE.sha1"
-            logging.debug(f"Large File checksum  manifest is {sha_file}")
-            with sha_file.open("w") as f:
-                over_p = DwalkParser(path=over_t)
-                for path in over_p.getpath(stripcwd=True):
-                    stripped = path.decode("utf-8").strip()
-                    sha1 = sha1_of(stripped)
-                    f.write(f"{sha1} {stripped}\n")
-                    large_checksum_wrote_anything = True
 
-            # if we are here someone asked for local checksums
-            # but is using globus to upload so lets upload now
-            if args.destination_dir and large_checksum_wrote_anything:
-                large_checksum_taskid = globus_transfer_singleton(
-                    args,
-                    sha_file,
-                    label=f"Oversize files checksum manifest",
-                )
-
-                logging.info(
-                    f"Globus Transfer of Oversize files checksum manifest: {large_checksum_taskid}"
-                )
-
-            if not large_checksum_wrote_anything:
-                logging.info("No large files found removing empty checksum file")
-                sha_file.unlink()  # delete empty file nothing was written
-        elif not args.dryrun and args.checksum:
-            logging.info(
-                "----> Checksums will be gatherd from Globus at end of packing"
+    if state and state["large"]:
+        # large files were already sent by the interrupted run
+        large_taskid = state["large_taskid"]
+        large_checksum_taskid = state["large_checksum_taskid"]
+    elif not resumed:
+        with report.phase("large"):
+            large_taskid, large_checksum_taskid = upload_large(args, over_t, globus)
+        if not args.dryrun:
+            journal.record(
+                "large", taskid=large_taskid, checksum_taskid=large_checksum_taskid
             )
 
     # Dwalk list parser
     logging.info(
         f"----> [Phase 2] Parse fileted list into sublists of size {args.tar_size}"
     )
-    parser = DwalkParser(path=under_t)
 
-    # start parallel pool
-    q = mp.Queue()  # input data
-    out_q = mp.Queue()  # output return code from pool worker
-    iolock = mp.Lock()
     try:
-        for index, index_p, tar_list in parser.tarlist(
-            prefix=args.prefix,
-            minsize=humanfriendly.parse_size(args.tar_size),
-            bundle_path=args.bundle_dir,
-            follow_symlinks=args.dereference,
-        ):
-            logging.info(f"    Index: {index_p}")
-            logging.info(f"    tar: {tar_list}")
-
-            # actauly tar them up
-            if not args.dryrun:
-                # if compression
-                # if remove
-                if args.bundle_dir:
-                    t_args = {
-                        "filename": Path(args.bundle_dir) / f"{args.prefix}-{index}.tar"
-                    }
-                else:
-                    t_args = {"filename": f"{args.prefix}-{index}.tar"}
-                if args.remove_files:
-                    t_args["purge"] = True
-                if args.tar_verbose:
-                    t_args["verbose"] = True
-                if args.ignore_failed_read:
-                    t_args["ignore_failed_read"] = True
-                if args.dereference:
-                    t_args["dereference"] = True
-
-                # compression options
-                if args.gzip:
-                    t_args["compress"] = "GZIP"
-                if args.zstd:
-                    t_args["compress"] = "ZSTD"
-                if args.bzip:
-                    t_args["compress"] = "BZ2"
-                if args.lz4:
-                    t_args["compress"] = "LZ4"
-                if args.xz:
-                    t_args["compress"] = "XZ"
-                if args.tar_options:
-                    t_args["extra_options"] = args.tar_options.split()
-
-                q.put((t_args, tar_list, index_p))  # put work on the queue
+        # (index, t_args, tar_list, index_p) dispatched as space allows
+        if resumed:
+            work = list(state["work"])
+            sizes = state["sizes"]
+        else:
+            with report.phase("plan") as counts:
+                work, sizes = plan_tars(args, under_t, journal)
+                counts.update(items=len(sizes), bytes=int(sum(sizes.values())))
+
+        cleaning = bool(args.rm_at_files and args.destination_dir)
+        streaming = args.stream_purge == "upload"
+        resume_cleanup = []  # (taskid, files, members) uploaded but not removed before interrupted
+        resume_wait = []  # taskids uploaded before interrupted
+        if state:
+            resume_cleanup, resume_wait = resume_work(
+                args, state, work, journal, cleaning=cleaning, streaming=streaming
+            )
+
+        # check the tars can fit where they will be created
+        bundle_limit = (
+            humanfriendly.parse_size(args.bundle_limit) if args.bundle_limit else None
+        )
+        preflight(
+            {
+                index: size
+                for index, size in sizes.items()
+                if not state or index not in state["tarred"]
+            },
+            path=args.bundle_dir,
+            slots=args.tar_processes,
+            limit=bundle_limit,
+            cleanup=cleaning,
+            compress=any([args.gzip, args.zstd, args.bzip, args.lz4, args.xz]),
+            in_place=bool(
+                (args.remove_files or args.stream_purge) and not args.bundle_dir
+            ),
+        )
 
         # bail if --dryrun requested
         if args.dryrun:
             logging.info("--dryrun --dryrun requested exiting")
             sys.exit(0)
 
-        # start parallel pool of workers
-        pool = mp.Pool(
-            args.tar_processes,
-            initializer=process,
-            initargs=(q, out_q, iolock, args),
-        )
-
-        for _ in range(args.tar_processes):  # tell workers we're done
-            q.put(None)
-
-        pool.close()
-        pool.join()
-
-        # wait for large_taskid to finish
-        # large_taskid only esists if --size given to create a large file option
-        # this will break once we have 1EB files
-        if (args.wait or args.checksum) and large_taskid:
-            if args.force_local_checksum:
-                logging.debug("Wait for large_checksum_taskid to finish")
-                globus.task_wait(large_checksum_taskid)
-
-            logging.info(
-                "Wait for large_taskid to finish for checksums disable with --no-checksum"
+        with report.phase("tars") as counts:
+            results = run_tars(
+                args,
+                work,
+                sizes,
+                limit=bundle_limit,
+                cleaning=cleaning,
+                streaming=streaming,
+                resume_cleanup=resume_cleanup,
+                resume_wait=resume_wait,
+                globus=globus,
+                report=report,
+            )
+            made = [tar for tar in report.tars if tar["rc"] == 0]
+            counts.update(
+                items=len(made), bytes=sum(tar["in_bytes"] for tar in made)
             )
-            globus.task_wait(large_taskid)
-
-            if args.checksum and not args.force_local_checksum:
-                # use globus data to build list of sha1
-                logging.info("----> Using Checksums from Globus")
-                bundle_dir = Path(args.bundle_dir or Path.cwd())
-                sha_file = bundle_dir / f"{args.prefix}-large.DONT_DELETE.sha1"
-                logging.debug(f"Large File checksum  manifest is {sha_file}")
-                with sha_file.open("w") as f:
-                    for entry in globus.task_successful_transfers(large_taskid):
-                        stripped = get_relative_path(entry["source_path"])
-                        logging.debug(f"{entry['checksum']} {stripped}\n")
-                        f.write(f"{entry['checksum']} {stripped}\n")
-
-                # now upload the checksums
-                large_checksum_taskid = globus_transfer_singleton(
-                    args,
-                    sha_file,
-                    label=f"Oversize files checksum manifest",
-                )
-
-                logging.info(
-                    f"Globus Transfer of Oversize files checksum manifest: {large_checksum_taskid}"
-                )
-                logging.debug("Wait for large_checksum_taskid to finish")
-                globus.task_wait(large_checksum_taskid)
-                if args.rm_at_files:
-                    logging.info("Deleting large_checksum file")
-                    sha_file.unlink()
 
-        # cleanup large checksum file
-        # It could be empty (no large files)
-        # It could be requested deleted --rm-at-files
+        # wait for large_taskid to finish
+        with report.phase("large_wait"):
+            finish_large(args, globus, large_taskid, large_checksum_taskid)
 
         # check no pool workers had problems running the tar
-        # any task that raised an exception should find a returncode on the out_q
-        suspect_tars = list()
-        for _ in range(index):
-            rc, filename, exception = out_q.get()
-            logging.debug(f"Return code from tar {filename} is {rc}")
-            if rc != 0:
-                # found an issue with one worker log and push onto list
-                logging.error(
-                    f"An issue was found running the tars for index {filename}"
-                )
-                suspect_tars.append(filename)
+        check_results(results)
 
-        # raise if we found suspect tars
-        if suspect_tars:
-            raise TarError(f"An issue was found processing the tars for {suspect_tars}")
+        # everything finished nothing left to resume
+        journal.reset()
+        log_runs()
+        write_report(args, report, "success")
 
     except Exception as e:
         logging.error("Issue during tar process killing")
+        write_report(args, report, "failed")
         raise e
         sys.exit(-1)
@@ -110,6 +110,12 @@ def parse_args(args):
         help="Save an mpiFileUtils purge list <prefix>-<timestamp>.under.cache for files saved in tars, used to delete files under --size after archive process.  Use as alternative to --remove-files",
         action="store_true",
     )
+    parser.add_argument(
+        "--stream-purge",
+        help="Delete the files in each tar as soon as it is safe rather than after the whole run: 'tar' once the tar (and checksums) are written, 'upload' once its Globus transfer also succeeded.  Gives back quota progressively.  Use as alternative to --save-purge-list",
+        choices=["tar", "upload"],
+        default=None,
+    )
     parser.add_argument(
         "--bundle-dir",
         "--bundle-path",
@@ -117,6 +123,42 @@ def parse_args(args):
         default=None,
     )
 
+    bundle_limit = env.str("AT_BUNDLE_LIMIT", default=None)
+    parser.add_argument(
+        "--bundle-limit",
+        help="Most space archivetar may use in --bundle-dir at once (eg. remaining quota 5T). Tars only start when their expected size fits under this and the free space on the filesystem. Can be set with AT_BUNDLE_LIMIT environment variable.",
+        default=bundle_limit,
+        metavar="SIZE",
+    )
+    high_water = env.float("AT_HIGH_WATER", default=90)
+    parser.add_argument(
+        "--high-water",
+        help=f"With --rm-at-files pause starting new tars while the --bundle-dir filesystem is more than this percent full and uploads are waiting to be removed. Can be set with AT_HIGH_WATER environment variable. Default: {high_water}",
+        type=float,
+        default=high_water,
+        metavar="PERCENT",
+    )
+
+    parser.add_argument(
+        "--manifest",
+        help="Combine each tar's file list, index and checksums into one compressed <prefix>-N.DONT_DELETE.manifest.gz to reduce the number of objects archived. Can be set with AT_MANIFEST environment variable.",
+        action=argparse.BooleanOptionalAction,
+        default=env.bool("AT_MANIFEST", default=False),
+    )
+
+    parser.add_argument(
+        "--prometheus",
+        help="Also write the run report <prefix>.archivetar.report.json as a Prometheus textfile collector file <prefix>.archivetar.prom in the bundle dir. Can be set with AT_PROMETHEUS environment variable.",
+        action=argparse.BooleanOptionalAction,
+        default=env.bool("AT_PROMETHEUS", default=False),
+    )
+
+    parser.add_argument(
+        "--resume",
+        help="Continue an interrupted run with the same --prefix and --bundle-dir from its journal <prefix>.archivetar.journal, reusing the scan and tar lists and skipping tars already made and uploaded",
+        action="store_true",
+    )
+
     build_list_args = parser.add_mutually_exclusive_group()
     build_list_args.add_argument(
         "--save-list",
@@ -128,6 +170,19 @@ def parse_args(args):
         help="Provide a prior scan from --dryrun --save-list",
         type=file_check,
     )
+    walker = env.str("AT_WALKER", default="dwalk")
+    parser.add_argument(
+        "--walker",
+        help=f"Program scanning and filtering the files: dwalk from mpiFileUtils across MPI ranks (AT_LAUNCHER, AT_NP), or python a pool of local scandir processes for nodes without MPI, --save-purge-list is then a text list archivepurge also takes.  --list must come from the same walker. Can be set with AT_WALKER environment variable. Default: {walker}",
+        choices=["dwalk", "python"],
+        default=walker,
+    )
+    parser.add_argument(
+        "--walker-processes",
+        help="Processes scanning at once with --walker python. Can be set with AT_WALKER_PROCESSES environment variable. Default: 8",
+        type=int,
+        default=env.int("AT_WALKER_PROCESSES", default=8),
+    )
 
     verbosity = parser.add_mutually_exclusive_group()
     verbosity.add_argument(
@@ -178,6 +233,13 @@ def parse_args(args):
     tar_opts = parser.add_argument_group(
         title="Tar Options", description="Options to pass to underlying tar commands"
     )
+    tar_engine = env.str("AT_TAR_ENGINE", default="gnutar")
+    tar_opts.add_argument(
+        "--tar-engine",
+        help=f"Program creating each tar: gnutar one process per tar, or dtar from mpiFileUtils many MPI ranks (AT_LAUNCHER, AT_NP) reading files into one tar, pair with a small --tar-processes. dtar can't compress, --remove-files, --ignore-failed-read, --dereference or --tar-options. Can be set with AT_TAR_ENGINE environment variable. Default: {tar_engine}",
+        choices=["gnutar", "dtar"],
+        default=tar_engine,
+    )
     tar_opts.add_argument(
         "--tar-verbose",
         help="Pass -v to tar (print files as tar'd)",
@@ -271,7 +333,7 @@ def parse_args(args):
     )
     globus.add_argument(
         "--rm-at-files",
-        help="Remove archivetar created files (tar, index, tar-list) after Globus transfer of tars",
+        help="Remove archivetar created files (tar, index, tar-list) as soon as the Globus transfer of each tar finishes",
         action="store_true",
     )
     globus.add_argument(
@@ -279,6 +341,13 @@ def parse_args(args):
         help="Globus Transfer will attempt to set file timestamps on the destination to match those on the origin.",
         action="store_true",
     )
+    sync_default = env.str("AT_SYNC_LEVEL", default=None)
+    globus.add_argument(
+        "--sync-level",
+        help="Only transfer files that differ from what is already on the destination, compared in bulk by Globus. exists: missing files, size: size differs, mtime: size differs or source is newer (use with --preserve-timestamp), checksum: contents differ. Useful when repeating or restarting an upload. Can be set with AT_SYNC_LEVEL environment variable.",
+        choices=["exists", "size", "mtime", "checksum"],
+        default=sync_default,
+    )
     globus.add_argument(
         "--no-notify-on-succeeded",
         help="Do not send notification email when the transfer completes with a status of SUCCEEDED",
@@ -310,4 +379,25 @@ def parse_args(args):
 
     args = parser.parse_args(args)
 
+    if args.tar_engine == "dtar":
+        gnu_only = {
+            "--remove-files": args.remove_files,
+            "--ignore-failed-read": args.ignore_failed_read,
+            "--dereference": args.dereference,
+            "--tar-options": args.tar_options,
+            "compression": any([args.gzip, args.zstd, args.bzip, args.lz4, args.xz]),
+        }
+        used = [option for option, value in gnu_only.items() if value]
+        if used:
+            parser.error(f"--tar-engine dtar can not be used with {' '.join(used)}")
+
+    if args.stream_purge:
+        if args.remove_files:
+            parser.error("--stream-purge and --remove-files both delete files pick one")
+        if args.ignore_failed_read:
+            # a file tar could not read would be deleted without being archived
+            parser.error("--stream-purge can not be used with --ignore-failed-read")
+        if args.stream_purge == "upload" and not args.destination_dir:
+            parser.error("--stream-purge upload requires --destination-dir")
+
     return args
@@ -0,0 +1,268 @@
+"""
+SQLite catalog of archive members.
+
+Scanning every DONT_DELETE list for each --which-archive query is slow once a
+prefix has thousands of lists, the catalog is built once (and updated when lists
+change) then answers exact, folder and glob queries from an index on path.
+
+The catalog is built from the lists and manifests only, archives are normally on
+tape and reading them would recall every one.  Member offsets, which let later
+readers seek straight to a member, are read from the tar headers with
+read_offsets() on request and only for uncompressed tars that are local and
+online.
+"""
+import logging
+import sqlite3
+import tarfile
+from collections import namedtuple
+from pathlib import Path
+
+from archivetar.hsm import is_offline
+from archivetar.manifest import MANIFEST_SUFFIX, member_paths, read_manifest
+
+CATALOG_SUFFIX = "catalog.sqlite"
+
+Match = namedtuple("Match", ["archive", "path", "offset", "offset_data"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE,      -- prefix-N
+    archive TEXT,          -- tar name when known eg. prefix-N.tar.gz
+    list TEXT,             -- list or manifest the members came from
+    mtime REAL,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS members (
+    path TEXT,
+    archive INTEGER REFERENCES archives(id),
+    offset INTEGER,        -- tar header offset, NULL if unknown
+    offset_data INTEGER    -- start of member data, NULL if unknown
+);
+"""
+
+
+def catalog_path(prefix, path=None):
+    """Default location of the catalog for prefix, next to its lists."""
+    return Path(path or ".") / f"{prefix}.{CATALOG_SUFFIX}"
+
+
+def _archive_name(file_list):
+    """prefix-N.DONT_DELETE.txt or prefix-N.DONT_DELETE.manifest.gz -> prefix-N"""
+    return file_list.name.split(".DONT_DELETE.")[0]
+
+
+def _text(path):
+    """sqlite only takes valid utf-8, show undecodable bytes as escapes."""
+    try:
+        path.encode("utf-8")
+        return path
+    except UnicodeEncodeError:
+        return path.encode("utf-8", "surrogateescape").decode(
+            "utf-8", "backslashreplace"
+        )
+
+
+class Catalog:
+    """
+    Index of which archive holds each path for a prefix.
+
+    catalog = Catalog("prefix.catalog.sqlite")
+    catalog.update(find_file_lists("prefix"))
+    for match in catalog.folder("dir/sub"):
+        print(match.archive, match.path, match.offset)
+    """
+
+    def __init__(self, db):
+        """
+        db (str/pathlib) SQLite file, created if it does not exist
+        """
+        self.db = Path(db)
+        self.conn = sqlite3.connect(self.db)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, file_lists):
+        """
+        Bring catalog up to date with file_lists.
+
+        Only lists that are new or whose size/mtime changed are read, archives
+        whose list is gone are dropped.
+
+        Parameters:
+            file_lists (list) pathlib DONT_DELETE.txt lists and/or manifests
+
+        Returns:
+            updated (int) number of archives (re)indexed
+        """
+        known = {
+            name: (mtime, size)
+            for name, mtime, size in self.conn.execute(
+                "SELECT name, mtime, size FROM archives"
+            )
+        }
+        current = set()
+        updated = 0
+        for file_list in file_lists:
+            file_list = Path(file_list)
+            name = _archive_name(file_list)
+            current.add(name)
+            st = file_list.stat()
+            if known.get(name) == (st.st_mtime, st.st_size):
+                continue
+            logging.debug(f"Cataloging {file_list}")
+            self._index(name, file_list, st)
+            updated += 1
+
+        for name in set(known) - current:
+            logging.debug(f"Removing {name} from catalog its list is gone")
+            self._drop(name)
+
+        # create after the first bulk load, inserting into an index is slower
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS members_path ON members(path)"
+        )
+        self.conn.commit()
+        if updated:
+            logging.info(f"Cataloged {updated} archives in {self.db}")
+        return updated
+
+    def _drop(self, name):
+        row = self.conn.execute(
+            "SELECT id FROM archives WHERE name = ?", (name,)
+        ).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM members WHERE archive = ?", row)
+            self.conn.execute("DELETE FROM archives WHERE id = ?", row)
+
+    def _index(self, name, file_list, st):
+        """(Re)load members of one archive in a single transaction."""
+        with self.conn:
+            self._drop(name)
+            if file_list.name.endswith(MANIFEST_SUFFIX):
+                header, _ = read_manifest(file_list)
+                archive = header["archive"]
+            else:
+                tars = sorted(file_list.parent.glob(f"{name}.tar*"))
+                archive = tars[0].name if tars else name
+
+            cur = self.conn.execute(
+                "INSERT INTO archives (name, archive, list, mtime, size) VALUES (?, ?, ?, ?, ?)",
+                (name, archive, str(file_list), st.st_mtime, st.st_size),
+            )
+            archive_id = cur.lastrowid
+
+            # offsets are unknown until read_offsets()
+            self.conn.executemany(
+                "INSERT INTO members (path, archive) VALUES (?, ?)",
+                ((path, archive_id) for path in map(_text, member_paths(file_list))),
+            )
+
+    def read_offsets(self, names, path=None):
+        """
+        Fill in member offsets of archives names from their tar headers.
+
+        Only uncompressed prefix-N.tar in path that are online are read, tars
+        offline on tape are skipped rather than recalled and archives whose
+        offsets are already known are not read again.
+
+        Parameters:
+            names (iterable) archive names (prefix-N) eg. from names()
+            path (str/pathlib) where the tars are, default cwd
+
+        Returns:
+            read (int) number of tars read
+        """
+        read = 0
+        for name in names:
+            row = self.conn.execute(
+                """SELECT a.id, COUNT(m.offset) FROM archives a
+                   LEFT JOIN members m ON m.archive = a.id
+                   WHERE a.name = ? GROUP BY a.id""",
+                (name,),
+            ).fetchone()
+            if row is None or row[1]:
+                continue
+            tar = Path(path or ".") / f"{name}.tar"
+            offsets = self._offsets(tar)
+            if offsets:
+                with self.conn:
+                    self.conn.executemany(
+                        "UPDATE members SET offset = ?, offset_data = ? WHERE archive = ? AND path = ?",
+                        (
+                            (offset, offset_data, row[0], member)
+                            for member, (offset, offset_data) in offsets.items()
+                        ),
+                    )
+                read += 1
+        return read
+
+    def _offsets(self, tar):
+        """Member offsets from the headers of an uncompressed tar, {} if it can't be read."""
+        try:
+            if not tar.is_file() or is_offline(tar):
+                return {}
+            logging.debug(f"Reading member offsets from {tar}")
+            with tarfile.open(tar, "r:") as t:
+                return {
+                    _text(m.name): (m.offset, m.offset_data)
+                    for m in t
+                    if m.isfile()
+                }
+        except (tarfile.ReadError, OSError) as e:
+            # eg. still being recalled from tape, EIO or EACCES
+            logging.warning(f"Could not read member offsets from {tar}: {e}")
+            return {}
+
+    def _query(self, where, params):
+        sql = f"""SELECT a.archive, m.path, m.offset, m.offset_data
+                  FROM members m JOIN archives a ON m.archive = a.id
+                  WHERE {where} ORDER BY a.id, m.offset, m.path"""
+        for row in self.conn.execute(sql, params):
+            yield Match(*row)
+
+    def exact(self, path):
+        """Archives holding path."""
+        return self._query("m.path = ?", (path,))
+
+    def folder(self, folder):
+        """Members under folder like tar -xf a.tar folder"""
+        start = folder.rstrip("/") + "/"
+        # '0' sorts right after '/' so this is every path starting with folder/
+        end = start[:-1] + "0"
+        return self._query("m.path >= ? AND m.path < ?", (start, end))
+
+    def glob(self, pattern):
+        """Members matching shell pattern, eg. 'dir/*.h5' note * also matches /"""
+        return self._query("m.path GLOB ?", (pattern,))
+
+    def names(self, folder=None):
+        """
+        Set of archive names (prefix-N) in the catalog.
+
+        With folder only those holding members under folder.
+        """
+        if folder is None:
+            return {name for (name,) in self.conn.execute("SELECT name FROM archives")}
+        start = folder.rstrip("/") + "/"
+        end = start[:-1] + "0"
+        return {
+            name
+            for (name,) in self.conn.execute(
+                """SELECT DISTINCT a.name FROM members m JOIN archives a ON m.archive = a.id
+                   WHERE m.path >= ? AND m.path < ?""",
+                (start, end),
+            )
+        }
+
+    def archives(self, matches):
+        """Unique archives in order from an iterable of Match."""
+        return list(dict.fromkeys(match.archive for match in matches))
@@ -0,0 +1,162 @@
+"""Checksums of archived files and verifying restored files against them."""
+import hashlib
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import humanfriendly
+
+from archivetar.manifest import MANIFEST_SUFFIX, read_manifest
+
+
+def sha1_of(path, bufsize=1 << 20):
+    """
+    Calculate a sha1 hash of a given file.
+
+    Globus currently uses sha1 for checksums
+
+    Parameters:
+        path (str/pathlib) Path to file
+        bufsize (int) Size of buffer to read at a time
+    """
+    h = hashlib.sha1(usedforsecurity=False)
+    logging.debug(f"Calculating Checksum for {path}")
+    with Path(path).open("rb") as f:
+        while chunk := f.read(bufsize):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sha256_of(path, bufsize=1 << 20):
+    """
+    Calculate a shaw256 hash of a given file.
+
+    Parameters:
+        path (str/pathlib) Path to file
+        bufsize (int) Size of buffer to read at a time
+    """
+    h = hashlib.sha256(usedforsecurity=False)
+    logging.debug(f"Calculating Checksum for {path}")
+    with Path(path).open("rb") as f:
+        while chunk := f.read(bufsize):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_checksums(path):
+    """
+    Yield (sha1, path) from a sha1sum style DONT_DELETE.sha1 or a manifest.
+
+    Manifest members without a checksum are skipped.
+    """
+    if str(path).endswith(MANIFEST_SUFFIX):
+        _, entries = read_manifest(path)
+        for entry in entries:
+            if entry["sha1"]:
+                yield entry["sha1"], entry["path"]
+        return
+
+    with open(path, "r", errors="surrogateescape") as f:
+        for line in f:
+            sha1, name = line.rstrip("\n").split(" ", 1)
+            yield sha1, name
+
+
+VerifyResult = namedtuple(
+    "VerifyResult",
+    ["files", "bytes", "mismatched", "missing", "unreadable", "seconds"],
+)
+
+
+def _verify_batch(batch):
+    """Check a batch of (sha1, path) returns files, bytes, mismatched, missing, unreadable."""
+    files, nbytes, mismatched, missing, unreadable = 0, 0, [], [], []
+    for sha1, path in batch:
+        try:
+            actual = sha1_of(path)
+            nbytes += Path(path).stat().st_size
+        except FileNotFoundError:
+            missing.append(path)
+            continue
+        except OSError as e:
+            # eg. PermissionError or IsADirectoryError, keep checking the rest
+            logging.debug(f"Could not read {path}: {e}")
+            unreadable.append(path)
+            continue
+        files += 1
+        if actual != sha1:
+            mismatched.append(path)
+    return files, nbytes, mismatched, missing, unreadable
+
+
+class Verifier:
+    """
+    Hash restored files against archived checksums with a pool of threads.
+
+    hashlib releases the GIL while hashing so threads keep several disks busy,
+    and verification can run in the main process alongside extraction.
+
+    verifier = Verifier(8)
+    verifier.submit(read_checksums("prefix-1.DONT_DELETE.sha1"))
+    result = verifier.wait()
+    """
+
+    def __init__(self, threads, batch=1000):
+        """
+        threads (int) Files hashed at once
+        batch (int) Files per task
+        """
+        self.pool = ThreadPoolExecutor(max(threads, 1))
+        self.batch = batch
+        self.futures = []
+        self.start = time.time()
+
+    def submit(self, checksums, path=None):
+        """
+        Queue checksums to verify.
+
+        checksums (iterable) of (sha1, path)
+        path (str) Optional folder only verify files under it
+        """
+        prefix = path.rstrip("/") + "/" if path else None
+        batch = []
+        for sha1, name in checksums:
+            if prefix and not name.startswith(prefix):
+                continue
+            batch.append((sha1, name))
+            if len(batch) >= self.batch:
+                self.futures.append(self.pool.submit(_verify_batch, batch))
+                batch = []
+        if batch:
+            self.futures.append(self.pool.submit(_verify_batch, batch))
+
+    def wait(self):
+        """Wait for all submitted checks, return VerifyResult."""
+        files, nbytes, mismatched, missing, unreadable = 0, 0, [], [], []
+        for future in self.futures:
+            f, b, mm, mi, un = future.result()
+            files += f
+            nbytes += b
+            mismatched.extend(mm)
+            missing.extend(mi)
+            unreadable.extend(un)
+        self.pool.shutdown()
+        return VerifyResult(
+            files, nbytes, mismatched, missing, unreadable, time.time() - self.start
+        )
+
+
+def report(result):
+    """Log results of verification, return True if everything matched."""
+    for path in result.mismatched:
+        logging.error(f"Checksum mismatch: {path}")
+    for path in result.missing:
+        logging.error(f"Missing: {path}")
+    for path in result.unreadable:
+        logging.error(f"Unreadable: {path}")
+    logging.info(
+        f"Verified {result.files} files {humanfriendly.format_size(result.bytes)} in {humanfriendly.format_timespan(result.seconds)} {humanfriendly.format_size(result.bytes / max(result.seconds, 1e-9))}/s: {len(result.mismatched)} mismatched {len(result.missing)} missing {len(result.unreadable)} unreadable"
+    )
+    return not (result.mismatched or result.missing or result.unreadable)
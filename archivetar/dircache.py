@@ -0,0 +1,119 @@
+"""
+SQLite cache of per directory scan totals for archivescan.
+
+A directory's mtime changes when entries are added, removed or renamed in it, so
+a directory with the same inode and mtime as last run has the same files and its
+totals and subdirectories are taken from the cache without reading it.  Changes
+to files in place (size, migrated to tape) do not change the directory and are
+not seen until the directory changes or a full rescan.
+"""
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    path BLOB PRIMARY KEY,  -- os.fsencode() of the directory
+    ino INTEGER,
+    mtime_ns INTEGER,
+    subdirs TEXT,           -- json list of subdirectory names
+    totals TEXT,            -- json of the scan totals of files in the directory
+    run INTEGER             -- last run that saw the directory
+);
+"""
+
+
+class DirCache:
+    """
+    cache = DirCache("project.scancache", config={"filter": "*"})
+    hit = cache.lookup(dirpath)  # (subdirs, totals) or None
+    cache.store([(dirpath, st, subdirs, totals)])
+    cache.commit()  # forgets directories not seen this run
+    """
+
+    def __init__(self, db, config=None):
+        """
+        db (str/pathlib) SQLite file, created if it does not exist
+        config (dict) Settings totals depend on, a different config empties the cache
+        """
+        self.db = Path(db)
+        self.conn = sqlite3.connect(self.db, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # workers read while we write
+        self.conn.executescript(SCHEMA)
+        if config is not None:
+            self._check_config(json.dumps(config, sort_keys=True))
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'run'").fetchone()
+        self.run = int(row[0]) + 1 if row else 1
+
+    def _check_config(self, config):
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'config'"
+        ).fetchone()
+        if row and row[0] == config:
+            return
+        with self.conn:
+            self.conn.execute("DELETE FROM dirs")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('config', ?)", (config,)
+            )
+
+    def lookup(self, path):
+        """
+        Cached (subdirs, totals) of directory path if it has not changed else None.
+
+        subdirs are full paths like os.DirEntry.path.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        row = self.conn.execute(
+            "SELECT ino, mtime_ns, subdirs, totals FROM dirs WHERE path = ?",
+            (os.fsencode(path),),
+        ).fetchone()
+        if not row or row[0] != st.st_ino or row[1] != st.st_mtime_ns:
+            return None
+        subdirs = [os.path.join(path, name) for name in json.loads(row[2])]
+        return subdirs, json.loads(row[3])
+
+    def store(self, rows):
+        """Save rows of (path, os.stat_result of path, subdirs, totals)."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    os.fsencode(path),
+                    st.st_ino,
+                    st.st_mtime_ns,
+                    json.dumps([os.path.basename(s) for s in subdirs]),
+                    json.dumps(totals),
+                    self.run,
+                )
+                for path, st, subdirs, totals in rows
+            ),
+        )
+        self.conn.commit()
+
+    def seen(self, paths):
+        """Mark cached directories paths as still present this run."""
+        self.conn.executemany(
+            "UPDATE dirs SET run = ? WHERE path = ?",
+            ((self.run, os.fsencode(path)) for path in paths),
+        )
+        self.conn.commit()
+
+    def commit(self):
+        """End of a complete walk, drop directories no longer there."""
+        with self.conn:
+            self.conn.execute("DELETE FROM dirs WHERE run < ?", (self.run,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('run', ?)", (str(self.run),)
+            )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,148 @@
+"""
+Parse dwalk --text-output records and split them into tar lists.
+
+    -rw-r--r-- bennet support 578.000  B Oct 22 2019 09:35 /scratch/path/file
+"""
+import logging
+import os
+import re
+from pathlib import Path
+
+import humanfriendly
+
+
+class DwalkLine:
+    def __init__(
+        self, line=False, relativeto=False, stripcwd=True, follow_symlinks=False
+    ):
+        """parse dwalk output line"""
+        # -rw-r--r-- bennet support 578.000  B Oct 22 2019 09:35 /scratch/support_root/support/bennet/haoransh/DDA_2D_60x70_kulow_1.batch
+        # lrwxrwxrwx brockp support_root  13.000  B Apr  1 2026 16:52 /gpfs/accounts/support_root/support/brockp/box-copy/brockscan
+        match = re.match(
+            rb"(\S+)\s+\S+\s+\S+\s+(\d+\.\d+)\s+(\S+)\s+.+\s(/.+)", line, re.DOTALL
+        )  # use re.DOTALL to match newlines in filenames
+
+        perms = match[1]
+        count = float(match[2])
+        units = match[3]
+        path = match[4]
+        if relativeto:
+            self.relativeto = relativeto
+        else:
+            self.relativeto = os.getcwd()
+
+        size_bytes = self._normalizeunits(units=units, count=count)  # size in bytes
+
+        # if symlink, overwrite with target size
+        self.is_symlink = perms.startswith(b"l")
+        if self.is_symlink and follow_symlinks:
+            try:
+                # os.stat follows symlinks -> target size
+                size_bytes = os.stat(path.rstrip(b"\r\n")).st_size
+            except FileNotFoundError:
+                logging.warning(f"Dangling Link {path!r} points to nothing")
+                pass
+            except PermissionError as e:
+                raise PermissionError(
+                    f"Link {path!r} points to something we cannot read"
+                ) from e
+
+        self.size = size_bytes
+
+        if stripcwd:
+            self.path = self._stripcwd(path)
+        else:
+            self.path = path
+
+    def _normalizeunits(self, units=False, count=False):
+        """convert size by SI units to Bytes"""
+        units = units.decode()  # convert binary data to string type
+        # SI powers, e.g., 1 KB = 10**3 bytes
+        SI_powers = dict(B=0, KB=3, MB=6, GB=9, TB=12, PB=15)
+        try:
+            num_bytes = count * 10 ** SI_powers[units]
+        except KeyError as ex:
+            raise Exception(f"{units} is not a known SI unit")
+        return num_bytes
+
+    def _stripcwd(self, path):
+        """dwalk print absolute paths, we need relative"""
+        return os.path.relpath(path, self.relativeto.encode())
+
+
+class DwalkParser:
+    def __init__(self, path=False):
+        # check that path exists
+        path = Path(path)
+        self.indexcount = 1
+        self.sizes = {}  # expected size in bytes of each tar list by index
+        if path.is_file():
+            logging.debug(f"using {path} as input for DwalkParser")
+            self.path = path.open("br")
+        else:
+            raise Exception(f"{self.path} doesn't exist")
+
+    def getpath(self, stripcwd=False):
+        """Get path one line at a time."""
+        for line in self.path:
+            pl = DwalkLine(line=line, stripcwd=stripcwd)
+            yield pl.path
+
+    def tarlist(
+        self,
+        prefix="archivetar",
+        minsize=1e9 * 100,
+        bundle_path=None,
+        follow_symlinks=False,
+    ):  # prefix for files
+        # min size sum of all files in list
+        # bundle_path where should indexes and files be created
+        # OUT tar list suitable for gnutar
+        # OUT index list
+        """takes dwalk output walks though until sum(size) >= minsize"""
+
+        logging.debug(f"minsize is set to {minsize} B")
+
+        if bundle_path:
+            # set outpath to this location
+            outpath = Path(bundle_path)
+        else:
+            # set to cwd
+            outpath = Path.cwd()
+
+        logging.debug(f"Indexes and lists will be written to: {outpath}")
+
+        tartmp_p = (
+            outpath / f"{prefix}-{self.indexcount}.DONT_DELETE.txt"
+        )  # list of files suitable for gnutar
+        index_p = outpath / f"{prefix}-{self.indexcount}.index.txt"
+        sizesum = 0  # size in bytes thus far
+        index = index_p.open("wb")
+        tartmp = tartmp_p.open("wb")
+        for line in self.path:
+            pl = DwalkLine(line=line, follow_symlinks=follow_symlinks)
+            sizesum += pl.size
+            index.write(line)  # already has newline
+            tartmp.write(pl.path)  # already has newline (binary)
+            if sizesum >= minsize:
+                # max size in tar reached
+                tartmp.close()
+                index.close()
+                logging.info(
+                    f"Minimum Archive Size {humanfriendly.format_size(minsize)} reached, Expected size: {humanfriendly.format_size(sizesum)}"
+                )
+                self.sizes[self.indexcount] = sizesum
+                yield self.indexcount, index_p, tartmp_p
+                self.indexcount += 1
+                # continue after yeilding file paths back to program
+                sizesum = 0
+                tartmp_p = (
+                    outpath / f"{prefix}-{self.indexcount}.DONT_DELETE.txt"
+                )  # list of files suitable for gnutar
+                index_p = outpath / f"{prefix}-{self.indexcount}.index.txt"
+                index = index_p.open("wb")
+                tartmp = tartmp_p.open("wb")
+        index.close()  # close and return for final round
+        tartmp.close()
+        self.sizes[self.indexcount] = sizesum
+        yield self.indexcount, index_p, tartmp_p
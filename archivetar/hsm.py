@@ -0,0 +1,286 @@
+"""
+Detect and recall files migrated to tape by HSM (Spectrum Archive / Data Den).
+
+A migrated file keeps its size but holds (almost) no blocks on disk, so the
+ratio of size to allocated blocks shows if it is offline.  Reading any byte
+triggers a recall, the last byte is used so nothing else is read.
+
+Recalling many files goes through a backend so an HSM's own batched recall
+command can replace reading each file, requests are sorted to follow the tape.
+"""
+import logging
+import os
+import shlex
+import subprocess  # nosec
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from environs import Env
+
+env = Env()
+logger = logging.getLogger(__name__)
+
+# minimum size of a file to consider offline based on block size.
+# for GPFS this normally means 2
+MIN_BLOCKS = env.float("MINBLOCKS", 2.0)
+
+# Replica factor
+# for GPFS / Spectrum Scale streatch systems the blocks on disk will be a multiple of replication.
+REPLICAS = env.int("REPLICAS", 2)
+
+# ratio offline. This often needs to be higher than 1 to account for some sparsenes in files such as zip files.
+OFFLINE_RATIO = env.int("OFFLINERATIO", 2)
+
+
+def block_ratio(st):
+    """
+    Ratio of size to blocks on disk of os.stat_result st.
+
+    Files with fewer than MIN_BLOCKS blocks (and empty files) are always 1.0
+    as small files look offline on GPFS.
+    """
+    if st.st_blocks == 0 or st.st_blocks <= MIN_BLOCKS:
+        return 1.0
+    return REPLICAS * (float(st.st_size) / (float(st.st_blocks) * 512.0))
+
+
+def is_offline(path):
+    """True if path looks migrated to tape."""
+    return block_ratio(os.stat(path)) > 1.0
+
+
+def recall(path):
+    """Read the last byte of path to trigger recall, blocks until it is back."""
+    start = time.time()
+    logger.debug(f"Attempting to recall: {path}")
+    with open(path, "rb") as token:
+        token.seek(-1, 2)  # seek to end of file minus one byte
+        token.read(1)  # read exactly one byte to trigger recall don't save it
+    logger.info(f"Recall time for {path} is {time.time() - start:.2f} Seconds")
+
+
+class Prefetcher:
+    """
+    Recall the next archives in line while earlier ones extract.
+
+    prefetch = Prefetcher(4)
+    prefetch.ahead(pending)  # after each dispatch, pending in extraction order
+    """
+
+    def __init__(self, depth):
+        """depth (int) How many upcoming archives to keep recalled, 0 disables."""
+        self.depth = depth
+        self.pool = ThreadPoolExecutor(depth) if depth else None
+        self.requested = {}  # archive: future
+
+    def ahead(self, pending):
+        """Issue recalls for offline archives among the first depth of pending."""
+        if not self.pool:
+            return
+        for archive in pending[: self.depth]:
+            if archive in self.requested:
+                continue
+            try:
+                offline = is_offline(archive)
+            except OSError as e:
+                logger.warning(f"Could not check {archive} for recall: {e}")
+                offline = False
+            if offline:
+                logger.info(f"Prefetching offline archive {archive}")
+                self.requested[archive] = self.pool.submit(recall, archive)
+            else:
+                self.requested[archive] = None
+
+    def shutdown(self):
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class RecallBackend:
+    """
+    How files are recalled from tape.
+
+    batched backends get whole sorted batches in one call, others get one file
+    per call so a pool of threads keeps several requests in flight in order.
+    """
+
+    batched = False
+
+    def recall(self, paths):
+        """Recall paths and block until they are back."""
+        raise NotImplementedError
+
+    def position(self, path, st):
+        """Sort key placing path near its neighbours on tape, inode by default."""
+        return st.st_ino
+
+
+class ReadRecall(RecallBackend):
+    """Read the last byte of each file, works with any HSM."""
+
+    def recall(self, paths):
+        for path in paths:
+            recall(path)
+
+
+class CommandRecall(RecallBackend):
+    """
+    Hand each batch to the HSM's recall command eg. eeadm or dsmrecall.
+
+    {list} in command is replaced by a file naming one path per line, otherwise the
+    paths are appended as arguments.
+    """
+
+    batched = True
+
+    def __init__(self, command):
+        self.command = shlex.split(command)
+
+    def recall(self, paths):
+        start = time.time()
+        if any("{list}" in a for a in self.command):
+            with tempfile.NamedTemporaryFile("w", suffix=".recall") as file_list:
+                file_list.write("".join(f"{path}\n" for path in paths))
+                file_list.flush()
+                cmd = [a.replace("{list}", file_list.name) for a in self.command]
+                subprocess.run(cmd, check=True)  # nosec
+        else:
+            subprocess.run(self.command + [str(p) for p in paths], check=True)  # nosec
+        logger.info(
+            f"Recall time for batch of {len(paths)} is {time.time() - start:.2f} Seconds"
+        )
+
+
+class LocalRecall(RecallBackend):
+    """
+    Stand-in for testing, records each batch taking latency seconds.
+
+    With a tape position function batches can be checked for seek order.
+    """
+
+    batched = True
+
+    def __init__(self, latency=0.0, position=None):
+        self.latency = latency
+        self.batches = []
+        if position:
+            self.position = position
+
+    def recall(self, paths):
+        time.sleep(self.latency)
+        self.batches.append(list(paths))
+
+
+def recall_backend_from_env():
+    """
+    Recall backend selected by AT_RECALL_BACKEND.
+
+    read (default) reads the last byte of each file, command runs AT_RECALL_COMMAND
+    on each batch, local records batches with AT_LOCAL_RECALL_LATENCY seconds each.
+    """
+    backend = env.str("AT_RECALL_BACKEND", default="read").lower()
+    if backend == "read":
+        return ReadRecall()
+    elif backend == "command":
+        return CommandRecall(env.str("AT_RECALL_COMMAND"))
+    elif backend == "local":
+        return LocalRecall(latency=env.float("AT_LOCAL_RECALL_LATENCY", default=0.0))
+    else:
+        raise ValueError(f"Unknown AT_RECALL_BACKEND {backend}")
+
+
+# sort keys for ordering recalls, backend uses the backend's tape position
+LOCALITY_KEYS = {
+    "inode": lambda backend: lambda path, st: st.st_ino,
+    "path": lambda backend: lambda path, st: str(path),
+    "backend": lambda backend: backend.position,
+}
+
+
+class Recaller:
+    """
+    Recall offline files in sorted batches while they are still being found.
+
+    recaller = Recaller(ReadRecall(), workers=20)
+    recaller.add(path, os.stat(path))  # as the scan finds them
+    recaller.poll()  # between finds so a slow scan doesn't hold a partial batch
+    recalled, failed = recaller.wait()
+    """
+
+    def __init__(self, backend, workers=20, batch=1000, order="inode", linger=30):
+        """
+        backend (RecallBackend) How to recall
+        workers (int) Recall requests in flight
+        batch (int) Files sorted together before recalling
+        order (str) Key of LOCALITY_KEYS
+        linger (float) Seconds a partial batch waits for more files
+        """
+        self.backend = backend
+        self.batch = batch
+        self.key = LOCALITY_KEYS[order](backend)
+        self.linger = linger
+        self.pool = ThreadPoolExecutor(workers)
+        self.futures = []  # (future, files) not yet counted
+        self.buffer = []  # (key, path)
+        self.recalled = 0
+        self.failed = 0
+        self._oldest = None
+
+    def add(self, path, st):
+        """Queue path with os.stat_result st, recalls a batch once full."""
+        if not self.buffer:
+            self._oldest = time.monotonic()
+        self.buffer.append((self.key(path, st), path))
+        if len(self.buffer) >= self.batch:
+            self.flush()
+
+    def poll(self):
+        """Recall a partial batch that has waited longer than linger."""
+        if self.buffer and time.monotonic() - self._oldest >= self.linger:
+            self.flush()
+
+    def flush(self):
+        """Sort and recall what is queued."""
+        paths = [path for _, path in sorted(self.buffer)]
+        self.buffer = []
+        self._reap()
+        if not paths:
+            return
+        logger.debug(f"Recalling batch of {len(paths)} files")
+        if self.backend.batched:
+            self.futures.append((self.pool.submit(self.backend.recall, paths), paths))
+        else:
+            for path in paths:
+                self.futures.append(
+                    (self.pool.submit(self.backend.recall, [path]), [path])
+                )
+
+    def _reap(self, wait=False):
+        """Count finished recalls and forget them, all of them if wait."""
+        running = []
+        for future, paths in self.futures:
+            if not (wait or future.done()):
+                running.append((future, paths))
+                continue
+            try:
+                future.result()
+            except (OSError, subprocess.CalledProcessError) as e:
+                logger.error(f"Recall of {len(paths)} files failed: {e}")
+                self.failed += len(paths)
+            else:
+                self.recalled += len(paths)
+        self.futures = running
+
+    def wait(self):
+        """
+        Recall anything left and wait for all recalls.
+
+        Returns:
+            recalled (int) Files recalled
+            failed (int) Files whose recall raised
+        """
+        self.flush()
+        self._reap(wait=True)
+        self.pool.shutdown()
+        return self.recalled, self.failed
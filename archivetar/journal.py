@@ -0,0 +1,50 @@
+"""
+Append only JSON lines journal so interrupted runs can resume.
+
+Each record is one short line written with O_APPEND so several processes may
+record to the same journal, a line cut short by a crash is ignored on read.
+"""
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+
+class Journal:
+    """
+    journal = Journal("prefix.unarchivetar.journal")
+    journal.record("done", archive="prefix-1.tar")
+    for entry in journal.entries():
+        entry["event"], entry["archive"]
+    """
+
+    def __init__(self, path):
+        """path (str/pathlib) Journal file, created on first record"""
+        self.path = Path(path)
+
+    def record(self, event, **fields):
+        """Append an event with fields, must be JSON serializable."""
+        line = json.dumps({"event": event, "time": time.time(), **fields}) + "\n"
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+
+    def entries(self):
+        """Yield each record in order, nothing if the journal does not exist."""
+        if not self.path.exists():
+            return
+        with self.path.open() as f:
+            for line_no, line in enumerate(f, start=1):
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(
+                        f"Ignoring incomplete record {self.path}:{line_no}"
+                    )
+
+    def reset(self):
+        """Start over, removes the journal."""
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,44 @@
+"""
+Where mpiFileUtils tools (dwalk, drm) run.
+
+AT_LAUNCHER picks how ranks start: mpirun (default) on this node or the nodes in
+AT_HOSTFILE, srun across a Slurm allocation, local for a single rank without
+MPI, or auto.  AT_NP sets the number of ranks, by default sized to the hostfile
+or allocation.
+
+Each run's throughput summary is kept in runs for log_runs() to report at the
+end, items/s per rank shows whether more ranks would help a metadata bound scan.
+"""
+import logging
+
+from environs import Env
+
+from mpiFileUtils import describe
+
+env = Env()
+
+# ProgressReporter.summary() of each mpiFileUtils run in this process
+runs = []
+
+# defaults used for development
+# overridden with AT_MPIRUN and AT_MPIFILEUTILS
+fileutils = "/sw/pkgs/arc/archivetar/0.17.0/install"
+mpirun = "/sw/pkgs/arc/stacks/gcc/10.3.0/openmpi/4.1.6/bin/mpirun"
+
+
+def mpi_kwargs():
+    """Keyword arguments for mpiFileUtils wrappers from the environment."""
+    return {
+        "inst": env.str("AT_MPIFILEUTILS", default=fileutils),
+        "mpirun": env.str("AT_MPIRUN", default=mpirun),
+        "launcher": env.str("AT_LAUNCHER", default="mpirun").lower(),
+        "hostfile": env.str("AT_HOSTFILE", default=None),
+        "np": env.int("AT_NP", default=None),
+        "runs": runs,
+    }
+
+
+def log_runs():
+    """Log the throughput of each mpiFileUtils run made so far."""
+    for run in runs:
+        logging.info(describe(run))
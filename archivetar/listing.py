@@ -0,0 +1,212 @@
+"""
+Pure Python stand in for dwalk when MPI or mpiFileUtils are not available.
+
+scan() walks a tree with a pool of scandir workers and writes the dwalk
+--text-output records DwalkParser reads, one per file or symbolic link sorted by
+path like dwalk --sort name.  split() divides such a list by size the way the
+dwalk --size filters in filter_list() do.  Sizes are written in bytes so they
+are exact rather than dwalk's three digits.
+"""
+import grp
+import logging
+import os
+import pwd
+import stat
+import tempfile
+import time
+from contextlib import ExitStack
+from functools import lru_cache, partial
+from pathlib import Path
+
+from archivetar.dwalk import DwalkLine
+from archivetar.walk import walk
+from mpiFileUtils import ProgressReporter
+
+# seconds in a day for --atime --mtime --ctime
+DAY = 86400
+
+
+@lru_cache(maxsize=None)
+def _user(uid):
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
+
+
+@lru_cache(maxsize=None)
+def _group(gid):
+    try:
+        return grp.getgrgid(gid).gr_name
+    except KeyError:
+        return str(gid)
+
+
+def record(path, st):
+    """dwalk --text-output line (bytes) of path with its os.lstat() st."""
+    mtime = time.strftime("%b %e %Y %H:%M", time.localtime(st.st_mtime))
+    fields = f"{stat.filemode(st.st_mode)} {_user(st.st_uid)} {_group(st.st_gid)} {st.st_size:.3f}  B {mtime} "
+    return fields.encode() + os.fsencode(path) + b"\n"
+
+
+def _days(value):
+    """(sign, days) of a --atime style value eg. +60"""
+    value = str(value)
+    if value[0] in "+-":
+        return value[0], int(value[1:])
+    return "", int(value)
+
+
+class StatFilter:
+    """
+    The find like --atime --mtime --ctime --user --group tests dwalk applies.
+
+    N days is exactly N days ago, +N more than and -N less than N days ago,
+    the fraction of a day is dropped like find.
+    """
+
+    def __init__(
+        self, atime=None, mtime=None, ctime=None, user=None, group=None, now=None
+    ):
+        self.now = now or time.time()
+        self.times = [
+            (attr, _days(value))
+            for attr, value in [
+                ("st_atime", atime),
+                ("st_mtime", mtime),
+                ("st_ctime", ctime),
+            ]
+            if value
+        ]
+        self.uid = pwd.getpwnam(user).pw_uid if user else None
+        self.gid = grp.getgrnam(group).gr_gid if group else None
+
+    @classmethod
+    def from_args(cls, args=None):
+        """Filter from the archivetar filter options, everything passes without."""
+        if args is None:
+            return cls()
+        return cls(
+            atime=args.atime,
+            mtime=args.mtime,
+            ctime=args.ctime,
+            user=args.user,
+            group=args.group,
+        )
+
+    def __call__(self, st):
+        if self.uid is not None and st.st_uid != self.uid:
+            return False
+        if self.gid is not None and st.st_gid != self.gid:
+            return False
+        for attr, (sign, days) in self.times:
+            age = int((self.now - getattr(st, attr)) // DAY)
+            if sign == "+" and not age > days:
+                return False
+            if sign == "-" and not age < days:
+                return False
+            if sign == "" and age != days:
+                return False
+        return True
+
+
+def _visit(dirpath, subdirs, entries, keep):
+    """walk() visit, (items seen, [(path, record)]) of files and links keep() passes."""
+    records = []
+    for entry in entries:
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue  # removed while scanning
+        if not (stat.S_ISREG(st.st_mode) or stat.S_ISLNK(st.st_mode)):
+            continue
+        if keep(st):
+            path = os.fsencode(entry.path)
+            records.append((path, record(entry.path, st)))
+    return len(entries) + 1, records
+
+
+def scan(path, textout, filters=None, workers=8, runs=None):
+    """
+    Walk path writing dwalk text records of its files and links to textout.
+
+    Parameters:
+        path (str/pathlib) Directory to walk, records hold absolute paths
+        textout (str/pathlib) List to write
+        filters (callable) Optional filters(st) True to keep a file eg. StatFilter
+        workers (int) Processes scanning at once
+        runs (list) Optional list the run's ProgressReporter.summary() is added to
+
+    Returns:
+        count (int) Records written
+    """
+    reporter = ProgressReporter("pywalk", ranks=workers, interval=0)
+    visit = partial(_visit, keep=filters or StatFilter())
+    items = 0
+    records = []
+    for seen, found in walk(os.path.abspath(path), visit, workers=workers):
+        items += seen
+        records.extend(found)
+
+    records.sort()  # by path like dwalk --sort name
+    with open(textout, "wb") as out:
+        out.writelines(line for _, line in records)
+
+    reporter.event(
+        {"event": "done", "items": items, "seconds": time.time() - reporter.start}
+    )
+    summary = reporter.summary()
+    logging.info(
+        f"Walked {items} items in {summary['seconds']:.2f} seconds ({summary['items_per_sec']:.1f} items/sec) kept {len(records)} files"
+    )
+    if runs is not None:
+        runs.append(summary)
+    return len(records)
+
+
+def split(path, size, prefix, purgelist=False):
+    """
+    Split the list path into files under size and the rest like filter_list().
+
+    Symbolic links of any size go with the files under size.
+
+    Parameters:
+        path (str/pathlib) dwalk text list eg. from scan()
+        size (int) Bytes
+        prefix (str) Name of the lists
+        purgelist (bool) Save the purge list of files under size in cwd not TMPDIR
+
+    Returns:
+        under (pathlib) Files under size then links
+        purge (pathlib) Files under size, a text purge list for archivepurge
+        over (pathlib) Files of size or more
+    """
+    tmp = Path(tempfile.gettempdir())
+    under_p = tmp / f"{prefix}.under.txt"
+    purge_p = (Path.cwd() if purgelist else tmp) / f"{prefix}.under.purge.txt"
+    over_p = tmp / f"{prefix}.over.txt"
+
+    links, at = [], []
+    with ExitStack() as stack:
+        records = stack.enter_context(open(path, "rb"))
+        under = stack.enter_context(under_p.open("wb"))
+        purge = stack.enter_context(purge_p.open("wb"))
+        over = stack.enter_context(over_p.open("wb"))
+        for line in records:
+            if line.startswith(b"l"):
+                links.append(line)
+                continue
+            if not line.startswith(b"-"):
+                continue  # directories and others are not archived
+            file_size = DwalkLine(line=line, stripcwd=False).size
+            if file_size < size:
+                under.write(line)
+                purge.write(line)
+            elif file_size > size:
+                over.write(line)
+            else:
+                at.append(line)
+        under.writelines(links)
+        over.writelines(at)
+
+    return under_p, purge_p, over_p
@@ -0,0 +1,96 @@
+"""
+Combined per tar manifest.
+
+Rather than a DONT_DELETE.txt list, index.txt and DONT_DELETE.sha1 next to every
+tar, --manifest stores them in one gzip compressed file prefix-N.DONT_DELETE.manifest.gz
+of JSON lines.  The first line describes the archive, each following line one member:
+
+    {"archive": "prefix-1.tar.gz", "version": 1}
+    {"path": "dir/file", "index": "<dwalk index line>", "sha1": "<hash or null>"}
+"""
+import gzip
+import json
+from pathlib import Path
+
+MANIFEST_SUFFIX = "DONT_DELETE.manifest.gz"
+MANIFEST_VERSION = 1
+
+
+def manifest_path(tar_list):
+    """prefix-N.DONT_DELETE.txt -> prefix-N.DONT_DELETE.manifest.gz"""
+    tar_list = Path(tar_list)
+    return tar_list.with_name(tar_list.name.replace("DONT_DELETE.txt", MANIFEST_SUFFIX))
+
+
+def _lines(path):
+    """Lines of text file without newline, handle any bytes in filenames."""
+    with open(path, "r", errors="surrogateescape") as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
+def write_manifest(archive, tar_list, index, checksum=None):
+    """
+    Combine the list, index and optional sha1 manifest of a tar into one file.
+
+    Parameters:
+        archive (str/pathlib) Tar the lists describe
+        tar_list (str/pathlib) prefix-N.DONT_DELETE.txt
+        index (str/pathlib) prefix-N.index.txt
+        checksum (str/pathlib) prefix-N.DONT_DELETE.sha1 or None
+
+    Returns:
+        manifest (pathlib) Path to prefix-N.DONT_DELETE.manifest.gz
+    """
+    manifest = manifest_path(tar_list)
+    sums = {}
+    if checksum is not None:
+        for line in _lines(checksum):
+            sha1, path = line.split(" ", 1)
+            sums[path] = sha1
+
+    with gzip.open(manifest, "wt", errors="surrogateescape") as f:
+        header = {"archive": Path(archive).name, "version": MANIFEST_VERSION}
+        f.write(json.dumps(header) + "\n")
+        for path, index_line in zip(_lines(tar_list), _lines(index)):
+            entry = {"path": path, "index": index_line, "sha1": sums.get(path)}
+            f.write(json.dumps(entry) + "\n")
+
+    return manifest
+
+
+def read_manifest(manifest):
+    """
+    Read a manifest.
+
+    Returns:
+        header (dict) archive name and version
+        entries (generator) dict for each member with path, index, sha1
+    """
+    f = gzip.open(manifest, "rt", errors="surrogateescape")
+    header = json.loads(f.readline())
+    if header.get("version") != MANIFEST_VERSION:
+        f.close()
+        raise ValueError(f"{manifest} has unknown manifest version {header}")
+
+    def entries():
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    return header, entries()
+
+
+def member_paths(file_list):
+    """
+    Yield paths of members from a DONT_DELETE.txt list or a manifest.
+
+    Parameters:
+        file_list (str/pathlib) prefix-N.DONT_DELETE.txt or prefix-N.DONT_DELETE.manifest.gz
+    """
+    if str(file_list).endswith(MANIFEST_SUFFIX):
+        _, entries = read_manifest(file_list)
+        for entry in entries:
+            yield entry["path"]
+    else:
+        yield from _lines(file_list)
@@ -9,9 +9,11 @@ import logging
 import os
 import pathlib
 import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-from environs import Env
-
+from archivetar.dwalk import DwalkLine
+from archivetar.launch import log_runs, mpi_kwargs
+from archivetar.manifest import member_paths
 from mpiFileUtils import DRm
 
 
@@ -27,7 +29,7 @@ def parse_args(args):
     )
     parser.add_argument(
         "--purge-list",
-        help="File created by --save-purge-list generated by archivetar",
+        help="File created by --save-purge-list generated by archivetar, an mpiFileUtils .cache removed with drm or a .txt list from --walker python removed here",
         type=str,
         required=True,
     )
@@ -39,6 +41,12 @@ def parse_args(args):
     parser.add_argument(
         "--keep-empty-dirs", help="Don't remove empty directories", action="store_true"
     )
+    parser.add_argument(
+        "--threads",
+        help="Directories scanned and removed at once when removing empty directories. Default 8",
+        type=int,
+        default=8,
+    )
 
     verbosity = parser.add_mutually_exclusive_group()
     verbosity.add_argument(
@@ -55,28 +63,145 @@ def parse_args(args):
     return args
 
 
-def purge_empty_folders(path):
-    """Rcurssively remove empty folders"""
-    if not isinstance(path, pathlib.Path):
-        # make pathlib
-        path = pathlib.Path(path)
+def _scan(path):
+    """One scandir of path, returns (path, number of entries, subdirectories)."""
+    count = 0
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                count += 1
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+    except OSError as e:
+        logging.warning(f"Could not scan {path}: {e}")
+        count = -1  # never remove what we can't see
+    return path, count, subdirs
+
+
+def _scan_tree(path, pool):
+    """Scan every directory under path in parallel, returns {dir: [entries, subdirs]}."""
+    tree = {}
+    futures = {pool.submit(_scan, path)}
+    while futures:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            d, count, subdirs = future.result()
+            tree[d] = [count, subdirs]
+            futures.update(pool.submit(_scan, sub) for sub in subdirs)
+    return tree
+
+
+def _rmdir(path):
+    try:
+        os.rmdir(path)
+    except OSError as e:
+        # something was created since the scan
+        logging.debug(f"Not removing {path}: {e}")
+        return False
+    logging.debug(f"Removing empty {path}")
+    return True
+
 
-    if not path.is_dir():
+def purge_empty_folders(path, threads=8):
+    """
+    Remove empty folders under path, and path if it ends up empty.
+
+    Each directory is read with a single scandir by a pool of threads, then
+    directories are removed deepest first a whole level at a time, a parent is
+    only removed once every child was.
+
+    Parameters:
+        path (str/pathlib) Top of tree
+        threads (int) Directories scanned / removed at once
+
+    Returns:
+        removed (int) Number of directories removed
+    """
+    path = os.path.normpath(os.fspath(path))
+    if not os.path.isdir(path):
         # path isn't a directory
         logging.debug(f"{path} is not a directory returning")
-        return
+        return 0
+
+    removed = 0
+    with ThreadPoolExecutor(threads) as pool:
+        tree = _scan_tree(path, pool)
+        logging.debug(f"Scanned {len(tree)} directories under {path}")
+
+        levels = {}
+        for d in tree:
+            levels.setdefault(d.count(os.sep), []).append(d)
+
+        for depth in sorted(levels, reverse=True):
+            empty = [d for d in levels[depth] if tree[d][0] == 0]
+            for d, ok in zip(empty, pool.map(_rmdir, empty)):
+                if ok:
+                    removed += 1
+                    parent = os.path.dirname(d)
+                    if parent in tree:
+                        tree[parent][0] -= 1
+
+    logging.info(f"Removed {removed} empty directories")
+    return removed
+
 
-    # remove empty sudir
-    for f in path.iterdir():
-        if f.is_dir():
-            purge_empty_folders(f)
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        return False
+    return True
 
-    # remove folders if empty
-    # have to check path again count items in it
-    entries = path.iterdir()
-    if len(list(entries)) == 0:
-        logging.debug(f"Removing emptry {path}")
-        path.rmdir()
+
+def unlink_files(paths, threads=8):
+    """
+    Delete files with a pool of threads.
+
+    Unlinks are metadata bound, several at once keep a parallel filesystem busy.
+    Files already gone are counted not raised.
+
+    Parameters:
+        paths (iterable) Files to remove
+        threads (int) Unlinks at once
+
+    Returns:
+        removed (int) Files deleted
+        missing (int) Files that did not exist
+    """
+    removed = missing = 0
+    with ThreadPoolExecutor(threads) as pool:
+        for ok in pool.map(_unlink, paths, chunksize=256):
+            if ok:
+                removed += 1
+            else:
+                missing += 1
+    return removed, missing
+
+
+def text_list_paths(purge_list):
+    """Paths (bytes) in a text purge list, dwalk text records."""
+    with open(purge_list, "rb") as records:
+        for line in records:
+            yield DwalkLine(line=line, stripcwd=False).path.rstrip(b"\n")
+
+
+def purge_members(file_list, threads=8):
+    """
+    Delete the files archived in one tar.
+
+    Parameters:
+        file_list (str/pathlib) prefix-N.DONT_DELETE.txt or manifest of the tar
+        threads (int) Unlinks at once
+
+    Returns:
+        removed (int) Files deleted
+    """
+    removed, missing = unlink_files(member_paths(file_list), threads=threads)
+    logging.info(f"Purged {removed} files archived in {file_list}")
+    if missing:
+        logging.warning(f"{missing} files in {file_list} were already gone")
+    return removed
 
 
 def main(argv):
@@ -88,37 +213,40 @@ def main(argv):
     else:
         logging.basicConfig(level=logging.INFO)
 
-    # load in config from .env
-    env = Env()
-    #  Can't load breaks singularity
-    #  env.read_env()  # read .env file, if it exists
-
     # check if cachefile given exists
     purge_list = pathlib.Path(args.purge_list)
     if not purge_list.is_file():
         logging.critical(f"{purge_list} does not exist or not a file")
         sys.exit(-2)
 
-    # setup drm
+    if purge_list.suffix == ".txt":
+        # text list from archivetar --walker python, no MPI needed
+        if args.dryrun:
+            for path in text_list_paths(purge_list):
+                print(os.fsdecode(path))
+        else:
+            removed, missing = unlink_files(
+                text_list_paths(purge_list), threads=args.threads
+            )
+            logging.info(f"Purged {removed} files in {purge_list}")
+            if missing:
+                logging.warning(f"{missing} files in {purge_list} were already gone")
+    else:
+        # setup drm
 
-    drm_kwargs = {}
-    if args.dryrun:
-        drm_kwargs["dryrun"] = True
-
-    drm = DRm(
-        inst=env.str(
-            "AT_MPIFILEUTILS", default="/sw/pkgs/arc/archivetar/0.17.0/install"
-        ),
-        mpirun=env.str(
-            "AT_MPIRUN",
-            default="/sw/pkgs/arc/stacks/gcc/10.3.0/openmpi/4.1.6/bin/mpirun",
-        ),
-        progress="10",
-        verbose=args.verbose,
-        **drm_kwargs,
-    )
+        drm_kwargs = {}
+        if args.dryrun:
+            drm_kwargs["dryrun"] = True
+
+        drm = DRm(
+            **mpi_kwargs(),
+            progress="10",
+            verbose=args.verbose,
+            **drm_kwargs,
+        )
 
-    drm.scancache(cachein=purge_list)
+        drm.scancache(cachein=purge_list)
+        log_runs()
 
     if args.dryrun:
         logging.debug("Dryrun requested exiting")
@@ -129,7 +257,7 @@ def main(argv):
         logging.debug("Skipping removing empty directories")
     else:
         logging.debug("Removing empty directories")
-        purge_empty_folders(pathlib.Path.cwd())
+        purge_empty_folders(pathlib.Path.cwd(), threads=args.threads)
 
     # remove purge list unless requsted
     if not args.save_purge_list:
@@ -0,0 +1,392 @@
+"""
+Timing and throughput report of an archivetar run.
+
+Each phase of main() and each stage of every tar (space, tar, checksum,
+manifest, upload, purge, wait) is timed.  The report is written as JSON
+<prefix>.archivetar.report.json in the bundle dir and optionally as a Prometheus
+textfile collector file <prefix>.archivetar.prom beside it, to compare runs with
+different --tar-processes, --tar-size or compression.
+
+tar is reading the files and compressing them together, the compressor runs in a
+pipe from tar so the two can't be timed apart.  The rate of tar against the
+bytes in and out shows which is limiting, bytes in per second falling as
+compression gets stronger is compression bound.  Each stage also counts the CPU
+seconds of the worker and the processes it ran (tar, the compressor, dtar), a
+tar using about as much CPU as wall time is CPU bound, much less is waiting on
+I/O.
+"""
+import json
+import logging
+import os
+import resource
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+# order stages are listed in, each tar only has those it ran
+STAGES = ["space", "lock", "tar", "checksum", "manifest", "upload", "purge", "wait"]
+
+# tar stage CPU seconds per wall second at or over this is CPU bound
+CPU_BOUND = 0.8
+
+# What a worker made of one tar list, see tar_result()
+TarResult = namedtuple(
+    "TarResult",
+    [
+        "rc",
+        "index",
+        "filename",
+        "in_bytes",
+        "out_bytes",
+        "members",
+        "timings",
+        "cpu",
+        "max_rss",
+        "exception",
+    ],
+)
+
+
+def cpu_seconds():
+    """User and system CPU seconds of this process and its waited for children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+@contextmanager
+def timed(timings, stage, cpu=None):
+    """
+    Add the seconds the block took to timings[stage].
+
+    With cpu also add the CPU seconds used in the block by this process and the
+    processes it ran and waited for to cpu[stage].
+    """
+    start = time.monotonic()
+    start_cpu = cpu_seconds() if cpu is not None else 0
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + time.monotonic() - start
+        if cpu is not None:
+            cpu[stage] = cpu.get(stage, 0) + cpu_seconds() - start_cpu
+
+
+def tar_result(
+    rc,
+    index,
+    filename,
+    in_bytes,
+    timings,
+    cpu,
+    out_bytes=0,
+    members=0,
+    exception=None,
+):
+    """
+    TarResult for a worker to put on out_q.
+
+    rc (int) 0 made or -1 failed
+    index (int) of the tar list, filename (str) tar made
+    in_bytes (int) size of the files listed, out_bytes (int) of the tar made
+    members (int) files listed
+    timings, cpu (dict) stage: seconds from timed()
+    exception raised by a failed tar
+
+    max_rss is the largest resident set in KiB of any process the worker has run
+    and waited for so far, usually the tar or compressor, not only this tar's.
+    """
+    return TarResult(
+        rc=rc,
+        index=index,
+        filename=filename,
+        in_bytes=in_bytes,
+        out_bytes=out_bytes,
+        members=members,
+        timings=timings,
+        cpu=cpu,
+        max_rss=resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        exception=exception,
+    )
+
+
+def _rate(amount, seconds):
+    """amount per second or None"""
+    if amount is None or not seconds:
+        return None
+    return amount / seconds
+
+
+def _label(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RunReport:
+    """
+    report = RunReport("box", runs=launch.runs)
+    with report.phase("scan") as counts:
+        counts["items"] = ...
+    report.tar(result)
+    logging.info(report.describe_tars())
+    report.write(path, status="success")
+    """
+
+    def __init__(self, prefix, runs=None):
+        """
+        prefix (str) --prefix of the run
+        runs (list) Optional ProgressReporter.summary() of mpiFileUtils and walker
+            runs, those made during a phase count toward its items and bytes
+        """
+        self.prefix = prefix
+        self.runs = runs if runs is not None else []
+        self.start = time.time()
+        self.phases = []
+        self.tars = []
+
+    @contextmanager
+    def phase(self, name):
+        """Time the block as phase name, set items and bytes of the dict it gives."""
+        counts = {}
+        first_run = len(self.runs)
+        start = time.monotonic()
+        try:
+            yield counts
+        finally:
+            seconds = time.monotonic() - start
+            made = self.runs[first_run:]
+            for key in ("items", "bytes"):
+                found = [run[key] for run in made if run.get(key) is not None]
+                if key not in counts and found:
+                    counts[key] = sum(found)
+            entry = {
+                "phase": name,
+                "seconds": round(seconds, 3),
+                "items": counts.get("items"),
+                "bytes": counts.get("bytes"),
+                "items_per_sec": _rate(counts.get("items"), seconds),
+                "bytes_per_sec": _rate(counts.get("bytes"), seconds),
+            }
+            self.phases.append(entry)
+            logging.info(describe_phase(entry))
+
+    def tar(self, result):
+        """Add the TarResult of a tar from a worker."""
+        timings, cpu = result.timings, result.cpu
+        tar_seconds = timings.get("tar")
+        cpu_ratio = _rate(cpu.get("tar"), tar_seconds)
+        bound = None
+        if cpu_ratio is not None:
+            bound = "cpu" if cpu_ratio >= CPU_BOUND else "io"
+        in_bytes, out_bytes = result.in_bytes, result.out_bytes
+        self.tars.append(
+            {
+                "index": result.index,
+                "filename": result.filename,
+                "rc": result.rc,
+                "in_bytes": in_bytes,
+                "out_bytes": out_bytes,
+                "members": result.members,
+                "ratio": in_bytes / out_bytes if in_bytes and out_bytes else None,
+                "seconds": round(sum(timings.values()), 3),
+                "stages": {
+                    stage: round(timings[stage], 3)
+                    for stage in STAGES
+                    if stage in timings
+                },
+                "cpu": {
+                    stage: round(cpu[stage], 3) for stage in STAGES if stage in cpu
+                },
+                "cpu_ratio": cpu_ratio,
+                "bound": bound,
+                "max_rss_kib": result.max_rss,
+                "in_bytes_per_sec": _rate(in_bytes, tar_seconds),
+                "out_bytes_per_sec": _rate(out_bytes, tar_seconds),
+                "members_per_sec": _rate(result.members, tar_seconds),
+            }
+        )
+
+    def describe_tars(self):
+        """One line of the tars so far for logs."""
+        made = [tar for tar in self.tars if tar["rc"] == 0]
+        in_bytes = sum(tar["in_bytes"] for tar in made)
+        out_bytes = sum(tar["out_bytes"] for tar in made)
+        tar_seconds = sum(tar["stages"].get("tar", 0) for tar in made)
+        parts = [f"Tars made {len(made)}"]
+        if len(made) != len(self.tars):
+            parts.append(f"failed {len(self.tars) - len(made)}")
+        parts.append(
+            f"{in_bytes / (1 << 30):.3f} GiB in {out_bytes / (1 << 30):.3f} GiB out"
+        )
+        if in_bytes and out_bytes:
+            parts.append(f"ratio {in_bytes / out_bytes:.2f}")
+        if tar_seconds:
+            # per tar, multiply by --tar-processes running for the total
+            parts.append(f"{in_bytes / tar_seconds / (1 << 20):.1f} MiB/s per tar")
+        bound = [tar["bound"] for tar in made]
+        parts.append(f"cpu bound {bound.count('cpu')} io bound {bound.count('io')}")
+        return " ".join(parts)
+
+    def summary(self, status=None):
+        """Dict of the whole run for JSON."""
+        stages, cpu = {}, {}
+        for tar in self.tars:
+            for stage, seconds in tar["stages"].items():
+                stages[stage] = stages.get(stage, 0) + seconds
+            for stage, seconds in tar["cpu"].items():
+                cpu[stage] = cpu.get(stage, 0) + seconds
+        made = [tar for tar in self.tars if tar["rc"] == 0]
+        in_bytes = sum(tar["in_bytes"] or 0 for tar in made)
+        out_bytes = sum(tar["out_bytes"] or 0 for tar in made)
+        return {
+            "prefix": self.prefix,
+            "status": status,
+            "start": self.start,
+            "seconds": round(time.time() - self.start, 3),
+            "phases": self.phases,
+            "tars": self.tars,
+            "totals": {
+                "tars": len(made),
+                "failed": len(self.tars) - len(made),
+                "in_bytes": in_bytes,
+                "out_bytes": out_bytes,
+                "ratio": in_bytes / out_bytes if out_bytes else None,
+                # busy seconds summed over all tars, not wall time
+                "stages": {stage: round(stages[stage], 3) for stage in stages},
+                "cpu": {stage: round(cpu[stage], 3) for stage in cpu},
+                "members": sum(tar["members"] for tar in made),
+                "cpu_bound": sum(tar["bound"] == "cpu" for tar in made),
+                "io_bound": sum(tar["bound"] == "io" for tar in made),
+                "max_rss_kib": max(
+                    (tar["max_rss_kib"] for tar in self.tars), default=0
+                ),
+            },
+            "runs": self.runs,
+        }
+
+    def write(self, path, status=None):
+        """Write the JSON report to path, replacing it whole."""
+        _replace(path, json.dumps(self.summary(status), indent=2) + "\n")
+
+    def write_prometheus(self, path, status=None):
+        """Write the run as a Prometheus textfile collector file to path."""
+        summary = self.summary(status)
+        prefix = _label(self.prefix)
+        metrics = [
+            (
+                "archivetar_run_start_timestamp_seconds",
+                "Unix time the archivetar run started",
+                [("", summary["start"])],
+            ),
+            (
+                "archivetar_run_seconds",
+                "Wall time of the archivetar run",
+                [("", summary["seconds"])],
+            ),
+            (
+                "archivetar_run_success",
+                "1 if the archivetar run finished without errors",
+                [("", int(status == "success"))],
+            ),
+            (
+                "archivetar_phase_seconds",
+                "Wall time of each archivetar phase",
+                [(f',phase="{p["phase"]}"', p["seconds"]) for p in self.phases],
+            ),
+            (
+                "archivetar_phase_items",
+                "Items handled in each archivetar phase",
+                [
+                    (f',phase="{p["phase"]}"', p["items"])
+                    for p in self.phases
+                    if p["items"] is not None
+                ],
+            ),
+            (
+                "archivetar_phase_bytes",
+                "Bytes handled in each archivetar phase",
+                [
+                    (f',phase="{p["phase"]}"', p["bytes"])
+                    for p in self.phases
+                    if p["bytes"] is not None
+                ],
+            ),
+            (
+                "archivetar_tars",
+                "Tars made by the archivetar run",
+                [
+                    (',result="success"', summary["totals"]["tars"]),
+                    (',result="failed"', summary["totals"]["failed"]),
+                ],
+            ),
+            (
+                "archivetar_tar_bytes",
+                "Bytes of files put in tars and of the tars made",
+                [
+                    (',direction="in"', summary["totals"]["in_bytes"]),
+                    (',direction="out"', summary["totals"]["out_bytes"]),
+                ],
+            ),
+            (
+                "archivetar_tar_stage_seconds",
+                "Seconds summed over all tars spent in each stage",
+                [
+                    (f',stage="{stage}"', seconds)
+                    for stage, seconds in summary["totals"]["stages"].items()
+                ],
+            ),
+            (
+                "archivetar_tar_stage_cpu_seconds",
+                "CPU seconds summed over all tars spent in each stage",
+                [
+                    (f',stage="{stage}"', seconds)
+                    for stage, seconds in summary["totals"]["cpu"].items()
+                ],
+            ),
+            (
+                "archivetar_tar_members",
+                "Files put in tars",
+                [("", summary["totals"]["members"])],
+            ),
+            (
+                "archivetar_tars_bound",
+                "Tars limited by CPU or by I/O",
+                [
+                    (',bound="cpu"', summary["totals"]["cpu_bound"]),
+                    (',bound="io"', summary["totals"]["io_bound"]),
+                ],
+            ),
+            (
+                "archivetar_tar_max_rss_bytes",
+                "Largest resident set of any tar or compressor process",
+                [("", summary["totals"]["max_rss_kib"] * 1024)],
+            ),
+        ]
+        lines = []
+        for name, text, samples in metrics:
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f'{name}{{prefix="{prefix}"{labels}}} {value}')
+        _replace(path, "\n".join(lines) + "\n")
+
+
+def _replace(path, text):
+    """Write text to path through a temporary file so readers never see part of it."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def describe_phase(entry):
+    """One line of a RunReport phase for logs."""
+    parts = [f"Phase {entry['phase']} took {entry['seconds']:.1f}s"]
+    if entry["items_per_sec"] is not None:
+        parts.append(f"{entry['items']} items {entry['items_per_sec']:.1f} items/s")
+    if entry["bytes_per_sec"] is not None:
+        parts.append(
+            f"{entry['bytes'] / (1 << 30):.3f} GiB {entry['bytes_per_sec'] / (1 << 20):.1f} MiB/s"
+        )
+    return " ".join(parts)
@@ -0,0 +1,114 @@
+"""Order and pace archive extraction in unarchivetar."""
+import logging
+import time
+
+import humanfriendly
+
+from SuperTar import what_comp
+
+# relative cost of extracting one archive, decompressors that are cpu bound
+# (single threaded bzip2/xz) get fewer at once, uncompressed is io bound so more
+CODEC_COST = {
+    None: 0.5,
+    "LZ4": 0.5,
+    "ZSTD": 1,
+    "GZIP": 1,
+    "BZ2": 2,
+    "XZ": 2,
+}
+
+
+def codec_cost(archive):
+    """Slots one extraction of archive uses based on its compression."""
+    if archive.suffix.lower() == ".tar":
+        # what_comp() would read the header and stall recalling an offline tar
+        return CODEC_COST[None]
+    try:
+        return CODEC_COST.get(what_comp(archive), 1)
+    except Exception:
+        # not readable yet eg. offline on tape, don't guess
+        return 1
+
+
+class ExtractScheduler:
+    """
+    Admit archives largest first within a budget of slots.
+
+    The budget starts at --tar-processes and is adjusted by hill climbing on the
+    aggregate extraction rate: after each window of completed archives the budget
+    keeps moving the same way while the rate improves and turns around when it
+    falls.
+    """
+
+    def __init__(self, slots, window=2, clock=time.monotonic):
+        """
+        slots (int) Starting budget, usually --tar-processes
+        window (int) Archives to complete between adjustments
+        clock (callable) Seconds, for testing
+        """
+        self.slots = float(slots)
+        self.min_slots = 1.0
+        self.max_slots = float(slots) * 2
+        self.window = window
+        self.clock = clock
+        self.running = {}  # archive: (cost, size)
+        self.results = []  # (archive, size, seconds)
+        self._step = 1.0
+        self._last = None  # aggregate bytes/s of last window
+        self._window_start = clock()
+        self._window_bytes = 0
+        self._window_count = 0
+
+    @property
+    def max_workers(self):
+        """Most extractions that can ever run at once."""
+        return int(self.max_slots / min(CODEC_COST.values()))
+
+    @staticmethod
+    def order(archives):
+        """Largest archives first so the longest running start earliest."""
+        return sorted(archives, key=lambda a: a.stat().st_size, reverse=True)
+
+    def admit(self, archive):
+        """True if archive fits in the current budget, always if nothing is running."""
+        used = sum(cost for cost, _ in self.running.values())
+        return not self.running or used + codec_cost(archive) <= self.slots
+
+    def start(self, archive):
+        self.running[archive] = (codec_cost(archive), archive.stat().st_size)
+
+    def finish(self, archive, seconds):
+        """
+        Record archive taking seconds to extract and adapt the budget.
+
+        Returns:
+            rate (float) bytes/s of archive
+        """
+        _, size = self.running.pop(archive)
+        self.results.append((archive, size, seconds))
+        self._window_bytes += size
+        self._window_count += 1
+        if self._window_count >= self.window:
+            self._adapt()
+        return size / max(seconds, 1e-9)
+
+    def _adapt(self):
+        now = self.clock()
+        rate = self._window_bytes / max(now - self._window_start, 1e-9)
+        self._window_start, self._window_bytes, self._window_count = now, 0, 0
+
+        last, self._last = self._last, rate
+        if last is None or rate > last * 1.1:
+            # first sample or more at once helped keep going the same way
+            pass
+        elif rate < last * 0.9:
+            # got worse turn around
+            self._step = -self._step
+        else:
+            return
+        old = self.slots
+        self.slots = min(max(self.slots + self._step, self.min_slots), self.max_slots)
+        if self.slots != old:
+            logging.info(
+                f"Extraction rate {humanfriendly.format_size(rate)}/s adjusting concurrency from {old:g} to {self.slots:g} slots"
+            )
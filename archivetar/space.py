@@ -0,0 +1,195 @@
+"""Monitor free space where archivetar bundles tars and indexes."""
+import logging
+import shutil
+import time
+from pathlib import Path
+
+import humanfriendly
+
+from archivetar.exceptions import ArchiveTarArchiveError
+
+
+def bundle_usage(path=None):
+    """
+    Percent of the filesystem holding path that is in use.
+
+    Parameters:
+        path (str/pathlib) Bundle directory, defaults to cwd
+    """
+    usage = shutil.disk_usage(Path(path or Path.cwd()))
+    return usage.used / usage.total * 100
+
+
+def wait_for_space(path, high_water, pending, interval=10):
+    """
+    Block while usage of path is above high_water percent.
+
+    Only pause while something is pending cleanup that will free space, otherwise
+    waiting would never end so continue and let the filesystem sort it out.
+
+    Parameters:
+        path (str/pathlib) Bundle directory
+        high_water (float) Percent used to start pausing
+        pending (multiprocessing.Value) Bytes handed to the cleanup stage not yet deleted
+        interval (int) Seconds between checks
+    """
+    paused = False
+    while (used := bundle_usage(path)) > high_water:
+        if pending.value <= 0:
+            if paused:
+                logging.info(f"Nothing left to cleanup resuming at {used:.1f}% used")
+            else:
+                logging.warning(
+                    f"{path} is {used:.1f}% used above {high_water}% but nothing is waiting to be removed continuing"
+                )
+            return
+        if not paused:
+            logging.info(
+                f"{path} is {used:.1f}% used above {high_water}% pausing new tars until uploads are cleaned up"
+            )
+            paused = True
+        time.sleep(interval)
+
+    if paused:
+        logging.info(f"{path} is {used:.1f}% used resuming new tars")
+
+
+def bundle_free(path=None, limit=None, held=0, high_water=None):
+    """
+    Bytes archivetar may still write to the bundle dir.
+
+    Parameters:
+        path (str/pathlib) Bundle directory, defaults to cwd
+        limit (int) Optional cap (eg. quota) on bytes archivetar may hold in path
+        held (int) Bytes archivetar already holds in path, counted against limit
+        high_water (float) Optional percent of the filesystem not to fill beyond
+    """
+    usage = shutil.disk_usage(Path(path or Path.cwd()))
+    free = usage.free
+    if high_water is not None:
+        free = min(free, usage.total * high_water / 100 - usage.used)
+    if limit is not None:
+        free = min(free, limit - held)
+    return max(int(free), 0)
+
+
+def preflight(
+    sizes,
+    path=None,
+    slots=1,
+    limit=None,
+    cleanup=False,
+    compress=False,
+    in_place=False,
+):
+    """
+    Estimate if the expected tars fit in the bundle dir before starting.
+
+    Without cleanup every tar stays in the bundle dir so all of them have to fit,
+    with cleanup only the tars running at once need to.  The same when archiving
+    in place and removing files as they are tarred, each tar frees about its own
+    size.  Sizes are before compression so with compress only warn.
+
+    Parameters:
+        sizes (dict) Expected bytes of each tar by index
+        path (str/pathlib) Bundle directory
+        slots (int) Tars that run at once --tar-processes
+        limit (int) Optional cap on bytes archivetar may hold in path
+        cleanup (bool) Tars are removed after upload --rm-at-files
+        compress (bool) Tars are compressed so sizes are an upper bound
+        in_place (bool) Tars are made next to the files they remove, --remove-files
+            or --stream-purge without --bundle-dir
+
+    Returns:
+        needed (int) bytes needed
+        free (int) bytes available
+
+    Raises:
+        ArchiveTarArchiveError if tars will not fit and no compression is used
+    """
+    free = bundle_free(path, limit=limit)
+    largest = sorted(sizes.values(), reverse=True)
+    transient = cleanup or in_place  # only the running tars are held at once
+    needed = sum(largest[:slots]) if transient else sum(largest)
+    logging.info(
+        f"Bundle dir needs up to {humanfriendly.format_size(needed)} has {humanfriendly.format_size(free)} free"
+    )
+    if needed > free:
+        msg = f"Expected tars {humanfriendly.format_size(needed)} are larger than {humanfriendly.format_size(free)} free in {path or Path.cwd()}"
+        if compress:
+            logging.warning(f"{msg} compression may make them fit")
+        elif transient:
+            logging.warning(f"{msg} tars will be started only as space allows")
+        else:
+            raise ArchiveTarArchiveError(
+                f"{msg} use --bundle-dir with more space or --rm-at-files"
+            )
+
+    return needed, free
+
+
+class SpaceScheduler:
+    """
+    Admit tars to the pool only when their expected size fits in the bundle dir.
+
+    Tars that are running reserve their full expected size, space used by finished
+    tars is seen by the filesystem and counted against limit.  When nothing fits
+    the caller pauses until running tars finish or the cleanup stage frees space.
+    """
+
+    def __init__(self, path=None, limit=None, high_water=None, pending=None):
+        """
+        path (str/pathlib) Bundle directory
+        limit (int) Optional cap on bytes archivetar may hold in path
+        high_water (float) Percent full not to exceed, used with cleanup
+        pending (multiprocessing.Value) Bytes waiting on cleanup, None without cleanup
+        """
+        self.path = path
+        self.limit = limit
+        self.high_water = high_water
+        self.pending = pending
+        self.running = {}  # index: expected bytes
+        self.written = 0  # bytes of finished tars
+        self.paused = False
+
+    @property
+    def held(self):
+        """Bytes of finished tars still in the bundle dir."""
+        if self.pending is not None:
+            return self.pending.value
+        return self.written
+
+    def admit(self, expected):
+        """Return True if a tar of expected bytes can start now."""
+        free = bundle_free(
+            self.path, limit=self.limit, held=self.held, high_water=self.high_water
+        )
+        free -= sum(self.running.values())
+        if expected <= free:
+            if self.paused:
+                logging.info("Space available in bundle dir resuming tars")
+                self.paused = False
+            return True
+
+        if not self.running and not (self.pending and self.pending.value):
+            # nothing will free space for us waiting would never end
+            logging.warning(
+                f"Tar of {humanfriendly.format_size(expected)} may not fit in {humanfriendly.format_size(max(free, 0))} free starting anyway"
+            )
+            return True
+
+        if not self.paused:
+            logging.info(
+                f"Waiting for space to start tar of {humanfriendly.format_size(expected)} only {humanfriendly.format_size(max(free, 0))} free in bundle dir"
+            )
+            self.paused = True
+        return False
+
+    def start(self, index, expected):
+        """Reserve expected bytes for tar index."""
+        self.running[index] = expected
+
+    def finish(self, index, size=0):
+        """Release reservation of tar index which wrote size bytes."""
+        self.running.pop(index, None)
+        self.written += size
@@ -5,15 +5,27 @@
 # Take a directory that was prepped by archivetar and expand
 
 import argparse
+import functools
 import logging
 import multiprocessing as mp
 import pathlib
 import sys
+import time
 
+import humanfriendly
 from natsort import natsorted
 
+from archivetar.catalog import Catalog, catalog_path
+from archivetar.checksum import Verifier, read_checksums, report
+from archivetar.hsm import Prefetcher
+from archivetar.journal import Journal
+from archivetar.manifest import MANIFEST_SUFFIX, member_paths
+from archivetar.schedule import ExtractScheduler
 from SuperTar import SuperTar
 
+# bytes of an uncompressed tar extracted between journal checkpoints
+CHECKPOINT_BYTES = 1 << 30
+
 
 def parse_args(args):
     """CLI Optoins takes sys.argv[1:]."""
@@ -34,10 +46,16 @@ def parse_args(args):
     num_cores = round(mp.cpu_count() / 4)
     parser.add_argument(
         "--tar-processes",
-        help=f"Number of parallel tars to invoke a once. Default {num_cores} is dynamic.  Increase for iop bound not using compression",
+        help=f"Number of parallel tars to invoke a once. Default {num_cores} is dynamic.  Uncompressed archives count as 1/2, bzip2 and xz as 2, adjusted as extraction rate is measured",
         type=int,
         default=num_cores,
     )
+    parser.add_argument(
+        "--split",
+        help="Extract each uncompressed tar with up to SPLIT tars at once, each reading a range of its members. Default divides --tar-processes among the archives",
+        type=int,
+        default=None,
+    )
 
     parser.add_argument(
         "--folder",
@@ -48,7 +66,48 @@ def parse_args(args):
     parser.add_argument(
         "-w",
         "--which-archive",
-        help="Using DONT_DELETE files when used with --folder <folder> report which archives will be needed for a given prefix",
+        help="Using DONT_DELETE files when used with --folder <folder>, --file <path> or --glob <pattern> report which archives will be needed for a given prefix",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--file",
+        help="With --which-archive find the archive holding exactly this path",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--glob",
+        help="With --which-archive find archives with paths matching shell pattern eg. 'dir/*.h5' (quote it)",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--catalog",
+        help="SQLite catalog of members built from the DONT_DELETE files on first use and updated when they change. Default <prefix>.catalog.sqlite",
+        type=pathlib.Path,
+        default=None,
+    )
+    parser.add_argument(
+        "--prefetch",
+        help="Recall from tape (HSM) the next N archives that are offline while earlier ones extract, 0 to disable. Default 4",
+        type=int,
+        default=4,
+        metavar="N",
+    )
+    parser.add_argument(
+        "--journal",
+        help="Record finished archives (and parts of uncompressed archives) so an interrupted run skips them when restarted. Default <prefix>.unarchivetar.journal",
+        type=pathlib.Path,
+        default=None,
+    )
+    parser.add_argument(
+        "--restart",
+        help="Ignore the journal of a previous run and expand every archive again",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--verify",
+        help="Check extracted files against the DONT_DELETE.sha1 checksums (or manifests) as each archive finishes, and prefix-large.DONT_DELETE.sha1 if present",
         action="store_true",
     )
 
@@ -117,22 +176,127 @@ def find_prefix_files(prefix, path=None, suffix="tar"):
     return tars
 
 
-def process(q, iolock):
+def find_file_lists(prefix, path=None):
+    """
+    Find the lists of members for each archive with prefix.
+
+    <prefix>-N.DONT_DELETE.txt or <prefix>-N.DONT_DELETE.manifest.gz when created with --manifest
+
+    Return array of pathlibs.Path()
+    """
+    file_lists = find_prefix_files(prefix, path, suffix="DONT_DELETE.txt")
+    file_lists.extend(find_prefix_files(prefix, path, suffix=MANIFEST_SUFFIX))
+    return natsorted(file_lists, key=str)
+
+
+def open_catalog(args):
+    """Open catalog for args.prefix and bring it up to date with its lists."""
+    file_lists = find_file_lists(args.prefix)
+    logging.info(f"Found {len(file_lists)} file lists with prefix {args.prefix}")
+    catalog = Catalog(args.catalog or catalog_path(args.prefix))
+    catalog.update(file_lists)
+    return catalog
+
+
+def find_checksums(archive):
+    """
+    Checksums for files in archive prefix-N.tar.*
+
+    prefix-N.DONT_DELETE.sha1 or prefix-N.DONT_DELETE.manifest.gz, None if neither exist
+    """
+    archive = pathlib.Path(archive)
+    name = archive.name.split(".tar")[0]
+    for suffix in ["DONT_DELETE.sha1", MANIFEST_SUFFIX]:
+        checksums = archive.parent / f"{name}.{suffix}"
+        if checksums.exists():
+            return checksums
+    return None
+
+
+def journal_range(journal, archive, size, folder, start, end):
+    """Record bytes start-end of archive extracted, called from the workers."""
+    Journal(journal).record(
+        "range", archive=archive, size=size, folder=folder, start=start, end=end
+    )
+
+
+def load_journal(journal, folder=None):
+    """
+    What a previous run finished.
+
+    Entries only count for the same --folder and archive size.
+
+    Returns:
+        done (set) of (archive name, size) fully extracted
+        ranges (dict) (archive name, size): [(start, end)] extracted of unfinished archives
+    """
+    done, ranges = set(), {}
+    for entry in journal.entries():
+        if entry.get("folder") != folder:
+            continue
+        key = (entry["archive"], entry["size"])
+        if entry["event"] == "done":
+            done.add(key)
+        elif entry["event"] == "range":
+            ranges.setdefault(key, []).append((entry["start"], entry["end"]))
+    return done, ranges
+
+
+def plan_archives(args, archives):
+    """
+    Select only the archives that hold args.folder.
+
+    Uses the catalog built from the DONT_DELETE lists, archives without a list
+    are kept as we can't tell what they hold.
+
+    Parameters:
+        args (Namespace) with prefix, folder and catalog
+        archives (list) pathlib archives for prefix
+
+    Returns:
+        archives (list) those to expand
+    """
+    with open_catalog(args) as catalog:
+        listed = catalog.names()
+        needed = catalog.names(args.folder)
+
+    selected = []
+    for archive in archives:
+        name = archive.name.split(".tar")[0]
+        if name in listed and name not in needed:
+            logging.debug(f"Skipping {archive} does not contain {args.folder}")
+            continue
+        if name not in listed:
+            logging.warning(f"No file list for {archive} will search it")
+        selected.append(archive)
+
+    logging.info(
+        f"{len(selected)} of {len(archives)} archives needed for folder {args.folder}"
+    )
+    return selected
+
+
+def process(q, out_q, iolock):
     """process the archives to expand them if they exist on the queue"""
     while True:
         args = q.get()  # tuple (t_args, e_args, archive)
         if args is None:
             break
-        with iolock:
-            t_args, e_args, archive = args
-            tar = SuperTar(
-                filename=archive, **t_args
-            )  # call inside the lock to keep stdout pretty
-        tar.extract(
-            **e_args
-        )  # this is the long running portion so let run outside the lock it prints nothing anyway
-        with iolock:
-            logging.info(f"Complete {tar.filename}")
+        t_args, e_args, archive = args
+        start = time.time()
+        ok = False
+        try:
+            with iolock:
+                tar = SuperTar(
+                    filename=archive, **t_args
+                )  # call inside the lock to keep stdout pretty
+            ok = tar.extract(
+                **e_args
+            )  # this is the long running portion so let run outside the lock it prints nothing anyway
+        except Exception as e:
+            with iolock:
+                logging.error(f"Expanding {archive} failed: {e}")
+        out_q.put((archive, time.time() - start, ok))
 
 
 def main(argv):
@@ -153,26 +317,33 @@ def main(argv):
 
     # alternative path when trying to find a folder in an archive, we need to know which archives to get
     if args.which_archive:
-        if not args.folder:
-            print("Selecting archives without --folder which is required")
+        if not (args.folder or args.file or args.glob):
+            print("Selecting archives without --folder, --file or --glob which is required")
             sys.exit(1)
-        file_lists = find_prefix_files(args.prefix, suffix="DONT_DELETE")
-        logging.info(f"Found {len(file_lists)} file lists with prefix {args.prefix}")
-
-        matches = set()
-        for file_list in file_lists:
-            with open(file_list, "r") as file:
-                for line_no, line in enumerate(file, start=1):
-                    # add a / to make a folder
-                    if line.startswith(args.folder + "/"):
-                        logging.debug(
-                            f"{file_list} : Match found at line {line_no}: {line}"
-                        )
-                        matches.add(str(file_list))
+
+        with open_catalog(args) as catalog:
+            if args.file:
+                query = functools.partial(catalog.exact, args.file)
+            elif args.glob:
+                query = functools.partial(catalog.glob, args.glob)
+            else:
+                query = functools.partial(catalog.folder, args.folder)
+
+            if args.verbose:
+                # offsets of the matching tars that are here and online only
+                names = {match.archive.split(".tar")[0] for match in query()}
+                catalog.read_offsets(names)
+
+            archives = {}
+            for match in query():
+                logging.debug(
+                    f"{match.archive} : {match.path} offset: {match.offset}"
+                )
+                archives[match.archive] = archives.get(match.archive, 0) + 1
 
         print("\nRecall archives for the following:\n")
-        for match in matches:
-            print(match)
+        for archive, count in archives.items():
+            print(f"{archive}  ({count} matching files)")
 
         # don't continue on
         sys.exit(0)
@@ -181,36 +352,131 @@ def main(argv):
     archives = find_prefix_files(args.prefix)
     logging.info(f"Found {len(archives)} archives with prefix {args.prefix}")
 
-    # start parallel pool
+    if args.folder:
+        archives = plan_archives(args, archives)
+
+    # left over tar processes go to splitting archives when there are few of them
+    split = args.split or max(1, args.tar_processes // max(len(archives), 1))
+    logging.debug(f"Uncompressed archives extracted by up to {split} tars each")
+
+    t_args = {}  # arguments to tar constructor
+    if args.tar_verbose:
+        t_args["verbose"] = True
+    if args.folder:
+        t_args["path"] = args.folder
+    if args.tar_options:
+        t_args["extra_options"] = args.tar_options.split()
+
+    e_args = {}  # arguments to extract()
+    if args.keep_old_files:
+        e_args["keep_old_files"] = True
+    if args.skip_old_files:
+        e_args["skip_old_files"] = True
+    if args.keep_newer_files:
+        e_args["keep_newer_files"] = True
+    e_args["processes"] = split
+
+    sizes = {archive: archive.stat().st_size for archive in archives}
+    journal, done, ranges = None, set(), {}
+    if not args.dryrun:
+        journal = Journal(args.journal or f"{args.prefix}.unarchivetar.journal")
+        if args.restart:
+            journal.reset()
+        done, ranges = load_journal(journal, args.folder)
+        finished = [a for a in archives if (a.name, sizes[a]) in done]
+        if finished:
+            logging.info(
+                f"Skipping {len(finished)} archives already expanded according to {journal.path} use --restart to expand again"
+            )
+            archives = [a for a in archives if a not in finished]
+
+    scheduler = ExtractScheduler(args.tar_processes)
+    pending = scheduler.order(archives)
+    if args.dryrun:
+        for archive in pending:
+            logging.info(f"Expanding archive {archive}")
+        logging.info("Dryrun requested will not expand")
+        return
+
+    # start parallel pool, the scheduler limits how many are busy
     q = mp.Queue()
+    out_q = mp.Queue()
     iolock = mp.Lock()
-    pool = mp.Pool(args.tar_processes, initializer=process, initargs=(q, iolock))
-    for archive in archives:
-        logging.info(f"Expanding archive {archive}")
-
-        if args.dryrun:
-            logging.info("Dryrun requested will not expand")
-        else:
-            t_args = {}  # arguments to tar constructor
-            if args.tar_verbose:
-                t_args["verbose"] = True
-            if args.folder:
-                t_args["path"] = args.folder
-            if args.tar_options:
-                t_args["extra_options"] = args.tar_options.split()
-
-            e_args = {}  # arguments to extract()
-            if args.keep_old_files:
-                e_args["keep_old_files"] = True
-            if args.skip_old_files:
-                e_args["skip_old_files"] = True
-            if args.keep_newer_files:
-                e_args["keep_newer_files"] = True
-
-            q.put((t_args, e_args, archive))  # put work on the queue
-
-    for _ in range(args.tar_processes):  # tell workers we're done
+    workers = min(scheduler.max_workers, len(pending)) or 1
+    verifier = Verifier(args.tar_processes) if args.verify else None
+    prefetch = Prefetcher(args.prefetch)
+    pool = mp.Pool(workers, initializer=process, initargs=(q, out_q, iolock))
+    start = time.time()
+    failed = []  # archives tar returned an error for
+    while pending or scheduler.running:
+        while pending and scheduler.admit(pending[0]):
+            archive = pending.pop(0)
+            logging.info(f"Expanding archive {archive}")
+            scheduler.start(archive)
+            a_args = dict(e_args)
+            done_ranges = ranges.get((archive.name, sizes[archive]))
+            if done_ranges:
+                logging.info(f"Resuming {archive} skipping parts already expanded")
+                a_args["done_ranges"] = done_ranges
+            if split > 1 or done_ranges:
+                # extracted in pieces anyway, checkpoint them so a restart can skip finished ones
+                a_args["range_bytes"] = CHECKPOINT_BYTES
+                a_args["range_done"] = functools.partial(
+                    journal_range,
+                    str(journal.path),
+                    archive.name,
+                    sizes[archive],
+                    args.folder,
+                )
+            q.put((t_args, a_args, archive))  # put work on the queue
+        prefetch.ahead(pending)
+
+        archive, seconds, ok = out_q.get()
+        rate = scheduler.finish(archive, seconds)
+        if not ok:
+            failed.append(archive)
+        if ok and journal:
+            journal.record(
+                "done", archive=archive.name, size=sizes[archive], folder=args.folder
+            )
+        logging.info(
+            f"Complete {archive} in {humanfriendly.format_timespan(seconds)} {humanfriendly.format_size(rate)}/s"
+        )
+        if verifier:
+            # hash while later archives are extracted
+            checksums = find_checksums(archive)
+            if checksums:
+                verifier.submit(read_checksums(checksums), path=args.folder)
+            else:
+                logging.warning(f"No checksums found for {archive} not verified")
+
+    for _ in range(workers):  # tell workers we're done
         q.put(None)
 
     pool.close()
     pool.join()
+    prefetch.shutdown()
+
+    total = sum(size for _, size, _ in scheduler.results)
+    elapsed = time.time() - start
+    logging.info(
+        f"Expanded {len(scheduler.results)} archives {humanfriendly.format_size(total)} in {humanfriendly.format_timespan(elapsed)} {humanfriendly.format_size(total / max(elapsed, 1e-9))}/s"
+    )
+
+    if failed:
+        logging.error(
+            f"Errors expanding {' '.join(str(a) for a in failed)} run again to retry them"
+        )
+    else:
+        # everything expanded, a later run in this directory starts fresh
+        journal.reset()
+
+    if verifier:
+        large = pathlib.Path(f"{args.prefix}-large.DONT_DELETE.sha1")
+        if large.exists():
+            verifier.submit(read_checksums(large), path=args.folder)
+        if not report(verifier.wait()):
+            sys.exit(1)
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,152 @@
+"""
+Parallel directory walker.
+
+Workers take directories from a shared queue, scandir them, put the
+subdirectories they find back on the queue for any idle worker and hand the
+other entries to a visit function.  Only the frontier of directories not yet
+scanned is held in memory and results stream back in batches as the walk runs
+rather than after it.
+
+    def visit(dirpath, subdirs, entries):
+        return sum(e.stat(follow_symlinks=False).st_size for e in entries)
+
+    total = sum(walk(".", visit, workers=8))
+"""
+import logging
+import multiprocessing as mp
+import os
+import queue
+
+# directories a worker scans between sending results back
+FLUSH_DIRS = 1000
+
+
+def _scan(path, prune):
+    """Return (subdirs, entries) of path, entries are os.DirEntry of everything else."""
+    subdirs, entries = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    entries.append(entry)
+                elif not (prune and prune(entry.path)):
+                    subdirs.append(entry.path)
+    except OSError as e:
+        # same as os.walk() unreadable directories are skipped
+        logging.warning(f"Skipping {path}: {e}")
+    return subdirs, entries
+
+
+def _stat(path):
+    """os.stat() of path or None if it can't be read."""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def _worker(dirs_q, out_q, outstanding, visit, prune, lookup, stat):
+    """
+    Pool worker scan directories from dirs_q until None.
+
+    outstanding counts directories queued or being scanned, it is raised by the
+    subdirectories found before they are queued so it only reaches 0 once the
+    whole tree is scanned.  Puts on out_q:
+        ("results", [results]) whenever dirs_q is empty or FLUSH_DIRS were scanned
+        ("walked", None) by the worker that scanned the last directory
+        ("error", exception) if visit raised
+        ("exit", None) on None after all its results were sent
+    """
+    results = []
+    while True:
+        try:
+            path = dirs_q.get_nowait()
+        except queue.Empty:
+            if results:
+                out_q.put(("results", results))
+                results = []
+            path = dirs_q.get()
+        if path is None:
+            break
+
+        try:
+            cached = lookup(path) if lookup else None
+            if cached is None:
+                kwargs = {"st": _stat(path)} if stat else {}
+                subdirs, entries = _scan(path, prune)
+                cached = subdirs, visit(path, subdirs, entries, **kwargs)
+            subdirs, result = cached
+            results.append(result)
+        except Exception as e:
+            logging.error(f"Error walking {path}")
+            out_q.put(("error", e))
+            raise e
+        with outstanding.get_lock():
+            outstanding.value += len(subdirs) - 1
+            walked = outstanding.value == 0
+        for subdir in subdirs:
+            dirs_q.put(subdir)
+        if walked or len(results) >= FLUSH_DIRS:
+            out_q.put(("results", results))
+            results = []
+        if walked:
+            out_q.put(("walked", None))
+
+    if results:
+        # None can come from get_nowait() with results not yet sent
+        out_q.put(("results", results))
+    out_q.put(("exit", None))
+
+
+def walk(top, visit, workers=8, prune=None, lookup=None, stat=False):
+    """
+    Walk top in parallel yielding visit(dirpath, subdirs, entries) of each directory.
+
+    Results come in the order directories are scanned, not a tree order.  Symbolic
+    links to directories are passed to visit, not followed.  With the default fork
+    start method visit, prune and lookup may be any function otherwise they must
+    pickle.
+
+    Parameters:
+        top (str/pathlib) Directory to walk
+        visit (callable) visit(dirpath, subdirs, entries) result to yield for each
+            directory, subdirs are paths to walk entries os.DirEntry of the rest
+        workers (int) Processes scanning at once
+        prune (callable) Optional prune(dirpath) True to not descend into dirpath
+        lookup (callable) Optional lookup(dirpath) (subdirs, result) to use without
+            scanning dirpath or None to scan it, eg. from a cache
+        stat (bool) Also pass visit st= the os.stat() of dirpath taken before it is
+            scanned (None if unreadable), entries changed during the scan then
+            leave dirpath newer than st
+    """
+    dirs_q = mp.Queue()
+    out_q = mp.Queue()
+    outstanding = mp.Value("q", 1)
+    dirs_q.put(os.fspath(top))
+
+    pool = mp.Pool(
+        workers,
+        initializer=_worker,
+        initargs=(dirs_q, out_q, outstanding, visit, prune, lookup, stat),
+    )
+    try:
+        running = workers
+        while running:
+            kind, payload = out_q.get()
+            if kind == "results":
+                yield from payload
+            elif kind == "walked":
+                for _ in range(workers):  # tell workers we're done
+                    dirs_q.put(None)
+            elif kind == "exit":
+                running -= 1
+            elif kind == "error":
+                raise payload
+        pool.close()
+        pool.join()
+    finally:
+        pool.terminate()
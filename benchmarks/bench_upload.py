@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+# Benchmark archivetar Phase 2 (tar + upload) end to end against the LocalTransfer
+# stand-in so transfer orchestration can be measured without Globus.
+#
+# Phase 1 / 1.5 need MPI and mpiFileUtils, the file lists they would produce are
+# synthesized here and handed to archivetar.main() directly.
+#
+# Example:
+#   python benchmarks/bench_upload.py --tars 2000 --files-per-tar 8 --file-size 64K \
+#       --tar-processes 8 --latency 0.5 --bandwidth 500M
+
+import argparse
+import logging
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+import humanfriendly
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import archivetar  # noqa: E402
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description="Benchmark archive-and-upload throughput with the local transfer stand-in"
+    )
+    parser.add_argument("--tars", type=int, default=1000, help="Number of tars")
+    parser.add_argument("--files-per-tar", type=int, default=8)
+    parser.add_argument("--file-size", default="64K", help="Size of each small file")
+    parser.add_argument("--tar-processes", type=int, default=4)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds before each task starts"
+    )
+    parser.add_argument(
+        "--bandwidth", default=None, help="Bytes/s per transfer task eg. 500M"
+    )
+    parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="Pass --rm-at-files so uploads are waited on and cleaned up",
+    )
+    parser.add_argument(
+        "--workdir", default=None, help="Where to create data, default TMPDIR"
+    )
+    return parser.parse_args(args)
+
+
+def make_tree(root, files, size):
+    """Create files of size bytes and a dwalk style text listing of them."""
+    data = os.urandom(size)
+    listing = root.parent / "listing.txt"
+    with listing.open("wb") as out:
+        for n in range(files):
+            d = root / f"dir{n // 1000}"
+            d.mkdir(exist_ok=True)
+            f = d / f"file{n}"
+            f.write_bytes(data)
+            out.write(
+                f"-rw-r--r-- user group {size:.3f}  B Jan  1 2020 00:00 {f}\n".encode()
+            )
+    return listing
+
+
+def main(argv):
+    ops = parse_args(argv[1:])
+    size = humanfriendly.parse_size(ops.file_size)
+
+    with tempfile.TemporaryDirectory(dir=ops.workdir) as tmp:
+        tmp = pathlib.Path(tmp)
+        src = tmp / "src"
+        dest = tmp / "dest"
+        state = tmp / "state"
+        src.mkdir()
+        files = ops.tars * ops.files_per_tar
+        listing = make_tree(src, files, size)
+        over = tmp / "over.txt"
+        over.touch()
+
+        os.environ["AT_TRANSFER_BACKEND"] = "local"
+        os.environ["AT_LOCAL_TRANSFER_LATENCY"] = str(ops.latency)
+        if ops.bandwidth:
+            os.environ["AT_LOCAL_TRANSFER_BANDWIDTH"] = ops.bandwidth
+        os.environ["TMPDIR"] = str(state)
+        state.mkdir()
+        tempfile.tempdir = None  # pick up new TMPDIR
+
+        # skip MPI phases, hand main() the lists filter_list() would have produced
+        archivetar.filter_list = lambda **kwargs: (listing, None, over)
+
+        argv = [
+            "archivetar",
+            "--prefix",
+            "bench",
+            "--list",
+            str(listing),
+            "--tar-size",
+            str(ops.files_per_tar * size),
+            "--tar-processes",
+            str(ops.tar_processes),
+            "--destination-dir",
+            str(dest),
+            "--no-checksum",
+            "-q",
+        ]
+        if ops.wait:
+            argv.append("--rm-at-files")
+
+        os.chdir(src)
+        start = time.time()
+        archivetar.main(argv)
+        elapsed = time.time() - start
+
+        total = files * size
+        tars = len(list(dest.glob("bench-*.tar")))
+        left = len(list(src.glob("bench-*")))
+        print(f"Tars:       {tars}")
+        print(f"Left local: {left}")
+        print(f"Files:      {files}")
+        print(f"Data:       {humanfriendly.format_size(total)}")
+        print(f"Wall time:  {elapsed:.2f} s")
+        print(f"Tars/s:     {tars / elapsed:.2f}")
+        print(f"Files/s:    {files / elapsed:.2f}")
+        print(f"Throughput: {humanfriendly.format_size(total / elapsed)}/s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main(sys.argv)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# Benchmark archivetar Phase 1 scans, the pure Python walker (--walker python)
+# against dwalk from mpiFileUtils, on a synthetic tree or an existing directory.
+#
+# dwalk is only run when mpiFileUtils is found (AT_MPIFILEUTILS, AT_MPIRUN,
+# AT_LAUNCHER, AT_NP as for archivetar).
+#
+# Example:
+#   python benchmarks/bench_walk.py --dirs 2000 --files-per-dir 50 --workers 1 4 16
+#   AT_LAUNCHER=srun python benchmarks/bench_walk.py --path /scratch/project --dwalk
+
+import argparse
+import logging
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from archivetar import listing  # noqa: E402
+from archivetar.launch import mpi_kwargs  # noqa: E402
+from mpiFileUtils import DWalk  # noqa: E402
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Python walker against dwalk building file lists"
+    )
+    parser.add_argument(
+        "--path", default=None, help="Existing directory to scan, default synthetic"
+    )
+    parser.add_argument("--dirs", type=int, default=1000, help="Synthetic directories")
+    parser.add_argument("--files-per-dir", type=int, default=50)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 4, 8],
+        help="Python walker process counts to run",
+    )
+    parser.add_argument(
+        "--dwalk", action="store_true", help="Also time dwalk --text-output"
+    )
+    parser.add_argument(
+        "--workdir", default=None, help="Where to create data, default TMPDIR"
+    )
+    return parser.parse_args(args)
+
+
+def make_tree(root, dirs, files):
+    """dirs directories two deep with files empty files each."""
+    for d in range(dirs):
+        path = root / f"d{d % 32}" / f"sub{d}"
+        path.mkdir(parents=True)
+        for f in range(files):
+            (path / f"file{f}").touch()
+
+
+def report(name, items, elapsed):
+    print(
+        f"{name:<16} {items:>10} items {elapsed:8.2f} s {items / elapsed:12.1f} items/s"
+    )
+
+
+def main(argv):
+    ops = parse_args(argv[1:])
+
+    with tempfile.TemporaryDirectory(dir=ops.workdir) as tmp:
+        tmp = pathlib.Path(tmp)
+        if ops.path:
+            top = pathlib.Path(ops.path).resolve()
+        else:
+            top = tmp / "tree"
+            make_tree(top, ops.dirs, ops.files_per_dir)
+
+        for workers in ops.workers:
+            start = time.time()
+            count = listing.scan(top, tmp / f"python-{workers}.txt", workers=workers)
+            report(f"python x{workers}", count, time.time() - start)
+
+        if ops.dwalk:
+            kwargs = mpi_kwargs()
+            if not os.path.exists(f"{kwargs['inst']}/bin/dwalk"):
+                print(f"No dwalk in {kwargs['inst']} set AT_MPIFILEUTILS")
+                return
+            dwalk = DWalk(**kwargs, filter=["--type", "f"], sort="name")
+            textout = tmp / "dwalk.txt"
+            start = time.time()
+            dwalk.scanpath(path=str(top), textout=textout)
+            elapsed = time.time() - start
+            with textout.open("rb") as f:
+                count = sum(1 for _ in f)
+            report(f"dwalk x{dwalk.ranks}", count, elapsed)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main(sys.argv)
@@ -1,51 +1,401 @@
 import logging
 import os
+import re
+import shutil
 import subprocess  # nosec
+import sys
+import tarfile
+import threading
+import time
 
 from mpiFileUtils.exceptions import mpiFileUtilsError, mpirunError
 
 logging.getLogger(__name__).addHandler(logging.NullHandler)
 
+# ranks started on each node when not told otherwise
+RANKS_PER_NODE = 12
+
+# seconds between progress reports logged while a tool runs
+REPORT_INTERVAL = 60
+
+# mpiFileUtils output, lines start with a [timestamp] from MFU_LOG
+_TIMESTAMP = re.compile(r"^\[\d{4}-\d\d-\d\d[T ][\d:.]+\]\s*")
+# Walked 1234 items in 10.002 secs (123.4 items/sec) ...
+# Removed 1234 items (12.34%) in 10.002 secs (123.4 items/sec) 80 secs remaining ...
+# Tarred 1.234 GiB (12%) in 10.002 secs (126.4 MiB/sec) 80 secs left ...
+_COUNT = re.compile(
+    r"^[A-Z][a-z]+\s+(?P<amount>[\d.]+)\s*(?P<unit>items|files|[KMGTPE]?i?B)?\s*"
+    r"(?:\((?P<percent>[\d.]+)%\)\s*)?in\s+(?P<seconds>[\d.]+)\s*sec"
+)
+_RATE = re.compile(
+    r"\((?P<rate>[\d.]+)\s*(?P<unit>items|files|[KMGTPE]?i?B)/s(?:ec)?\)"
+)
+_LEFT = re.compile(r"(?P<left>[\d.]+)\s*secs?\s+(?:remaining|left)")
+# Items: 1234  Files: 1000  Data: 1.234 GiB (1.234 MiB per file)
+_TOTAL = re.compile(
+    r"^(?P<key>Items|Directories|Files|Links|Data):\s+(?P<value>[\d.]+)\s*(?P<unit>[KMGTPE]?i?B)?"
+)
+# --distribution size:0,80 rows, range then count
+_BUCKET = re.compile(
+    r"^\[?\s*(?P<low>[\d.]+\s*[KMGTPE]?i?B?)\s*-\s*(?P<high>[\d.]+\s*[KMGTPE]?i?B?|\S*inf\S*)\s*[)\]]?\s+(?P<count>\d+)\s*$"
+)
+_UNITS = {
+    "": 1,
+    "K": 1 << 10,
+    "M": 1 << 20,
+    "G": 1 << 30,
+    "T": 1 << 40,
+    "P": 1 << 50,
+    "E": 1 << 60,
+}
+
+
+def _bytes(amount, unit):
+    """Bytes of an mpiFileUtils size eg. 1.234 GiB, its units are powers of 1024."""
+    return int(float(amount) * _UNITS[unit.rstrip("B").rstrip("i")])
+
+
+def parse_progress(line):
+    """
+    Event dict of one line of mpiFileUtils output or None if it carries no numbers.
+
+    event is one of:
+        progress  periodic --progress line with items or bytes, seconds, rates,
+                  percent and remaining when the tool gives them
+        done      the same counts at the end of a phase
+        total     a summary line, key Items, Directories, Files, Links or Data
+        bucket    a --distribution row low, high, count
+    """
+    line = _TIMESTAMP.sub("", line.strip())
+    m = _COUNT.match(line)
+    if m:
+        kind = "progress" if line.endswith("...") else "done"
+        event = {"event": kind, "seconds": float(m["seconds"])}
+        if m["unit"] and m["unit"].endswith("B"):
+            event["bytes"] = _bytes(m["amount"], m["unit"])
+        else:
+            event["items"] = int(float(m["amount"]))
+        if m["percent"]:
+            event["percent"] = float(m["percent"])
+        rate = _RATE.search(line)
+        if rate and rate["unit"].endswith("B"):
+            event["bytes_per_sec"] = _bytes(rate["rate"], rate["unit"])
+        elif rate:
+            event["items_per_sec"] = float(rate["rate"])
+        left = _LEFT.search(line)
+        if left:
+            event["remaining"] = float(left["left"])
+        return event
+    m = _TOTAL.match(line)
+    if m:
+        if m["key"] == "Data":
+            return {
+                "event": "total",
+                "key": "Data",
+                "bytes": _bytes(m["value"], m["unit"] or "B"),
+            }
+        return {"event": "total", "key": m["key"], "items": int(float(m["value"]))}
+    m = _BUCKET.match(line)
+    if m:
+        return {
+            "event": "bucket",
+            "low": m["low"].strip(),
+            "high": m["high"].strip(),
+            "count": int(m["count"]),
+        }
+    return None
+
+
+class ProgressReporter:
+    """
+    Collect parse_progress() events of one tool run.
+
+    Logs rate and time left every interval seconds while the tool runs and
+    summary() gives the totals for an end of run report.
+
+    tool     str  name of the tool, eg. dwalk
+    ranks    int  MPI ranks it ran with, for rates per rank
+    interval int  seconds between progress logs, 0 to not log
+    callback callable Optional callback(event) for every event
+    """
+
+    def __init__(self, tool, ranks=1, interval=REPORT_INTERVAL, callback=None):
+        self.tool = tool
+        self.ranks = ranks
+        self.interval = interval
+        self.callback = callback
+        self.start = time.time()
+        self._logged = self.start
+        self.last = None  # last progress or done event
+        self.totals = {}  # summary lines key: items or bytes
+        self.buckets = []  # (low, high, count) of --distribution
+
+    def event(self, event):
+        event["tool"] = self.tool
+        if event["event"] in ("progress", "done"):
+            self.last = event
+        elif event["event"] == "total":
+            self.totals[event["key"]] = event.get("items", event.get("bytes"))
+        elif event["event"] == "bucket":
+            self.buckets.append((event["low"], event["high"], event["count"]))
+        if self.callback:
+            self.callback(event)
+        if (
+            event["event"] == "progress"
+            and self.interval
+            and time.time() - self._logged >= self.interval
+        ):
+            self._logged = time.time()
+            logging.info(describe(self.summary(), running=True))
+
+    def summary(self):
+        """Dict of what the run did, rates are over the tools own timing if it gave one."""
+        last = self.last or {}
+        seconds = last.get("seconds") or time.time() - self.start
+        items = last.get("items", self.totals.get("Items"))
+        data = last.get("bytes", self.totals.get("Data"))
+        summary = {
+            "tool": self.tool,
+            "ranks": self.ranks,
+            "seconds": round(seconds, 3),
+            "wall_seconds": round(time.time() - self.start, 3),
+            "items": items,
+            "bytes": data,
+            "items_per_sec": last.get("items_per_sec"),
+            "bytes_per_sec": last.get("bytes_per_sec"),
+            "percent": last.get("percent"),
+            "remaining": last.get("remaining"),
+            "totals": dict(self.totals),
+            "distribution": list(self.buckets),
+        }
+        if summary["items_per_sec"] is None and items and seconds:
+            summary["items_per_sec"] = items / seconds
+        if summary["bytes_per_sec"] is None and data and seconds:
+            summary["bytes_per_sec"] = data / seconds
+        if summary["items_per_sec"] is not None:
+            # a rate per rank that falls as ranks are added is metadata bound
+            summary["items_per_sec_per_rank"] = summary["items_per_sec"] / max(
+                self.ranks, 1
+            )
+        return summary
+
+
+def describe(summary, running=False):
+    """One line of a ProgressReporter.summary() for logs."""
+    parts = [f"{summary['tool']} {'running' if running else 'finished'}"]
+    if summary["items"] is not None:
+        parts.append(f"{summary['items']} items")
+    if summary["bytes"] is not None:
+        parts.append(f"{summary['bytes'] / (1 << 30):.3f} GiB")
+    parts.append(f"in {summary['seconds']:.1f}s")
+    if summary["items_per_sec"] is not None:
+        parts.append(
+            f"{summary['items_per_sec']:.1f} items/s ({summary['items_per_sec_per_rank']:.1f} per rank of {summary['ranks']})"
+        )
+    if summary["bytes_per_sec"] is not None:
+        parts.append(f"{summary['bytes_per_sec'] / (1 << 20):.1f} MiB/s")
+    if running and summary["remaining"] is not None:
+        parts.append(f"{summary['remaining']:.0f}s left")
+    elif running and summary["percent"] is not None:
+        parts.append(f"{summary['percent']:.0f}%")
+    return " ".join(parts)
+
+
+class Launcher:
+    """How MPI ranks are started, args() is put before the executable."""
+
+    def ranks(self):
+        """Number of ranks to start when not given."""
+        return RANKS_PER_NODE
+
+    def args(self, np=None):
+        raise NotImplementedError
+
+
+class LocalLauncher(Launcher):
+    """Run the executable directly as a single rank, no MPI launcher."""
+
+    def ranks(self):
+        return 1
+
+    def args(self, np=None):
+        return []
+
+
+class MpirunLauncher(Launcher):
+    """
+    mpirun on the local node or the nodes in a hostfile.
+
+    mpirun  str  path to mpirun
+    hostfile str Optional hostfile, ranks default to its slots
+    """
+
+    def __init__(self, mpirun=False, hostfile=None):
+        if not mpirun:
+            raise mpirunError("mpirun required")
+        self.mpirun = mpirun
+        self.hostfile = hostfile
+
+    def ranks(self):
+        if not self.hostfile:
+            return RANKS_PER_NODE
+        # lines of: host [slots=N]
+        ranks = 0
+        with open(self.hostfile) as hosts:
+            for line in hosts:
+                fields = line.split("#")[0].split()
+                if not fields:
+                    continue
+                slots = [f for f in fields[1:] if f.startswith("slots=")]
+                ranks += int(slots[0].split("=")[1]) if slots else RANKS_PER_NODE
+        return ranks or RANKS_PER_NODE
+
+    def args(self, np=None):
+        args = [self.mpirun, "--oversubscribe"]
+        if self.hostfile:
+            args += ["--hostfile", str(self.hostfile)]
+        return args + ["-np", f"{np or self.ranks()}"]
+
+
+class SrunLauncher(Launcher):
+    """
+    srun inside a Slurm allocation.
+
+    Ranks default to the tasks of the allocation or RANKS_PER_NODE on each node,
+    no more than the CPUs allocated there, and never exceed the allocation's tasks.
+    """
+
+    def __init__(self, srun="srun"):
+        self.srun = srun
+
+    def ranks(self):
+        if "SLURM_NTASKS" in os.environ:
+            return int(os.environ["SLURM_NTASKS"])
+        nodes = int(os.environ.get("SLURM_JOB_NUM_NODES", 1))
+        per_node = int(os.environ.get("SLURM_CPUS_ON_NODE", RANKS_PER_NODE))
+        return nodes * min(per_node, RANKS_PER_NODE)
+
+    def args(self, np=None):
+        ntasks = np or self.ranks()
+        if "SLURM_NTASKS" in os.environ:
+            limit = int(os.environ["SLURM_NTASKS"])
+            if ntasks > limit:
+                logging.warning(
+                    f"{ntasks} ranks is more than the {limit} tasks of the allocation using {limit}"
+                )
+                ntasks = limit
+        return [self.srun, f"--ntasks={ntasks}"]
+
+
+def make_launcher(kind="mpirun", mpirun=False, hostfile=None):
+    """
+    Launcher by name.
+
+    kind  str  mpirun, srun, local or auto: srun inside a Slurm job, else
+               mpirun if given, else local
+    """
+    if kind == "auto":
+        if "SLURM_JOB_ID" in os.environ and shutil.which("srun"):
+            kind = "srun"
+        elif mpirun:
+            kind = "mpirun"
+        else:
+            kind = "local"
+    if kind == "mpirun":
+        return MpirunLauncher(mpirun=mpirun, hostfile=hostfile)
+    elif kind == "srun":
+        return SrunLauncher()
+    elif kind == "local":
+        return LocalLauncher()
+    else:
+        raise mpiFileUtilsError(f"Unknown launcher {kind}")
+
 
 class mpiFileUtils:
     """wrapper class for github.io/hpc/mpifileutils"""
 
     def __init__(
         self,
-        np=int(12),  # MPI ranks to start
+        np=None,  # MPI ranks to start, default sized by the launcher
         inst=False,  # path to mpiFileUtils install
         mpirun=False,
         umask=False,
         verbose=False,
+        launcher="mpirun",  # name for make_launcher() or a Launcher
+        hostfile=None,  # with mpirun
+        runs=None,  # list each run's ProgressReporter.summary() is appended to
+        callback=None,  # callback(event) for each parse_progress() event
     ):
 
         self.kwargs = {}
 
-        if not mpirun:
-            raise mpirunError("mpirun required")
-        else:
-            self.args = [mpirun]
+        if not isinstance(launcher, Launcher):
+            launcher = make_launcher(launcher, mpirun=mpirun, hostfile=hostfile)
+        self.launcher = launcher
+        self.args = launcher.args(np)
+        self.ranks = np or launcher.ranks()
+        self._exe = len(self.args)  # subclasses append the executable here
+        self.runs = runs
+        self.callback = callback
+        self.summary = None
 
         if umask:
             # set umask for call to subprocess
             self.kwargs["preexec_fn"] = lambda: os.umask(umask)
 
-        self.args.append("--oversubscribe")
-        self.args += ["-np", f"{np}"]
-
         self.inst = inst
         self.verbose = verbose  # save verbose for apply
 
     def apply(self):
-        """execute wrapped application"""
+        """
+        execute wrapped application
+
+        Its output is still printed and also parsed by a reader thread into
+        events for a ProgressReporter, self.summary is the reporter's summary.
+        """
         if self.verbose:
             self.args.append("--verbose")
         logging.debug(f"BLANK invoked as {self.args}")
+        tool = (
+            os.path.basename(self.args[self._exe])
+            if len(self.args) > self._exe
+            else "mpiFileUtils"
+        )
+        reporter = ProgressReporter(tool, ranks=self.ranks, callback=self.callback)
+        read_fd, write_fd = os.pipe()
+        reader = threading.Thread(
+            target=_read_output, args=(read_fd, reporter), name=f"{tool}-output"
+        )
+        reader.start()
         try:
-            subprocess.run(self.args, check=True, **self.kwargs)  # nosec
+            subprocess.run(
+                self.args, check=True, stdout=write_fd, **self.kwargs
+            )  # nosec
         except Exception as e:
             logging.exception(f"Problem running: {self.args} and {e}")
             raise mpiFileUtilsError(f"Problems {e}")
+        finally:
+            os.close(write_fd)  # reader sees the end once the tool exits
+            reader.join()
+            self.summary = reporter.summary()
+            if self.runs is not None:
+                self.runs.append(self.summary)
+        logging.debug(describe(self.summary))
+
+
+def _read_output(fd, reporter):
+    """Echo lines from fd and hand their events to reporter until the end."""
+    with open(fd, "r", errors="replace") as output:
+        for line in output:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+            try:
+                event = parse_progress(line)
+                if event:
+                    reporter.event(event)
+            except Exception as e:
+                # keep reading, a stalled pipe would block the tool
+                logging.debug(f"Could not parse {line!r}: {e}")
 
 
 class DRm(mpiFileUtils):
@@ -85,6 +435,112 @@ class DRm(mpiFileUtils):
         self.apply()
 
 
+def _members_end(path):
+    """Offset just past the last member of tar path, where its end blocks start."""
+    with tarfile.open(path, "r:") as tar:
+        for _ in tar:
+            pass
+        return tar.offset
+
+
+def _append(out, path, length=None):
+    """Copy the first length bytes (all if None) of path onto the end of file out."""
+    with open(path, "rb") as src:
+        left = length if length is not None else os.fstat(src.fileno()).st_size
+        while left > 0:
+            copied = os.sendfile(out.fileno(), src.fileno(), None, left)
+            if copied == 0:
+                break
+            left -= copied
+
+
+class DTar(mpiFileUtils):
+    """
+    Wrapper for dtar, many ranks read files into one uncompressed tar.
+
+    progress int  seconds to print progress
+    exe      str  alternative executable name
+    """
+
+    def __init__(self, progress=False, exe="dtar", *kargs, **kwargs):
+        super().__init__(*kargs, **kwargs)
+
+        # add exeutable  before options
+        # BaseClass ( mpirun -np ... ) SubClass (exe { exe options } )
+        self.args.append(f"{self.inst}/bin/{exe}")
+
+        if progress:
+            self.args += ["--progress", str(progress)]
+
+    def _arg_room(self):
+        """Bytes left in ARG_MAX for paths after the command and environment."""
+        # each argument is a pointer and a nul terminated string as is the environment
+        used = sum(len(os.fsencode(a)) + 1 + 8 for a in self.args) + 256
+        used += sum(len(k) + len(v) + 2 + 8 for k, v in os.environ.items())
+        return os.sysconf("SC_ARG_MAX") - used
+
+    def _chunks(self, paths):
+        """Split paths into lists that each fit on one dtar command line."""
+        room = self._arg_room()
+        chunk, size = [], 0
+        for path in paths:
+            length = len(os.fsencode(path)) + 1 + 8
+            if chunk and size + length > room:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(path)
+            size += length
+        if chunk:
+            yield chunk
+
+    def create(self, filename=False, paths=()):
+        """
+        Create tar filename of paths.
+
+        dtar only takes paths as arguments, lists longer than ARG_MAX are made as
+        several tars that are joined into filename, each without its end of
+        archive blocks.  dtar refuses an empty list, an empty tar is written like
+        GNU tar would.
+
+        filename str/pathlib
+        paths    list of str/bytes
+        """
+        if not filename:
+            logging.error("filename required")
+            raise mpiFileUtilsError("filename required")
+        self.filename = filename
+        base = self.args
+
+        chunks = list(self._chunks([os.fsdecode(p) for p in paths]))
+        if not chunks:
+            tarfile.open(filename, "w").close()
+            return
+
+        parts = [filename] if len(chunks) == 1 else []
+        try:
+            for n, chunk in enumerate(chunks):
+                if len(chunks) > 1:
+                    parts.append(f"{filename}.part{n}")
+                self.args = base + ["--create", "--file", str(parts[-1])] + chunk
+                self.apply()
+        finally:
+            self.args = base
+
+        if len(chunks) > 1:
+            logging.debug(f"Joining {len(parts)} dtar parts into {filename}")
+            with open(filename, "wb") as out:
+                for n, part in enumerate(parts):
+                    last = n == len(parts) - 1
+                    _append(out, part, None if last else _members_end(part))
+                    os.unlink(part)
+
+    def createfromfile(self, filename=False, path=False):
+        """Create tar filename from a file listing one path per line."""
+        with open(path, "rb") as f:
+            paths = [line.rstrip(b"\n") for line in f if line.strip()]
+        self.create(filename=filename, paths=paths)
+
+
 class DWalk(mpiFileUtils):
     """wrapper for dwalk"""
 
@@ -1,4 +1,4 @@
-class mpiFileUtilsError(BaseException):
+class mpiFileUtilsError(Exception):
     """Base Exception Class for Module"""
 
     def __init__(self, *kargs, **kwargs):
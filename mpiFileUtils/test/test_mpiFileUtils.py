@@ -1,9 +1,25 @@
+import os
+import pathlib
+import shutil
 import subprocess
+import tarfile
 from contextlib import ExitStack as does_not_raise
 
 import pytest
 
-from mpiFileUtils import DWalk, mpiFileUtils, mpirunError
+from mpiFileUtils import (
+    DTar,
+    DWalk,
+    LocalLauncher,
+    MpirunLauncher,
+    SrunLauncher,
+    describe,
+    make_launcher,
+    mpiFileUtils,
+    mpiFileUtilsError,
+    mpirunError,
+    parse_progress,
+)
 
 
 @pytest.mark.parametrize(
@@ -39,3 +55,219 @@ def test_DWalk(kwargs, expex, monkeypatch, mock_subprocess):
         assert "--oversubscribe" in mock_subprocess.call_args[0][0]
         assert "-np" in mock_subprocess.call_args[0][0]
         assert str(12) in mock_subprocess.call_args[0][0]
+
+
+def test_MpirunLauncher_hostfile(tmp_path):
+    """Ranks default to the slots in the hostfile."""
+    hostfile = tmp_path / "hosts"
+    hostfile.write_text("# nodes\nnode1 slots=36\nnode2 slots=36\n\n")
+    launcher = MpirunLauncher(mpirun="/my/mpirun", hostfile=hostfile)
+    assert launcher.args() == [
+        "/my/mpirun",
+        "--oversubscribe",
+        "--hostfile",
+        str(hostfile),
+        "-np",
+        "72",
+    ]
+    assert launcher.args(np=8)[-1] == "8"
+
+
+@pytest.mark.parametrize(
+    "slurm,ranks",
+    [
+        ({"SLURM_NTASKS": "64", "SLURM_JOB_NUM_NODES": "2"}, 64),
+        ({"SLURM_JOB_NUM_NODES": "4"}, 48),
+        ({"SLURM_JOB_NUM_NODES": "2", "SLURM_CPUS_ON_NODE": "4"}, 8),
+        ({}, 12),
+    ],
+)
+def test_SrunLauncher(monkeypatch, slurm, ranks):
+    for key in ["SLURM_NTASKS", "SLURM_JOB_NUM_NODES", "SLURM_CPUS_ON_NODE"]:
+        monkeypatch.delenv(key, raising=False)
+    for key, value in slurm.items():
+        monkeypatch.setenv(key, value)
+    assert SrunLauncher().args() == ["srun", f"--ntasks={ranks}"]
+
+
+def test_SrunLauncher_np(monkeypatch):
+    """Asking for more ranks than the allocation has tasks gets the allocation."""
+    monkeypatch.setenv("SLURM_NTASKS", "16")
+    assert SrunLauncher().args(np=8) == ["srun", "--ntasks=8"]
+    assert SrunLauncher().args(np=64) == ["srun", "--ntasks=16"]
+
+
+@pytest.mark.parametrize(
+    "kind,mpirun,slurm,expected",
+    [
+        ("auto", "/my/mpirun", True, SrunLauncher),
+        ("auto", "/my/mpirun", False, MpirunLauncher),
+        ("auto", False, False, LocalLauncher),
+        ("local", False, False, LocalLauncher),
+    ],
+)
+def test_make_launcher(monkeypatch, kind, mpirun, slurm, expected):
+    monkeypatch.setattr(shutil, "which", lambda cmd: f"/usr/bin/{cmd}")
+    if slurm:
+        monkeypatch.setenv("SLURM_JOB_ID", "1234")
+    else:
+        monkeypatch.delenv("SLURM_JOB_ID", raising=False)
+    assert isinstance(make_launcher(kind, mpirun=mpirun), expected)
+
+
+def test_DWalk_local(monkeypatch, mock_subprocess):
+    """A local launch runs the executable directly."""
+    monkeypatch.setattr(subprocess, "run", mock_subprocess)
+    dwalk = DWalk(inst="/my/install", launcher="local")
+    dwalk.scanpath(path="/tmp", textout="/tmp/output.txt")
+    assert mock_subprocess.call_args[0][0][0] == "/my/install/bin/dwalk"
+
+
+def test_DTar(tmp_path, monkeypatch, mock_subprocess):
+    monkeypatch.setattr(subprocess, "run", mock_subprocess)
+    file_list = tmp_path / "list.txt"
+    file_list.write_bytes(b"dir/a\ndir/b\n")
+    dtar = DTar(inst="/my/install", launcher="local")
+    dtar.createfromfile(filename="box-1.tar", path=file_list)
+    assert mock_subprocess.call_args[0][0] == [
+        "/my/install/bin/dtar",
+        "--create",
+        "--file",
+        "box-1.tar",
+        "dir/a",
+        "dir/b",
+    ]
+    assert dtar.filename == "box-1.tar"
+
+
+def fake_dtar(args, check=True, **kwargs):
+    """dtar --create --file F paths... made with tarfile."""
+    i = args.index("--file")
+    with tarfile.open(args[i + 1], "w") as tar:
+        for path in args[i + 2 :]:
+            tar.add(path)
+
+
+def test_DTar_arg_max(tmp_path, monkeypatch):
+    """Lists longer than ARG_MAX are made in parts and joined into one tar."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(subprocess, "run", fake_dtar)
+    monkeypatch.setattr(DTar, "_arg_room", lambda self: 200)
+    paths = []
+    for n in range(30):
+        pathlib.Path(f"file{n}").write_text("x" * n)
+        paths.append(f"file{n}")
+    dtar = DTar(inst="/my/install", launcher="local")
+    dtar.create(filename="box-1.tar", paths=paths)
+
+    with tarfile.open("box-1.tar") as tar:
+        assert tar.getnames() == paths
+        assert tar.extractfile("file29").read() == b"x" * 29
+    assert sorted(os.listdir(".")) == sorted(paths + ["box-1.tar"])  # parts removed
+
+
+def test_DTar_empty(tmp_path, mock_subprocess, monkeypatch):
+    """dtar refuses an empty list, an empty tar is written instead."""
+    monkeypatch.setattr(subprocess, "run", mock_subprocess)
+    dtar = DTar(inst="/my/install", launcher="local")
+    dtar.create(filename=tmp_path / "box-1.tar", paths=[])
+    mock_subprocess.assert_not_called()
+    with tarfile.open(tmp_path / "box-1.tar") as tar:
+        assert tar.getnames() == []
+
+
+@pytest.mark.parametrize(
+    "line,event",
+    [
+        (
+            "[2024-03-01T10:00:00] Walked 1200 items in 10.002 secs (119.976 items/sec) ...",
+            {
+                "event": "progress",
+                "items": 1200,
+                "seconds": 10.002,
+                "items_per_sec": 119.976,
+            },
+        ),
+        (
+            "[2024-03-01T10:00:05] Walked 5000 items in 15.000 seconds (333.333 items/sec)",
+            {
+                "event": "done",
+                "items": 5000,
+                "seconds": 15.0,
+                "items_per_sec": 333.333,
+            },
+        ),
+        (
+            "Removed 250 items (25.00%) in 5.000 secs (50.000 items/sec) 15 secs remaining ...",
+            {
+                "event": "progress",
+                "items": 250,
+                "percent": 25.0,
+                "seconds": 5.0,
+                "items_per_sec": 50.0,
+                "remaining": 15.0,
+            },
+        ),
+        (
+            "Tarred 2.000 GiB (50%) in 10.000 secs (204.800 MiB/sec) 10 secs left ...",
+            {
+                "event": "progress",
+                "bytes": 2 << 30,
+                "percent": 50.0,
+                "seconds": 10.0,
+                "bytes_per_sec": int(204.8 * (1 << 20)),
+                "remaining": 10.0,
+            },
+        ),
+        (
+            "[2024-03-01T10:00:05]   Files: 4900",
+            {"event": "total", "key": "Files", "items": 4900},
+        ),
+        (
+            "Data: 1.500 GiB (321.000 KiB per file)",
+            {"event": "total", "key": "Data", "bytes": int(1.5 * (1 << 30))},
+        ),
+        ("[ 0 - 80 )   12", {"event": "bucket", "low": "0", "high": "80", "count": 12}),
+        ("Walking /scratch/project", None),
+    ],
+)
+def test_parse_progress(line, event):
+    assert parse_progress(line) == event
+
+
+def test_apply_progress(capfd):
+    """Output is still printed and summarised from the events it holds."""
+    runs, events = [], []
+    tool = mpiFileUtils(launcher="local", runs=runs, callback=events.append)
+    tool.args += [
+        "sh",
+        "-c",
+        "echo 'Walked 100 items in 1.000 secs (100.000 items/sec) ...';"
+        "echo 'Walked 400 items in 2.000 seconds (200.000 items/sec)';"
+        "echo 'Data: 1.000 MiB (2.560 KiB per file)'",
+    ]
+    tool.apply()
+
+    assert "Walked 400 items" in capfd.readouterr().out
+    assert [e["event"] for e in events] == ["progress", "done", "total"]
+    assert runs == [tool.summary]
+    assert tool.summary["tool"] == "sh"
+    assert tool.summary["items"] == 400
+    assert tool.summary["items_per_sec"] == 200.0
+    assert tool.summary["items_per_sec_per_rank"] == 200.0
+    assert tool.summary["bytes"] == 1 << 20
+    assert "400 items" in describe(tool.summary)
+
+
+def test_apply_progress_fails():
+    """A failing tool still reports what it did."""
+    runs = []
+    tool = mpiFileUtils(launcher="local", runs=runs)
+    tool.args += [
+        "sh",
+        "-c",
+        "echo 'Walked 10 items in 1.000 secs (10.000 items/sec) ...'; exit 3",
+    ]
+    with pytest.raises(mpiFileUtilsError):
+        tool.apply()
+    assert runs[0]["items"] == 10
@@ -54,6 +54,7 @@ def test_DwalkParser_tarlist(parser, tmp_path, kwargs, result, expex):
         print(f"tarlist -> {tarlist}")
 
     assert result == count_files_dir(tmp_path)
+    assert len(parser.sizes) == result / 2  # expected size of each tar
     assert 69 * 2 == count_lines_dir(
         tmp_path
     )  # sample data has 69 lines * 2 (index + tar)
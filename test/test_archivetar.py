@@ -1,14 +1,22 @@
+import json
+import multiprocessing
 import os
 import pathlib
+import queue
+import tarfile
 from contextlib import ExitStack as does_not_raise
 from unittest.mock import MagicMock
 
 import pytest
 
 import archivetar
-from archivetar import build_list, validate_prefix
-from archivetar.archive_args import file_check, stat_check, unix_check
-from archivetar.exceptions import ArchivePrefixConflict
+import archivetar.space
+from archivetar import build_list, cleanup, transfer_from_args, validate_prefix
+from archivetar.archive_args import file_check, parse_args, stat_check, unix_check
+from archivetar.exceptions import ArchivePrefixConflict, ArchiveTarArchiveError
+from archivetar.space import SpaceScheduler, preflight, wait_for_space
+from GlobusTransfer import LocalTransfer
+from GlobusTransfer.exceptions import GlobusError
 from mpiFileUtils import DWalk
 
 
@@ -131,3 +139,476 @@ def test_validate_prefix(tmp_path, prefix, tarname, exexception):
 
     with exexception:
         validate_prefix(prefix)
+
+
+def test_transfer_from_args_local(tmp_path, monkeypatch):
+    """AT_TRANSFER_BACKEND=local selects the local stand-in."""
+    monkeypatch.setenv("AT_TRANSFER_BACKEND", "local")
+    monkeypatch.setenv("AT_LOCAL_TRANSFER_BANDWIDTH", "1M")
+    args = parse_args(["--prefix", "myprefix", "--destination-dir", str(tmp_path)])
+    transfer = transfer_from_args(args)
+    assert isinstance(transfer, LocalTransfer)
+    assert transfer.bandwidth == 1e6
+
+
+def test_cleanup(tmp_path, monkeypatch):
+    """cleanup() removes files once their transfer lands and keeps failed ones."""
+    monkeypatch.setenv("AT_TRANSFER_BACKEND", "local")
+    os.chdir(tmp_path)
+    args = parse_args(
+        ["--prefix", "myprefix", "--destination-dir", str(tmp_path / "dest")]
+    )
+    local = transfer_from_args(args)
+
+    good = tmp_path / "myprefix-1.tar"
+    good.write_text("tar data")
+    local.add_item(good, in_root=True)
+    good_task = local.submit_pending_transfer()
+
+    bad = tmp_path / "myprefix-2.tar"
+    bad.write_text("tar data")
+    local.add_item(tmp_path / "missing.tar", in_root=True)
+    bad_task = local.submit_pending_transfer()
+
+    cleanup_q = queue.Queue()
+    cleanup_q.put((good_task, [good], None))
+    cleanup_q.put((bad_task, [bad], None))
+    cleanup_q.put(None)
+    pending = multiprocessing.Value("q", 16)
+
+    with pytest.raises(SystemExit) as e:
+        cleanup(cleanup_q, pending, args)
+
+    assert e.value.code == 1
+    assert not good.exists()
+    assert bad.exists()
+    assert pending.value == 0  # failed transfer won't be cleaned, stop waiting on it
+
+
+@pytest.mark.parametrize("error", [ConnectionError, GlobusError])
+def test_cleanup_errors(tmp_path, monkeypatch, error):
+    """Errors polling or deleting fail that transfer but still release pending."""
+    monkeypatch.setenv("AT_TRANSFER_BACKEND", "local")
+    monkeypatch.setattr(archivetar, "CLEANUP_POLL_ERRORS", 2)
+    os.chdir(tmp_path)
+    args = parse_args(
+        ["--prefix", "myprefix", "--destination-dir", str(tmp_path / "dest")]
+    )
+
+    def task_finished(self, taskid):
+        if taskid == "flaky":
+            raise error("api down")
+        return True
+
+    monkeypatch.setattr(archivetar.LocalTransfer, "task_finished", task_finished)
+    monkeypatch.setattr(archivetar.LocalTransfer, "polling_interval", 0, raising=False)
+    flaky = tmp_path / "myprefix-1.tar"
+    flaky.write_text("tar data")
+    purged = tmp_path / "myprefix-2.tar"
+    purged.write_text("tar data")
+
+    cleanup_q = queue.Queue()
+    cleanup_q.put(("flaky", [flaky], None))
+    cleanup_q.put(("gone", [purged], tmp_path / "missing.DONT_DELETE.txt"))
+    cleanup_q.put(None)
+    pending = multiprocessing.Value("q", 16)
+
+    with pytest.raises(SystemExit) as e:
+        cleanup(cleanup_q, pending, args)
+
+    assert e.value.code == 1
+    assert flaky.exists()
+    assert pending.value == 0
+
+
+def test_wait_for_space(monkeypatch):
+    """wait_for_space() pauses only while something is pending cleanup."""
+    usage = iter([95, 95, 50])
+    monkeypatch.setattr(archivetar.space, "bundle_usage", lambda path: next(usage))
+    pending = multiprocessing.Value("q", 10)
+    wait_for_space(".", 90, pending, interval=0)
+    assert next(usage, None) is None  # polled until below high water
+
+    monkeypatch.setattr(archivetar.space, "bundle_usage", lambda path: 99)
+    pending.value = 0
+    wait_for_space(".", 90, pending, interval=0)  # nothing to wait on returns
+
+
+@pytest.mark.parametrize(
+    "sizes,cleanup,compress,expex",
+    [
+        ({1: 10, 2: 10}, False, False, does_not_raise()),
+        ({1: 60, 2: 60}, False, False, pytest.raises(ArchiveTarArchiveError)),
+        ({1: 60, 2: 60}, False, True, does_not_raise()),  # compression may fit
+        ({1: 60, 2: 60}, True, False, does_not_raise()),  # one at a time fits
+    ],
+)
+def test_preflight(tmp_path, sizes, cleanup, compress, expex):
+    """preflight() fails early only when the tars can never fit."""
+    with expex:
+        needed, free = preflight(
+            sizes, path=tmp_path, slots=1, limit=100, cleanup=cleanup, compress=compress
+        )
+        assert free == 100
+
+
+def test_preflight_in_place(tmp_path):
+    """Removing files as they are tarred in place needs only the running tars."""
+    sizes = {1: 60, 2: 60}
+    needed, _ = preflight(sizes, path=tmp_path, slots=1, limit=100, in_place=True)
+    assert needed == 60
+
+
+def test_SpaceScheduler(tmp_path):
+    """Tars wait while something running or pending cleanup will free space."""
+    pending = multiprocessing.Value("q", 0)
+    scheduler = SpaceScheduler(path=tmp_path, limit=100, pending=pending)
+
+    assert scheduler.admit(60)
+    scheduler.start(1, 60)
+    assert not scheduler.admit(60)  # 40 left while 1 is running
+
+    scheduler.finish(1, 60)
+    pending.value = 60  # handed to cleanup
+    assert not scheduler.admit(60)
+
+    pending.value = 0  # cleanup removed it
+    assert scheduler.admit(60)
+
+    # nothing will free space start anyway rather than wait forever
+    assert scheduler.admit(200)
+
+
+@pytest.fixture
+def small_tree(tmp_path, monkeypatch):
+    """Six files, a dwalk style listing of them and filter_list() skipped."""
+    src = tmp_path / "src"
+    src.mkdir()
+    listing = tmp_path / "listing.txt"
+    with listing.open("w") as out:
+        for n in range(6):
+            f = src / f"file{n}"
+            f.write_text("x" * 100)
+            out.write(f"-rw-r--r-- user group 100.000  B Jan  1 2020 00:00 {f}\n")
+    over = tmp_path / "over.txt"
+    over.touch()
+    monkeypatch.setattr(
+        archivetar, "filter_list", lambda **kwargs: (listing, None, over)
+    )
+    os.chdir(src)
+    return src, listing
+
+
+def test_main_resume(small_tree, monkeypatch):
+    """An interrupted run resumes at the tar that did not finish."""
+    src, listing = small_tree
+    argv = [
+        "archivetar",
+        "--prefix",
+        "box",
+        "--list",
+        str(listing),
+        "--tar-size",
+        "200",
+        "--tar-processes",
+        "1",
+        "--no-checksum",
+    ]
+    real_archive = archivetar.SuperTar.archive
+
+    def crash_on_2(self):
+        if str(self.filename).startswith("box-2"):
+            raise OSError("walltime")
+        real_archive(self)
+
+    monkeypatch.setattr(archivetar.SuperTar, "archive", crash_on_2)
+    with pytest.raises(archivetar.TarError):
+        archivetar.main(argv)
+    assert pathlib.Path("box.archivetar.journal").exists()
+    assert not pathlib.Path("box-2.tar").exists()
+
+    # prefix is in use without --resume
+    with pytest.raises(ArchivePrefixConflict):
+        archivetar.main(argv)
+
+    monkeypatch.setattr(archivetar.SuperTar, "archive", real_archive)
+    pathlib.Path("box-1.tar").unlink()  # show finished tars are not made again
+    archivetar.main(argv + ["--resume"])
+
+    assert not pathlib.Path("box-1.tar").exists()
+    assert pathlib.Path("box-2.tar").exists()
+    assert pathlib.Path("box-3.tar").exists()
+    assert not pathlib.Path("box.archivetar.journal").exists()
+
+
+def test_load_run_replanned(tmp_path):
+    """Tars planned again after an interrupt while planning are not doubled."""
+    journal = archivetar.Journal(tmp_path / "box.archivetar.journal")
+    journal.record("scan", cache="box.cache")
+    for index in [1, 2, 1, 2, 3]:  # interrupted after 2 then planned again
+        journal.record(
+            "tar",
+            index=index,
+            t_args={"filename": f"box-{index}.tar"},
+            tar_list=f"box-{index}.txt",
+            index_p=f"box-{index}.index.txt",
+            size=100 * index,
+        )
+    journal.record("planned")
+
+    state = archivetar.load_run(journal)
+    assert [item[0] for item in state["work"]] == [1, 2, 3]
+    assert state["sizes"] == {1: 100, 2: 200, 3: 300}
+    assert state["planned"]
+
+
+def test_main_resume_nothing(small_tree):
+    src, listing = small_tree
+    with pytest.raises(ArchiveTarArchiveError, match="Nothing to resume"):
+        archivetar.main(["archivetar", "--prefix", "box", "--resume"])
+
+
+def test_main_stream_purge_tar(small_tree):
+    """--stream-purge tar deletes each tar's files once it is made."""
+    src, listing = small_tree
+    archivetar.main(
+        [
+            "archivetar",
+            "--prefix",
+            "box",
+            "--list",
+            str(listing),
+            "--tar-size",
+            "200",
+            "--tar-processes",
+            "2",
+            "--no-checksum",
+            "--stream-purge",
+            "tar",
+        ]
+    )
+    assert not list(src.glob("file*"))
+    assert list(src.glob("box-*.tar"))
+
+
+def test_main_stream_purge_upload(small_tree, tmp_path, monkeypatch):
+    """--stream-purge upload deletes each tar's files after its upload."""
+    monkeypatch.setenv("AT_TRANSFER_BACKEND", "local")
+    src, listing = small_tree
+    dest = tmp_path / "dest"
+    archivetar.main(
+        [
+            "archivetar",
+            "--prefix",
+            "box",
+            "--list",
+            str(listing),
+            "--tar-size",
+            "200",
+            "--tar-processes",
+            "2",
+            "--no-checksum",
+            "--destination-dir",
+            str(dest),
+            "--stream-purge",
+            "upload",
+        ]
+    )
+    assert not list(src.glob("file*"))
+    assert (dest / "box-3.tar").exists()
+    assert (src / "box-3.tar").exists()  # only --rm-at-files removes the tars
+
+
+def test_main_stream_purge_upload_limit(small_tree, tmp_path, monkeypatch):
+    """Tars kept after upload still count against --bundle-limit."""
+    monkeypatch.setenv("AT_TRANSFER_BACKEND", "local")
+    src, listing = small_tree
+    schedulers = []
+
+    class Recording(SpaceScheduler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            schedulers.append(self)
+
+    monkeypatch.setattr(archivetar, "SpaceScheduler", Recording)
+    archivetar.main(
+        [
+            "archivetar",
+            "--prefix",
+            "box",
+            "--list",
+            str(listing),
+            "--tar-size",
+            "200",
+            "--tar-processes",
+            "2",
+            "--no-checksum",
+            "--destination-dir",
+            str(tmp_path / "dest"),
+            "--stream-purge",
+            "upload",
+            "--bundle-limit",
+            "10KiB",
+        ]
+    )
+    (scheduler,) = schedulers
+    assert scheduler.pending is None
+    assert scheduler.held == sum(f.stat().st_size for f in src.glob("box-*.tar"))
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        ["--stream-purge", "tar", "--remove-files"],
+        ["--stream-purge", "tar", "--ignore-failed-read"],
+        ["--stream-purge", "upload"],
+    ],
+)
+def test_stream_purge_args(extra):
+    with pytest.raises(SystemExit):
+        parse_args(["--prefix", "box"] + extra)
+
+
+def test_main_tar_engine_dtar(small_tree, tmp_path, monkeypatch):
+    """--tar-engine dtar makes the same tars and lists through mpiFileUtils."""
+    inst = tmp_path / "mpifileutils"
+    (inst / "bin").mkdir(parents=True)
+    dtar = inst / "bin" / "dtar"
+    # stand-in: dtar --progress N --create --file F paths...
+    dtar.write_text('#!/bin/sh\nshift 3\nf=$2\nshift 2\nexec tar -cf "$f" "$@"\n')
+    dtar.chmod(0o755)
+    monkeypatch.setenv("AT_MPIFILEUTILS", str(inst))
+    monkeypatch.setenv("AT_LAUNCHER", "local")
+    src, listing = small_tree
+    archivetar.main(
+        [
+            "archivetar",
+            "--prefix",
+            "box",
+            "--list",
+            str(listing),
+            "--tar-size",
+            "200",
+            "--tar-processes",
+            "1",
+            "--tar-engine",
+            "dtar",
+        ]
+    )
+    tars = sorted(src.glob("box-*.tar"))
+    assert tars
+    members = set()
+    for tar in tars:
+        with tarfile.open(tar) as t:
+            members.update(t.getnames())
+        assert pathlib.Path(str(tar)[: -len(".tar")] + ".DONT_DELETE.sha1").exists()
+    assert members == {f"file{n}" for n in range(6)}
+
+
+@pytest.mark.parametrize("extra", [["--gzip"], ["--remove-files"], ["--dereference"]])
+def test_tar_engine_dtar_args(extra):
+    with pytest.raises(SystemExit):
+        parse_args(["--prefix", "box", "--tar-engine", "dtar"] + extra)
+
+
+def test_main_tar_engine_dtar_fails(small_tree, tmp_path, monkeypatch):
+    """A failed dtar is reported not waited on forever."""
+    inst = tmp_path / "mpifileutils"
+    (inst / "bin").mkdir(parents=True)
+    dtar = inst / "bin" / "dtar"
+    dtar.write_text("#!/bin/sh\nexit 1\n")
+    dtar.chmod(0o755)
+    monkeypatch.setenv("AT_MPIFILEUTILS", str(inst))
+    monkeypatch.setenv("AT_LAUNCHER", "local")
+    src, listing = small_tree
+    with pytest.raises(archivetar.TarError):
+        archivetar.main(
+            [
+                "archivetar",
+                "--prefix",
+                "box",
+                "--list",
+                str(listing),
+                "--tar-processes",
+                "1",
+                "--tar-engine",
+                "dtar",
+            ]
+        )
+    report = json.loads((src / "box.archivetar.report.json").read_text())
+    assert report["status"] == "failed"
+    assert report["totals"]["failed"] == 1
+
+
+def test_main_report(small_tree, tmp_path, monkeypatch):
+    """Each phase and stage of every tar is in the run report."""
+    monkeypatch.setenv("AT_TRANSFER_BACKEND", "local")
+    src, listing = small_tree
+    archivetar.main(
+        [
+            "archivetar",
+            "--prefix",
+            "box",
+            "--list",
+            str(listing),
+            "--tar-size",
+            "200",
+            "--tar-processes",
+            "2",
+            "--destination-dir",
+            str(tmp_path / "dest"),
+            "--wait",
+            "--prometheus",
+        ]
+    )
+    report = json.loads((src / "box.archivetar.report.json").read_text())
+    assert report["status"] == "success"
+    assert [p["phase"] for p in report["phases"]] == [
+        "filter",
+        "large",
+        "plan",
+        "tars",
+        "large_wait",
+    ]
+    tars = report["phases"][3]
+    assert (tars["items"], tars["bytes"]) == (4, 600)
+    assert len(report["tars"]) == 4
+    for tar in report["tars"]:
+        assert tar["rc"] == 0
+        assert list(tar["stages"]) == ["lock", "tar", "checksum", "upload", "wait"]
+        assert list(tar["cpu"]) == list(tar["stages"])
+        assert tar["bound"] in ("cpu", "io")
+    assert sum(tar["in_bytes"] for tar in report["tars"]) == 600
+    assert report["totals"]["members"] == 6
+    assert report["totals"]["out_bytes"] == sum(
+        f.stat().st_size for f in src.glob("box-*.tar")
+    )
+    prom = (src / "box.archivetar.prom").read_text()
+    assert 'archivetar_run_success{prefix="box"} 1' in prom
+
+
+def test_main_cleanup_dies(small_tree, tmp_path, monkeypatch):
+    """The run stops rather than waiting forever on space a dead cleanup holds."""
+    monkeypatch.setenv("AT_TRANSFER_BACKEND", "local")
+    monkeypatch.setattr(archivetar, "cleanup", lambda *args: os._exit(1))
+    src, listing = small_tree
+    with pytest.raises(ArchiveTarArchiveError, match="Cleanup stage exited"):
+        archivetar.main(
+            [
+                "archivetar",
+                "--prefix",
+                "box",
+                "--list",
+                str(listing),
+                "--tar-size",
+                "200",
+                "--tar-processes",
+                "1",
+                "--no-checksum",
+                "--destination-dir",
+                str(tmp_path / "dest"),
+                "--rm-at-files",
+                "--high-water",
+                "0",
+            ]
+        )
@@ -0,0 +1,105 @@
+import os
+import tarfile
+import time
+from pathlib import Path
+
+import pytest
+
+import archivetar.catalog
+from archivetar.catalog import Catalog, catalog_path
+from archivetar.unarchivetar import find_file_lists
+
+
+@pytest.fixture
+def archives(tmp_path):
+    """Two archives as left by archivetar, box-1 with a local uncompressed tar."""
+    os.chdir(tmp_path)
+    data = {
+        1: ["dir1/a.txt", "dir1/sub/b.txt", "dir10/c.txt"],
+        2: ["dir2/d.h5", "dir1/e.h5"],
+    }
+    for number, paths in data.items():
+        for path in paths:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(f"contents of {path}")
+        Path(f"box-{number}.DONT_DELETE.txt").write_text("\n".join(paths) + "\n")
+
+    with tarfile.open("box-1.tar", "w") as tar:
+        for path in data[1]:
+            tar.add(path)
+    return tmp_path
+
+
+@pytest.fixture
+def catalog(archives):
+    catalog = Catalog(catalog_path("box"))
+    catalog.update(find_file_lists("box"))
+    yield catalog
+    catalog.close()
+
+
+def test_catalog_folder(catalog):
+    """Folder matches only paths under it, not dir10 for dir1."""
+    matches = list(catalog.folder("dir1"))
+    assert sorted(m.path for m in matches) == [
+        "dir1/a.txt",
+        "dir1/e.h5",
+        "dir1/sub/b.txt",
+    ]
+    assert catalog.archives(matches) == ["box-1.tar", "box-2"]
+
+
+def test_catalog_exact_glob(catalog):
+    assert [m.archive for m in catalog.exact("dir2/d.h5")] == ["box-2"]
+    assert list(catalog.exact("dir2")) == []
+    assert sorted(m.path for m in catalog.glob("*.h5")) == ["dir1/e.h5", "dir2/d.h5"]
+
+
+def test_catalog_offsets(catalog, monkeypatch):
+    """Offsets from a local tar point at member data once read."""
+    monkeypatch.setattr(archivetar.catalog, "is_offline", lambda path: False)
+    (match,) = catalog.exact("dir1/sub/b.txt")
+    assert match.offset is None  # the tar is not read building the catalog
+
+    assert catalog.read_offsets(["box-1", "box-2"]) == 1
+    assert catalog.read_offsets(["box-1"]) == 0  # already known
+    (match,) = catalog.exact("dir1/sub/b.txt")
+    with open("box-1.tar", "rb") as f:
+        f.seek(match.offset_data)
+        assert (
+            f.read(len("contents of dir1/sub/b.txt")) == b"contents of dir1/sub/b.txt"
+        )
+
+    # compressed or remote archives have no offsets
+    (match,) = catalog.exact("dir2/d.h5")
+    assert match.offset is None
+
+
+def test_catalog_update(catalog):
+    """Only changed lists are read again and removed lists are dropped."""
+    assert catalog.update(find_file_lists("box")) == 0
+
+    time.sleep(0.01)
+    Path("box-2.DONT_DELETE.txt").write_text("dir3/f.txt\n")
+    assert catalog.update(find_file_lists("box")) == 1
+    assert [m.archive for m in catalog.exact("dir3/f.txt")] == ["box-2"]
+    assert list(catalog.exact("dir2/d.h5")) == []
+
+    Path("box-2.DONT_DELETE.txt").unlink()
+    catalog.update(find_file_lists("box"))
+    assert list(catalog.exact("dir3/f.txt")) == []
+
+
+def test_catalog_offsets_unreadable(catalog, monkeypatch):
+    """Offline tars are not recalled and errors reading a tar are not fatal."""
+    monkeypatch.setattr(archivetar.catalog, "is_offline", lambda path: True)
+    assert catalog.read_offsets(["box-1"]) == 0
+
+    def eio(*args, **kwargs):
+        raise OSError(5, "Input/output error")
+
+    monkeypatch.setattr(archivetar.catalog, "is_offline", lambda path: False)
+    monkeypatch.setattr(tarfile, "open", eio)
+    assert catalog.read_offsets(["box-1"]) == 0
+    (match,) = catalog.exact("dir1/sub/b.txt")
+    assert match.offset is None
@@ -0,0 +1,85 @@
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+import archivetar.checksum
+from archivetar.checksum import Verifier, read_checksums, report, sha1_of
+from archivetar.manifest import write_manifest
+
+
+@pytest.fixture
+def restored(tmp_path):
+    """Restored files and the sha1sum style list archivetar made for them."""
+    os.chdir(tmp_path)
+    lines = []
+    for name in ["d1/a", "d1/b", "d2/c"]:
+        Path(name).parent.mkdir(exist_ok=True)
+        Path(name).write_text(name)
+        lines.append(f"{hashlib.sha1(name.encode()).hexdigest()} {name}")
+    sha = Path("box-1.DONT_DELETE.sha1")
+    sha.write_text("\n".join(lines) + "\n")
+    return sha
+
+
+def test_sha1_of(restored):
+    assert sha1_of("d1/a") == hashlib.sha1(b"d1/a").hexdigest()
+
+
+def test_read_checksums_manifest(restored):
+    """Same checksums from a manifest."""
+    Path("box-1.DONT_DELETE.txt").write_text("d1/a\nd1/b\nd2/c\n")
+    Path("box-1.index.txt").write_text("i\ni\ni\n")
+    manifest = write_manifest(
+        "box-1.tar", "box-1.DONT_DELETE.txt", "box-1.index.txt", restored
+    )
+    assert list(read_checksums(manifest)) == list(read_checksums(restored))
+
+
+@pytest.mark.parametrize("batch", [1, 1000])
+def test_Verifier(restored, batch):
+    """Reports mismatched and missing files."""
+    Path("d1/b").write_text("changed")
+    Path("d2/c").unlink()
+
+    verifier = Verifier(2, batch=batch)
+    verifier.submit(read_checksums(restored))
+    result = verifier.wait()
+
+    assert result.files == 2
+    assert result.mismatched == ["d1/b"]
+    assert result.missing == ["d2/c"]
+    assert not report(result)
+
+
+def test_Verifier_folder(restored):
+    """Only files under folder are checked with --folder."""
+    Path("d2/c").unlink()
+    verifier = Verifier(2)
+    verifier.submit(read_checksums(restored), path="d1")
+    result = verifier.wait()
+    assert result.files == 2
+    assert report(result)
+
+
+def test_Verifier_unreadable(restored, monkeypatch):
+    """A file that can't be read is reported, the rest are still checked."""
+    Path("d1/b").unlink()
+    Path("d1/b").mkdir()  # IsADirectoryError
+    real_sha1_of = archivetar.checksum.sha1_of
+
+    def deny(path):
+        if path == "d2/c":
+            raise PermissionError(13, "Permission denied", path)
+        return real_sha1_of(path)
+
+    monkeypatch.setattr(archivetar.checksum, "sha1_of", deny)
+    verifier = Verifier(2, batch=1)
+    verifier.submit(read_checksums(restored))
+    result = verifier.wait()
+
+    assert result.files == 1
+    assert sorted(result.unreadable) == ["d1/b", "d2/c"]
+    assert result.missing == []
+    assert not report(result)
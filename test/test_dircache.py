@@ -0,0 +1,40 @@
+import os
+
+from archivetar.dircache import DirCache
+
+
+def test_DirCache(tmp_path):
+    """Unchanged directories hit, changed ones miss."""
+    d = tmp_path / "d"
+    (d / "sub").mkdir(parents=True)
+    cache = DirCache(tmp_path / "cache.sqlite", config={"filter": "*"})
+    assert cache.lookup(str(d)) is None
+
+    cache.store([(str(d), os.stat(d), [str(d / "sub")], [1, 2, 3, 4])])
+    assert cache.lookup(str(d)) == ([str(d / "sub")], [1, 2, 3, 4])
+
+    (d / "new").touch()  # changes mtime of d
+    assert cache.lookup(str(d)) is None
+
+
+def test_DirCache_runs(tmp_path):
+    """Directories not seen in a run are dropped, new config starts over."""
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.mkdir()
+    b.mkdir()
+    db = tmp_path / "cache.sqlite"
+    cache = DirCache(db, config={"filter": "*"})
+    cache.store([(str(p), os.stat(p), [], [0, 0, 0, 0]) for p in (a, b)])
+    cache.commit()
+    cache.close()
+
+    cache = DirCache(db, config={"filter": "*"})
+    assert cache.run == 2
+    cache.seen([str(a)])
+    cache.commit()
+    assert cache.lookup(str(a)) is not None
+    assert cache.lookup(str(b)) is None
+    cache.close()
+
+    cache = DirCache(db, config={"filter": "*.h5"})
+    assert cache.lookup(str(a)) is None
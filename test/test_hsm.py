@@ -0,0 +1,138 @@
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import archivetar.hsm
+from archivetar.hsm import (
+    CommandRecall,
+    LocalRecall,
+    Prefetcher,
+    ReadRecall,
+    Recaller,
+    block_ratio,
+    recall,
+    recall_backend_from_env,
+)
+
+
+@pytest.mark.parametrize(
+    "size,blocks,ratio",
+    [
+        (0, 0, 1.0),  # empty
+        (100, 1, 1.0),  # under MIN_BLOCKS assumed online
+        (100 * 2**20, 2048, 200.0),  # migrated, only stub on disk
+        (100 * 2**20, 204800, 2.0),  # premigrated both replicas on disk
+        (100 * 2**20, 409600, 1.0),
+    ],
+)
+def test_block_ratio(size, blocks, ratio):
+    assert block_ratio(SimpleNamespace(st_size=size, st_blocks=blocks)) == ratio
+
+
+def test_recall(tmp_path):
+    f = tmp_path / "a"
+    f.write_text("data")
+    recall(f)
+
+
+def test_Prefetcher(monkeypatch):
+    """Only offline archives within depth are recalled and only once."""
+    recalled = []
+    lock = threading.Lock()
+
+    def fake_recall(path):
+        with lock:
+            recalled.append(path)
+
+    monkeypatch.setattr(archivetar.hsm, "recall", fake_recall)
+    monkeypatch.setattr(archivetar.hsm, "is_offline", lambda p: p.name != "box-2.tar")
+    pending = [Path(f"box-{i}.tar") for i in range(1, 6)]
+
+    prefetch = Prefetcher(3)
+    prefetch.ahead(pending)
+    prefetch.ahead(pending[1:])
+    prefetch.pool.shutdown(wait=True)
+
+    assert sorted(p.name for p in recalled) == ["box-1.tar", "box-3.tar", "box-4.tar"]
+
+
+def test_Prefetcher_disabled():
+    prefetch = Prefetcher(0)
+    prefetch.ahead([Path("box-1.tar")])
+    assert prefetch.requested == {}
+    prefetch.shutdown()
+
+
+def stat(ino):
+    return SimpleNamespace(st_ino=ino)
+
+
+def test_Recaller_batches():
+    """Files are recalled in batches sorted by inode."""
+    backend = LocalRecall()
+    recaller = Recaller(backend, workers=1, batch=3)
+    for name, ino in [("c", 3), ("a", 1), ("b", 2), ("e", 5), ("d", 4)]:
+        recaller.add(name, stat(ino))
+    assert recaller.wait() == (5, 0)
+    assert backend.batches == [["a", "b", "c"], ["d", "e"]]
+
+
+def test_Recaller_position():
+    """--recall-order backend sorts by the backend's tape position."""
+    tape = {"a": (2, 10), "b": (1, 50), "c": (1, 5)}  # (tape, block)
+    backend = LocalRecall(position=lambda path, st: tape[path])
+    recaller = Recaller(backend, batch=10, order="backend")
+    for name in "abc":
+        recaller.add(name, stat(0))
+    recaller.wait()
+    assert backend.batches == [["c", "b", "a"]]
+
+
+def test_Recaller_linger():
+    """A partial batch is recalled once it waited linger seconds."""
+    backend = LocalRecall()
+    recaller = Recaller(backend, batch=10, linger=0)
+    recaller.add("a", stat(1))
+    recaller.poll()
+    recaller.pool.shutdown(wait=True)
+    assert backend.batches == [["a"]]
+
+
+def test_Recaller_failed(tmp_path):
+    """Files that can't be read are counted failed."""
+    f = tmp_path / "a"
+    f.write_text("data")
+    recaller = Recaller(ReadRecall(), workers=2)
+    recaller.add(f, f.stat())
+    recaller.add(tmp_path / "missing", f.stat())
+    assert recaller.wait() == (1, 1)
+
+
+def test_CommandRecall(tmp_path):
+    """Paths are passed as arguments or in a {list} file."""
+    paths = [tmp_path / "a", tmp_path / "b"]
+    CommandRecall("touch").recall(paths)
+    assert all(p.exists() for p in paths)
+
+    CommandRecall(f"cp {{list}} {tmp_path}/list").recall(paths)
+    assert (tmp_path / "list").read_text() == f"{paths[0]}\n{paths[1]}\n"
+
+
+def test_CommandRecall_list_in_argument(tmp_path, monkeypatch):
+    """{list} inside a larger argument is the temporary file, never a literal name."""
+    monkeypatch.chdir(tmp_path)
+    paths = [tmp_path / "a"]
+    CommandRecall("sh -c 'cp {list} {list}.done && mv {list}.done out'").recall(paths)
+    assert (tmp_path / "out").read_text() == f"{paths[0]}\n"
+    assert not list(tmp_path.glob("{list}*"))
+
+
+@pytest.mark.parametrize(
+    "name,cls", [("read", ReadRecall), ("command", CommandRecall), ("local", LocalRecall)]
+)
+def test_recall_backend_from_env(monkeypatch, name, cls):
+    monkeypatch.setenv("AT_RECALL_BACKEND", name)
+    monkeypatch.setenv("AT_RECALL_COMMAND", "eeadm recall")
+    assert isinstance(recall_backend_from_env(), cls)
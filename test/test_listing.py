@@ -0,0 +1,148 @@
+import os
+import pwd
+import time
+
+import pytest
+
+import archivetar
+import archivetar.purge
+from archivetar import DwalkLine, DwalkParser
+from archivetar.listing import StatFilter, record, scan, split
+
+DAY = 86400
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Files of 10 and 1000 bytes in nested directories, a link and an old file."""
+    src = tmp_path / "src"
+    for d in ["a", "a/b", "c"]:
+        (src / d).mkdir(parents=True)
+    (src / "a" / "small").write_bytes(b"x" * 10)
+    (src / "a" / "b" / "big").write_bytes(b"x" * 1000)
+    (src / "c" / "exact").write_bytes(b"x" * 100)
+    old = src / "c" / "old"
+    old.write_bytes(b"x" * 10)
+    os.utime(old, (time.time() - 90 * DAY, time.time() - 90 * DAY))
+    os.symlink("b/big", src / "a" / "link")
+    return src
+
+
+def test_record(tree):
+    """Records parse back with DwalkLine to the exact size and path."""
+    path = tree / "a" / "b" / "big"
+    line = DwalkLine(line=record(path, os.lstat(path)), stripcwd=False)
+    assert line.size == 1000
+    assert line.path == os.fsencode(path) + b"\n"
+    assert not line.is_symlink
+
+    link = DwalkLine(line=record(tree / "a" / "link", os.lstat(tree / "a" / "link")))
+    assert link.is_symlink
+
+
+@pytest.mark.parametrize(
+    "mtime,kept",
+    [("+60", ["old"]), ("-60", ["big", "exact", "link", "small"]), ("90", ["old"])],
+)
+def test_StatFilter_days(tree, mtime, kept):
+    keep = StatFilter(mtime=mtime)
+    found = sorted(
+        p.name
+        for p in tree.rglob("*")
+        if not p.is_dir() or p.is_symlink()
+        if keep(os.lstat(p))
+    )
+    assert found == kept
+
+
+def test_StatFilter_user(tree):
+    st = os.lstat(tree / "a" / "small")
+    assert StatFilter(user=pwd.getpwuid(st.st_uid).pw_name)(st)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_scan(tree, tmp_path, workers):
+    """Files and links sorted by path like dwalk --sort name."""
+    listing = tmp_path / "scan.txt"
+    runs = []
+    assert scan(tree, listing, workers=workers, runs=runs) == 5
+    paths = [p.rstrip(b"\n") for p in DwalkParser(listing).getpath()]
+    assert paths == sorted(paths)
+    assert os.fsencode(tree / "a" / "link") in paths
+    assert runs[0]["tool"] == "pywalk"
+    assert runs[0]["items"] >= 5
+
+
+def test_scan_filters(tree, tmp_path):
+    listing = tmp_path / "scan.txt"
+    assert scan(tree, listing, filters=StatFilter(mtime="+60")) == 1
+
+
+def test_split(tree, tmp_path, monkeypatch):
+    """Under size and links, of size or more, like filter_list() with dwalk."""
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    monkeypatch.setattr("tempfile.tempdir", None)
+    monkeypatch.chdir(tmp_path)
+    listing = tmp_path / "scan.txt"
+    scan(tree, listing)
+
+    under, purge, over = split(listing, 100, "box", purgelist=True)
+
+    def names(path):
+        return [os.path.basename(p.rstrip(b"\n")) for p in DwalkParser(path).getpath()]
+
+    assert names(under) == [b"small", b"old", b"link"]
+    assert names(purge) == [b"small", b"old"]
+    assert purge.parent == tmp_path
+    assert names(over) == [b"big", b"exact"]
+
+
+def test_main_walker_python(tree, tmp_path, monkeypatch):
+    """archivetar runs without MPI with --walker python."""
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    monkeypatch.setattr("tempfile.tempdir", None)
+    monkeypatch.chdir(tree)
+    archivetar.main(
+        [
+            "archivetar",
+            "--prefix",
+            "box",
+            "--walker",
+            "python",
+            "--size",
+            "500",
+            "--save-purge-list",
+            "--tar-processes",
+            "1",
+            "--no-checksum",
+        ]
+    )
+    members = (tree / "box-1.DONT_DELETE.txt").read_text().split()
+    assert sorted(members) == ["a/link", "a/small", "c/exact", "c/old"]
+    purge_list = next(tree.glob("*.under.purge.txt"))
+
+    archivetar.purge.main(["archivepurge", "--purge-list", str(purge_list)])
+    assert not (tree / "a" / "small").exists()
+    assert (tree / "a" / "b" / "big").exists()  # over --size is not in the tars
+    assert (tree / "a" / "link").is_symlink()
+    assert not purge_list.exists()
+
+
+def test_scan_complete(tmp_path):
+    """Every file of a deep and wide tree is listed on every scan."""
+    src = tmp_path / "src"
+    for a in range(8):
+        deep = src / f"w{a}"
+        for depth in range(6):
+            deep = deep / f"d{depth}"
+            deep.mkdir(parents=True)
+            for n in range(3):
+                (deep / f"file{n}").write_bytes(b"x" * n)
+    on_disk = sorted(os.fsencode(p) + b"\n" for p in src.rglob("file*"))
+    assert len(on_disk) == 8 * 6 * 3
+    for run in range(20):
+        out = tmp_path / f"scan{run}.txt"
+        assert scan(src, out, workers=4) == len(on_disk)
+        with out.open("rb") as f:
+            listed = [DwalkLine(line=line, stripcwd=False).path for line in f]
+        assert listed == on_disk
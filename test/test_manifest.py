@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import pytest
+
+from archivetar.manifest import (
+    MANIFEST_SUFFIX,
+    manifest_path,
+    member_paths,
+    read_manifest,
+    write_manifest,
+)
+
+
+@pytest.fixture
+def tar_lists(tmp_path):
+    """Lists as archivetar leaves them next to box-1.tar."""
+    tar_list = tmp_path / "box-1.DONT_DELETE.txt"
+    tar_list.write_text("dir/a.txt\ndir/b c.txt\n")
+    index = tmp_path / "box-1.index.txt"
+    index.write_text("-rw-r--r-- user group 1 dir/a.txt\n-rw-r--r-- user group 2 dir/b c.txt\n")
+    checksum = tmp_path / "box-1.DONT_DELETE.sha1"
+    checksum.write_text("aaaa dir/a.txt\nbbbb dir/b c.txt\n")
+    return tar_list, index, checksum
+
+
+def test_manifest_path():
+    assert manifest_path("/tmp/box-1.DONT_DELETE.txt") == Path(
+        f"/tmp/box-1.{MANIFEST_SUFFIX}"
+    )
+
+
+@pytest.mark.parametrize("with_sum", [True, False])
+def test_write_manifest(tar_lists, with_sum):
+    """Round trip lists through a manifest."""
+    tar_list, index, checksum = tar_lists
+    manifest = write_manifest(
+        "box-1.tar", tar_list, index, checksum=checksum if with_sum else None
+    )
+
+    assert manifest.name == f"box-1.{MANIFEST_SUFFIX}"
+    header, entries = read_manifest(manifest)
+    assert header == {"archive": "box-1.tar", "version": 1}
+    entries = list(entries)
+    assert [e["path"] for e in entries] == ["dir/a.txt", "dir/b c.txt"]
+    assert entries[1]["index"] == "-rw-r--r-- user group 2 dir/b c.txt"
+    if with_sum:
+        assert [e["sha1"] for e in entries] == ["aaaa", "bbbb"]
+    else:
+        assert entries[0]["sha1"] is None
+
+
+def test_member_paths(tar_lists):
+    """Same members from text list or manifest."""
+    tar_list, index, checksum = tar_lists
+    manifest = write_manifest("box-1.tar", tar_list, index, checksum)
+
+    assert list(member_paths(manifest)) == list(member_paths(tar_list))
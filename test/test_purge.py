@@ -1,6 +1,8 @@
 from pathlib import Path
 
-from archivetar.purge import purge_empty_folders
+import pytest
+
+from archivetar.purge import purge_empty_folders, unlink_files
 
 
 def test_purge_empty_folders(tmp_path):
@@ -38,3 +40,36 @@ def test_purge_empty_folders(tmp_path):
     after = len(list(root.iterdir()))
     print(f"After: {after} entries")
     assert after == 1
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_purge_empty_folders_deep(tmp_path, threads):
+    """Deep empty chains go, anything holding a file or link stays."""
+    root = tmp_path / "root"
+    for i in range(5):
+        (root / f"empty{i}" / "a" / "b" / "c").mkdir(parents=True)
+    keep = root / "keep" / "a" / "b"
+    keep.mkdir(parents=True)
+    (keep / "file").touch()
+    (root / "keep" / "gone").mkdir()
+    linked = root / "link"
+    linked.mkdir()
+    (linked / "to_keep").symlink_to(keep, target_is_directory=True)
+
+    removed = purge_empty_folders(f"{root}/", threads=threads)
+
+    assert removed == 21
+    assert sorted(p.name for p in root.iterdir()) == ["keep", "link"]
+    assert sorted(p.name for p in (root / "keep").iterdir()) == ["a"]
+    assert (keep / "file").exists()
+
+
+def test_unlink_files(tmp_path):
+    paths = []
+    for n in range(20):
+        f = tmp_path / f"file{n}"
+        f.touch()
+        paths.append(f)
+    paths.append(tmp_path / "missing")
+    assert unlink_files(paths, threads=4) == (20, 1)
+    assert not list(tmp_path.iterdir())
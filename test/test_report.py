@@ -0,0 +1,127 @@
+import json
+import subprocess
+import time
+
+from archivetar.report import RunReport, TarResult, tar_result, timed
+
+
+def test_timed():
+    timings = {}
+    for _ in range(2):
+        with timed(timings, "tar"):
+            time.sleep(0.01)
+    assert timings["tar"] >= 0.02
+
+
+def test_timed_cpu():
+    """CPU of child processes counts, sleeping does not."""
+    timings, cpu = {}, {}
+    with timed(timings, "tar", cpu):
+        subprocess.run(["python", "-c", "sum(range(10**7))"], check=True)  # nosec
+    with timed(timings, "wait", cpu):
+        time.sleep(0.2)
+    assert cpu["tar"] > 0.05
+    assert cpu["wait"] < 0.1
+    assert timings["wait"] >= 0.2
+
+
+def test_tar_result():
+    subprocess.run(["true"], check=True)  # nosec
+    result = tar_result(
+        0, 1, "box-1.tar", 1000, {"tar": 1.0}, {"tar": 0.5}, out_bytes=500, members=3
+    )
+    assert (result.rc, result.index, result.members, result.exception) == (
+        0,
+        1,
+        3,
+        None,
+    )
+    assert result.max_rss > 0
+
+
+def result(index, rc, in_bytes, out_bytes, timings, cpu=None, members=2):
+    return TarResult(
+        rc=rc,
+        index=index,
+        filename=f"box-{index}.tar.gz",
+        in_bytes=in_bytes,
+        out_bytes=out_bytes,
+        members=members,
+        timings=timings,
+        cpu=cpu or {},
+        max_rss=2048,
+        exception=None if rc == 0 else "CalledProcessError()",
+    )
+
+
+def test_RunReport_phase():
+    """Runs made during a phase count toward it unless it sets its own counts."""
+    runs = [{"items": 5, "bytes": None}]
+    report = RunReport("box", runs=runs)
+    with report.phase("scan"):
+        runs.append({"items": 100, "bytes": 4096})
+    with report.phase("plan") as counts:
+        runs.append({"items": 7, "bytes": 1})
+        counts.update(items=3)
+
+    scan, plan = report.phases
+    assert (scan["phase"], scan["items"], scan["bytes"]) == ("scan", 100, 4096)
+    assert scan["items_per_sec"] > 0
+    assert (plan["items"], plan["bytes"]) == (3, 1)
+
+
+def test_RunReport_write(tmp_path):
+    report = RunReport("box")
+    report.tar(result(1, 0, 1000, 250, {"tar": 2.0, "checksum": 1.0}, {"tar": 1.9}))
+    report.tar(result(2, -1, 1000, 0, {"tar": 0.5}))
+    path = tmp_path / "box.archivetar.report.json"
+    report.write(path, status="failed")
+
+    summary = json.loads(path.read_text())
+    assert summary["status"] == "failed"
+    first = summary["tars"][0]
+    assert first["ratio"] == 4
+    assert first["seconds"] == 3
+    assert first["in_bytes_per_sec"] == 500
+    assert first["members_per_sec"] == 1
+    assert list(first["stages"]) == ["tar", "checksum"]
+    assert first["bound"] == "cpu"
+    assert summary["totals"]["tars"] == 1
+    assert summary["totals"]["failed"] == 1
+    assert summary["totals"]["in_bytes"] == 1000
+    assert summary["totals"]["stages"] == {"tar": 2.5, "checksum": 1.0}
+    assert summary["totals"]["cpu"] == {"tar": 1.9}
+    assert summary["totals"]["members"] == 2
+    assert summary["totals"]["max_rss_kib"] == 2048
+
+
+def test_RunReport_describe_tars():
+    """Running totals of the tars so far."""
+    report = RunReport("box")
+    report.tar(result(1, 0, 1 << 30, 1 << 29, {"tar": 10.0}, {"tar": 9.5}))
+    report.tar(result(2, 0, 1 << 30, 1 << 29, {"tar": 10.0}, {"tar": 1.0}))
+    assert report.describe_tars() == (
+        "Tars made 2 2.000 GiB in 1.000 GiB out ratio 2.00 102.4 MiB/s per tar"
+        " cpu bound 1 io bound 1"
+    )
+    report.tar(result(3, -1, 1 << 30, 0, {"tar": 1.0}))
+    assert report.describe_tars().startswith("Tars made 2 failed 1 ")
+
+
+def test_RunReport_write_prometheus(tmp_path):
+    report = RunReport('my"box')
+    with report.phase("scan") as counts:
+        counts["items"] = 10
+    report.tar(result(1, 0, 1000, 1000, {"tar": 2.0}, {"tar": 0.2}))
+    path = tmp_path / "box.archivetar.prom"
+    report.write_prometheus(path, status="success")
+
+    lines = path.read_text().splitlines()
+    assert 'archivetar_run_success{prefix="my\\"box"} 1' in lines
+    assert 'archivetar_phase_items{prefix="my\\"box",phase="scan"} 10' in lines
+    assert 'archivetar_tar_bytes{prefix="my\\"box",direction="in"} 1000' in lines
+    assert 'archivetar_tar_stage_seconds{prefix="my\\"box",stage="tar"} 2.0' in lines
+    assert 'archivetar_tars_bound{prefix="my\\"box",bound="io"} 1' in lines
+    assert 'archivetar_tar_max_rss_bytes{prefix="my\\"box"} 2097152' in lines
+    assert "# TYPE archivetar_phase_seconds gauge" in lines
+    assert not list(tmp_path.glob(".*"))  # written through a temporary file
@@ -0,0 +1,64 @@
+import os
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from archivetar.schedule import ExtractScheduler, codec_cost
+
+
+@pytest.fixture
+def archives(tmp_path):
+    """box-1.tar small, box-2.tar.xz large, box-3.tar.gz medium."""
+    os.chdir(tmp_path)
+    Path("f").write_bytes(os.urandom(4096))
+    with tarfile.open("box-1.tar", "w") as tar:
+        tar.add("f")
+    for name, size in [("box-2.tar.xz", 50000), ("box-3.tar.gz", 20000)]:
+        Path(name).write_bytes(os.urandom(size))
+    return [Path("box-1.tar"), Path("box-2.tar.xz"), Path("box-3.tar.gz")]
+
+
+def test_codec_cost(archives):
+    assert [codec_cost(a) for a in archives] == [0.5, 2, 1]
+
+
+def test_ExtractScheduler_admit(archives):
+    """Largest first and xz takes more of the budget than uncompressed."""
+    scheduler = ExtractScheduler(2)
+    pending = scheduler.order(archives)
+    assert [a.name for a in pending] == ["box-2.tar.xz", "box-3.tar.gz", "box-1.tar"]
+
+    assert scheduler.admit(pending[0])
+    scheduler.start(pending[0])
+    assert not scheduler.admit(pending[1])  # xz used both slots
+    assert not scheduler.admit(pending[2])
+
+    scheduler.finish(pending[0], 1)
+    assert scheduler.admit(pending[1])
+    scheduler.start(pending[1])
+    assert scheduler.admit(pending[2])
+
+
+def test_ExtractScheduler_adapt(archives):
+    """Budget grows while the rate improves and turns around when it falls."""
+    now = [0.0]
+    scheduler = ExtractScheduler(2, window=1, clock=lambda: now[0])
+    small = archives[0]
+    size = small.stat().st_size
+
+    def complete(seconds):
+        scheduler.start(small)
+        now[0] += seconds
+        scheduler.finish(small, seconds)
+
+    complete(1)  # first sample
+    assert scheduler.slots == 3
+    complete(0.5)  # faster
+    assert scheduler.slots == 4
+    complete(2)  # slower turn around
+    assert scheduler.slots == 3
+    complete(2)  # about the same hold
+    assert scheduler.slots == 3
+    assert len(scheduler.results) == 4
+    assert scheduler.results[0] == (small, size, 1)
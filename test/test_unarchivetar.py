@@ -1,4 +1,5 @@
 import os
+import tarfile
 from pathlib import Path
 
 import pytest
@@ -47,3 +48,200 @@ def test_find_prefix_files(tmp_path, prefix, suffix, args):
     tars = find_prefix_files(prefix, **args)
 
     assert len(tars) == 4
+
+
+def test_find_file_lists(tmp_path):
+    """Lists and manifests are found, checksums and indexes are not."""
+    os.chdir(tmp_path)
+    for name in [
+        "box-1.DONT_DELETE.txt",
+        "box-1.DONT_DELETE.sha1",
+        "box-1.index.txt",
+        "box-2.DONT_DELETE.manifest.gz",
+        "box-10.DONT_DELETE.txt",
+    ]:
+        Path(name).touch()
+
+    file_lists = archivetar.unarchivetar.find_file_lists("box")
+    assert [f.name for f in file_lists] == [
+        "box-1.DONT_DELETE.txt",
+        "box-2.DONT_DELETE.manifest.gz",
+        "box-10.DONT_DELETE.txt",
+    ]
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        (["--folder", "dir1"], "box-1"),
+        (["--file", "dir2/b.txt"], "box-2"),
+        (["--glob", "*/b.txt"], "box-2"),
+    ],
+)
+def test_which_archive(tmp_path, capsys, query, expected):
+    """--which-archive reports only archives with matches."""
+    os.chdir(tmp_path)
+    Path("box-1.DONT_DELETE.txt").write_text("dir1/a.txt\n")
+    Path("box-2.DONT_DELETE.txt").write_text("dir2/b.txt\n")
+
+    with pytest.raises(SystemExit) as e:
+        archivetar.unarchivetar.main(
+            ["unarchivetar", "--prefix", "box", "--which-archive", *query]
+        )
+    assert e.value.code == 0
+    recall = capsys.readouterr().out.split("following:")[1]
+    assert expected in recall
+    assert len(recall.split()) == 4  # one archive (1 matching files)
+    assert Path("box.catalog.sqlite").exists()
+
+
+def test_plan_archives(tmp_path):
+    """Only archives holding the folder, or without a list, are expanded."""
+    os.chdir(tmp_path)
+    for name in ["box-1.tar", "box-2.tar.gz", "box-3.tar"]:
+        Path(name).touch()
+    Path("box-1.DONT_DELETE.txt").write_text("dir1/a.txt\n")
+    Path("box-2.DONT_DELETE.txt").write_text("dir2/b.txt\ndir10/c.txt\n")
+    # box-3 has no list
+
+    args = archivetar.unarchivetar.parse_args(["--prefix", "box", "--folder", "dir1"])
+    archives = find_prefix_files("box")
+    selected = archivetar.unarchivetar.plan_archives(args, archives)
+    assert [a.name for a in selected] == ["box-1.tar", "box-3.tar"]
+
+
+def test_plan_archives_reads_lists_only(tmp_path, monkeypatch):
+    """Planning never opens the tars, they may be offline on tape."""
+    os.chdir(tmp_path)
+    for number, path in [(1, "dir1/a.txt"), (2, "dir2/b.txt")]:
+        Path(path).parent.mkdir()
+        Path(path).write_text(path)
+        with tarfile.open(f"box-{number}.tar", "w") as tar:
+            tar.add(path)
+        Path(f"box-{number}.DONT_DELETE.txt").write_text(f"{path}\n")
+
+    opened = []
+    real_open = tarfile.open
+    monkeypatch.setattr(
+        tarfile,
+        "open",
+        lambda name, *a, **kw: opened.append(name) or real_open(name, *a, **kw),
+    )
+    args = archivetar.unarchivetar.parse_args(["--prefix", "box", "--folder", "dir1"])
+    selected = archivetar.unarchivetar.plan_archives(args, find_prefix_files("box"))
+    assert [a.name for a in selected] == ["box-1.tar"]
+    assert opened == []
+
+
+def test_unarchivetar_split(tmp_path):
+    """One uncompressed archive is extracted by several tars."""
+    os.chdir(tmp_path)
+    names = [f"dir{i % 2}/f{i}" for i in range(6)]
+    with tarfile.open("box-1.tar", "w") as tar:
+        for name in names:
+            Path(name).parent.mkdir(exist_ok=True)
+            Path(name).write_text(name * 200)
+            tar.add(name)
+            Path(name).unlink()
+
+    archivetar.unarchivetar.main(
+        ["unarchivetar", "--prefix", "box", "--tar-processes", "1", "--split", "3"]
+    )
+    for name in names:
+        assert Path(name).read_text() == name * 200
+
+
+@pytest.mark.parametrize("corrupt", [False, True])
+def test_unarchivetar_verify(tmp_path, corrupt):
+    """--verify checks extracted files against the archive checksums."""
+    os.chdir(tmp_path)
+    Path("a.txt").write_text("data")
+    with tarfile.open("box-1.tar", "w") as tar:
+        tar.add("a.txt")
+    Path("a.txt").unlink()
+    sha1 = "0" * 40 if corrupt else "a17c9aaa61e80a1bf71d0d850af4e5baa9800bbd"
+    Path("box-1.DONT_DELETE.sha1").write_text(f"{sha1} a.txt\n")
+
+    argv = ["unarchivetar", "--prefix", "box", "--verify"]
+    if corrupt:
+        with pytest.raises(SystemExit) as e:
+            archivetar.unarchivetar.main(argv)
+        assert e.value.code == 1
+    else:
+        archivetar.unarchivetar.main(argv)
+
+
+@pytest.fixture
+def three_member_tar(tmp_path):
+    """box-1.tar with a.txt b.txt c.txt removed from disk."""
+    os.chdir(tmp_path)
+    with tarfile.open("box-1.tar", "w") as tar:
+        for name in ["a.txt", "b.txt", "c.txt"]:
+            Path(name).write_text(name)
+            tar.add(name)
+            Path(name).unlink()
+    return Path("box-1.tar")
+
+
+def test_unarchivetar_journal(three_member_tar):
+    """A finished archive is skipped on the next run unless --restart."""
+    argv = ["unarchivetar", "--prefix", "box"]
+    journal = archivetar.unarchivetar.Journal("box.unarchivetar.journal")
+    journal.record(
+        "done", archive="box-1.tar", size=three_member_tar.stat().st_size, folder=None
+    )
+
+    archivetar.unarchivetar.main(argv)
+    assert not Path("a.txt").exists()
+
+    archivetar.unarchivetar.main(argv + ["--restart"])
+    assert Path("a.txt").exists()
+
+
+def test_unarchivetar_journal_success(three_member_tar):
+    """A run that expands everything removes its journal."""
+    archivetar.unarchivetar.main(["unarchivetar", "--prefix", "box"])
+    assert Path("a.txt").exists()
+    assert not Path("box.unarchivetar.journal").exists()
+
+
+def test_unarchivetar_journal_failed(three_member_tar):
+    """Archives that fail keep the journal for the next run."""
+    Path("box-2.tar").write_bytes(b"not a tar" * 1024)
+    with pytest.raises(SystemExit) as e:
+        archivetar.unarchivetar.main(["unarchivetar", "--prefix", "box"])
+    assert e.value.code == 1
+    assert Path("a.txt").exists()
+    assert Path("box.unarchivetar.journal").exists()
+
+
+def test_unarchivetar_plain_tar(three_member_tar, monkeypatch):
+    """Without a split or a resume the archive is handed to tar whole."""
+
+    def ranges(*args, **kwargs):
+        raise AssertionError("extracted in ranges")
+
+    monkeypatch.setattr(archivetar.unarchivetar.SuperTar, "_extract_ranges", ranges)
+    archivetar.unarchivetar.main(["unarchivetar", "--prefix", "box"])
+    assert Path("c.txt").read_text() == "c.txt"
+    assert not Path("box.unarchivetar.journal").exists()  # nothing failed
+
+
+def test_unarchivetar_journal_resume(three_member_tar):
+    """Parts of an archive recorded as done are not extracted again."""
+    with tarfile.open(three_member_tar) as tar:
+        a, b, _ = tar.getmembers()
+    journal = archivetar.unarchivetar.Journal("box.unarchivetar.journal")
+    journal.record(
+        "range",
+        archive="box-1.tar",
+        size=three_member_tar.stat().st_size,
+        folder=None,
+        start=a.offset,
+        end=b.offset,
+    )
+
+    archivetar.unarchivetar.main(["unarchivetar", "--prefix", "box"])
+    assert not Path("a.txt").exists()
+    assert Path("b.txt").read_text() == "b.txt"
+    assert Path("c.txt").read_text() == "c.txt"
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from archivetar.walk import walk
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """50 directories three deep with two files each and a pruned .snapshot."""
+    for a in range(5):
+        for b in range(9):
+            d = tmp_path / f"a{a}" / f"b{b}"
+            d.mkdir(parents=True)
+            for n in range(2):
+                (d / f"file{n}").write_text("x" * n)
+    snap = tmp_path / "a0" / ".snapshot"
+    snap.mkdir()
+    (snap / "old").touch()
+    os.symlink(tmp_path / "a1", tmp_path / "link")
+    return tmp_path
+
+
+def names(dirpath, subdirs, entries):
+    return dirpath, sorted(e.name for e in entries)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_walk(tree, workers):
+    """Every directory is visited once like os.walk()."""
+    walked = dict(walk(tree, names, workers=workers))
+    expected = {
+        dirpath: sorted(
+            filenames
+            + [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]
+        )
+        for dirpath, dirnames, filenames in os.walk(tree)
+    }
+    assert walked == expected
+    assert walked[str(tree)] == ["link"]  # not followed
+
+
+def test_walk_prune(tree):
+    walked = dict(walk(tree, names, workers=2, prune=lambda p: p.endswith("snapshot")))
+    assert str(tree / "a0" / ".snapshot") not in walked
+    assert len(walked) == 1 + 5 + 5 * 9
+
+
+def fail(dirpath, subdirs, entries):
+    raise ValueError(dirpath)
+
+
+def test_walk_error(tree):
+    with pytest.raises(ValueError):
+        list(walk(tree, fail, workers=2))
+
+
+def test_walk_lookup(tree):
+    """Directories lookup() answers are not scanned, their subdirs still are."""
+    a0 = str(tree / "a0")
+
+    def lookup(dirpath):
+        if dirpath == a0:
+            return [os.path.join(a0, "b0")], (dirpath, ["cached"])
+        return None
+
+    walked = dict(walk(tree, names, workers=2, lookup=lookup))
+    assert walked[a0] == ["cached"]
+    assert os.path.join(a0, "b0") in walked
+    assert os.path.join(a0, "b1") not in walked
+
+
+def stat_visit(dirpath, subdirs, entries, st):
+    return dirpath, st.st_ino
+
+
+def test_walk_stat(tree):
+    """visit is given the stat of each directory."""
+    walked = dict(walk(tree, stat_visit, workers=2, stat=True))
+    assert walked[str(tree / "a1")] == os.stat(tree / "a1").st_ino
+    assert len(walked) == 1 + 5 + 5 * 9 + 1
+
+
+def sizes(dirpath, subdirs, entries):
+    return len(entries), sum(e.stat(follow_symlinks=False).st_size for e in entries)
+
+
+def test_walk_totals(tmp_path):
+    """Every file is counted on every walk, none are lost when workers stop."""
+    for a in range(5):
+        for b in range(6):
+            d = tmp_path / f"a{a}" / f"b{b}"
+            d.mkdir(parents=True)
+            for n in range(5):
+                (d / f"file{n}").write_text("x" * n)
+    for _ in range(100):
+        walked = list(walk(tmp_path, sizes, workers=4))
+        assert sum(files for files, _ in walked) == 150
+        assert sum(size for _, size in walked) == 30 * (0 + 1 + 2 + 3 + 4)